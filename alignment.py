@@ -0,0 +1,368 @@
+# alignment.py - Word-level scoring of typed text against the target
+#
+# Each typed word (keys between spaces or line breaks) is aligned to the target word at the
+# same position with an optimal string alignment distance (Levenshtein plus
+# adjacent transpositions). A skipped or extra character therefore costs one
+# error in its own word instead of shifting every later character.
+#
+# Only the word under the caret is live. Its DP matrix grows by one row per
+# key and loses one per backspace, so a key costs O(target word length);
+# typed words stop growing MAX_EXTRA characters past their target word.
+# Finished words leave their errors in a MissCounter and their characters in
+# the aligned view.
+#
+# Everything a key touches is preallocated per text (the DP matrix, the
+# aligned view, per-word offsets) or per engine (the input buffer), so typing
+# doesn't allocate.
+#
+# Errors are (kind, expected, typed):
+#   SUBSTITUTION   one wrong character
+#   INSERTION      an extra typed character; expected is the target character
+#                  it was typed in front of (" " past the end of the word)
+#   OMISSION       a skipped target character; typed is ""
+#   TRANSPOSITION  two swapped neighbours; expected and typed are 2 characters
+import array
+
+from inputbuf import CharBuffer
+
+MATCH = "match"
+SUBSTITUTION = "substitution"
+INSERTION = "insertion"
+OMISSION = "omission"
+TRANSPOSITION = "transposition"
+ERROR_KINDS = (SUBSTITUTION, INSERTION, OMISSION, TRANSPOSITION)
+
+MAX_EXTRA = 10  # typed characters accepted past the end of a target word
+MISSING = "\0"  # aligned view placeholder for a skipped character
+_SPACE = ord(" ")
+SEPARATORS = " \n"  # end a word; either one ends the word under the caret
+ASCII = 128  # MissCounter table size per axis
+
+
+class MissCounter:
+    """Mistake counts by (expected, typed): a fixed ASCII x ASCII table plus a
+    dict for other scripts and transposed pairs. typed "" is stored as code 0."""
+
+    __slots__ = ("table", "other", "kinds", "total")
+
+    def __init__(self):
+        self.table = array.array("I", bytes(4 * ASCII * ASCII))
+        self.other = {}
+        self.kinds = dict.fromkeys(ERROR_KINDS, 0)
+        self.total = 0
+
+    def add_codes(self, kind, expected, typed, n=1):
+        """Count n mistakes (n may be negative) by code point; typed 0 means nothing typed."""
+        self.kinds[kind] += n
+        self.total += n
+        if expected < ASCII and typed < ASCII:
+            self.table[expected * ASCII + typed] += n
+        else:
+            self.add_other(chr(expected), chr(typed) if typed else "", n)
+
+    def add(self, kind, expected, typed, n=1):
+        if len(expected) == 1 and len(typed) <= 1:
+            self.add_codes(kind, ord(expected), ord(typed) if typed else 0, n)
+        else:
+            self.kinds[kind] += n
+            self.total += n
+            self.add_other(expected, typed, n)
+
+    def add_other(self, expected, typed, n):
+        key = (expected, typed)
+        count = self.other.get(key, 0) + n
+        if count:
+            self.other[key] = count
+        else:
+            del self.other[key]
+
+    def copy(self):
+        out = MissCounter()
+        out.table[:] = self.table
+        out.other = dict(self.other)
+        out.kinds = dict(self.kinds)
+        out.total = self.total
+        return out
+
+    def items(self):
+        """(expected, typed, count) for every pair counted at least once."""
+        table = self.table
+        for i in range(ASCII * ASCII):
+            if table[i]:
+                expected, typed = divmod(i, ASCII)
+                yield chr(expected), chr(typed) if typed else "", table[i]
+        for (expected, typed), count in self.other.items():
+            yield expected, typed, count
+
+    def pairs(self):
+        """[(expected, typed), ...] with one entry per mistake."""
+        return [(expected, typed) for expected, typed, count in self.items() for _ in range(count)]
+
+
+class WordAligner:
+    """Incremental word alignment of one test: push() keys, pop() backspaces.
+
+    Accepted keys are appended to `input` (a CharBuffer, reused if given).
+    """
+
+    __slots__ = ("text", "input", "misses", "view_buf", "_codes", "_word_start", "_typed_start",
+                 "_word_correct", "_word_errors", "_word_fixed", "_n_words", "_cols", "_dp", "_done_correct",
+                 "k", "n", "end", "distance", "correct", "_t0", "_m", "_s0")
+
+    def __init__(self, text, input_buffer=None):
+        self.text = text
+        self.input = input_buffer if input_buffer is not None else CharBuffer(len(text) + 1)
+        self.input.clear()
+        self.input.reserve(len(text) + 1)
+        self.misses = MissCounter()  # finished words and corrected mistakes
+        self.view_buf = CharBuffer(len(text) + 1)
+        self._codes = array.array("I", map(ord, text))
+        # Word k is text[_word_start[k] : _word_start[k + 1] - 1]
+        starts = array.array("I", [0])
+        starts.extend(i + 1 for i, ch in enumerate(text) if ch in SEPARATORS)
+        starts.append(len(text) + 1)
+        self._word_start = starts
+        self._n_words = n_words = len(starts) - 1
+        self._typed_start = array.array("I", bytes(4 * (n_words + 1)))  # input offset of each word's keys
+        self._word_correct = array.array("I", bytes(4 * n_words))
+        self._word_errors = array.array("I", bytes(4 * n_words))  # distance when the word was finished
+        self._word_fixed = array.array("I", bytes(4 * n_words))  # mistakes corrected with backspace
+        longest = max(starts[k + 1] - 1 - starts[k] for k in range(n_words))
+        self._cols = longest + 1
+        self._dp = array.array("i", bytes(4 * self._cols * (longest + MAX_EXTRA + 1)))
+        self._done_correct = 0
+        self._open(0)
+
+    # --- Live word ---
+    def _open(self, k):
+        """Make word k live, realigning any keys already typed for it."""
+        self.k = k
+        self.n = self.end = self.distance = self.correct = 0
+        if k >= self._n_words:
+            self.view_buf.length = len(self.text)
+            return
+        self._t0 = self._word_start[k]
+        self._m = self._word_start[k + 1] - 1 - self._t0
+        self._s0 = self._typed_start[k]
+        dp = self._dp
+        for j in range(self._m + 1):
+            dp[j] = j
+        for _ in range(self.input.length - self._s0):
+            self.n += 1
+            self._row(self.n)
+        self._settle()
+
+    def _row(self, i):
+        """Fill DP row i: typed[:i] against every prefix of the target word."""
+        dp, cols, tc, t0 = self._dp, self._cols, self._codes, self._t0
+        codes, s0 = self.input.codes, self._s0
+        ch = codes[s0 + i - 1]
+        before = codes[s0 + i - 2] if i > 1 else -1
+        base = i * cols
+        up = base - cols
+        dp[base] = i
+        for j in range(1, self._m + 1):
+            tj = tc[t0 + j - 1]
+            d = dp[up + j] + 1  # insertion
+            x = dp[base + j - 1] + 1  # omission
+            if x < d:
+                d = x
+            x = dp[up + j - 1] + (ch != tj)
+            if x < d:
+                d = x
+            if before == tj and j > 1 and ch == tc[t0 + j - 2]:
+                x = dp[up - cols + j - 2] + 1
+                if x < d:
+                    d = x
+            dp[base + j] = d
+
+    def _settle(self):
+        """Pick the target prefix the live word aligns to and refresh the view."""
+        dp, n = self._dp, self.n
+        base = n * self._cols
+        end, best = 0, dp[base]
+        for j in range(1, self._m + 1):
+            d = dp[base + j]
+            if d < best or (d == best and abs(j - n) < abs(end - n)):
+                end, best = j, d
+        self.end = end
+        self.distance = best
+        self.correct = self._trace(n, end)
+        self.view_buf.length = self._t0 + end
+
+    def _trace(self, i, j, misses=None, sign=1, ops=None):
+        """Walk the alignment of typed[:i] to target[:j] backwards.
+
+        Writes the aligned view, counts errors into `misses` (times sign),
+        appends (kind, expected, typed) to `ops` (reversed) and returns the matches.
+        """
+        dp, cols, tc, t0, m = self._dp, self._cols, self._codes, self._t0, self._m
+        codes, s0 = self.input.codes, self._s0
+        out = self.view_buf.codes
+        matches = 0
+        while i or j:
+            d = dp[i * cols + j]
+            if i and j:
+                a, b = codes[s0 + i - 1], tc[t0 + j - 1]
+                if d == dp[(i - 1) * cols + j - 1] + (a != b):
+                    out[t0 + j - 1] = a
+                    if a == b:
+                        matches += 1
+                        if ops is not None:
+                            ops.append((MATCH, chr(b), chr(a)))
+                    else:
+                        if misses is not None:
+                            misses.add_codes(SUBSTITUTION, b, a, sign)
+                        if ops is not None:
+                            ops.append((SUBSTITUTION, chr(b), chr(a)))
+                    i -= 1
+                    j -= 1
+                    continue
+                if (i > 1 and j > 1 and a == tc[t0 + j - 2] and codes[s0 + i - 2] == b
+                        and d == dp[(i - 2) * cols + j - 2] + 1):
+                    out[t0 + j - 2], out[t0 + j - 1] = b, a
+                    if misses is not None or ops is not None:
+                        op = (TRANSPOSITION, chr(a) + chr(b), chr(b) + chr(a))
+                        if misses is not None:
+                            misses.add(*op, sign)
+                        if ops is not None:
+                            ops.append(op)
+                    i -= 2
+                    j -= 2
+                    continue
+            if j and d == dp[i * cols + j - 1] + 1:
+                out[t0 + j - 1] = 0
+                if misses is not None:
+                    misses.add_codes(OMISSION, tc[t0 + j - 1], 0, sign)
+                if ops is not None:
+                    ops.append((OMISSION, chr(tc[t0 + j - 1]), ""))
+                j -= 1
+                continue
+            expected = tc[t0 + j] if j < m else _SPACE
+            if misses is not None:
+                misses.add_codes(INSERTION, expected, codes[s0 + i - 1], sign)
+            if ops is not None:
+                ops.append((INSERTION, chr(expected), chr(codes[s0 + i - 1])))
+            i -= 1
+        return matches
+
+    def _last_op(self):
+        """(kind, expected, typed) of the op holding the last typed character."""
+        ops = []
+        self._trace(self.n, self.end, ops=ops)
+        for op in ops:  # reversed: the first one that consumed a typed character
+            if op[2]:
+                return op
+        return None
+
+    # --- Keys ---
+    @property
+    def at_end(self):
+        """True once a separator was typed after the last word."""
+        return self.k >= self._n_words
+
+    @property
+    def caret(self):
+        """Index in the target text the next key goes to."""
+        return self.view_buf.length
+
+    def push(self, ch):
+        """Type one character; returns whether it added no error, or None if ignored."""
+        if self.k >= self._n_words:
+            return None
+        if ch == " " or ch == "\n":
+            n, m = self.n, self._m
+            matches = self._trace(n, m, self.misses)
+            correct = self._dp[n * self._cols + m] == self.distance  # nothing skipped
+            self._word_correct[self.k] = matches + correct
+            self._word_errors[self.k] = self._dp[n * self._cols + m]
+            self._done_correct += matches + correct
+            if self._t0 + m < len(self.text):
+                self.view_buf.codes[self._t0 + m] = ord(ch)
+            self.input.append(ch)
+            self._typed_start[self.k + 1] = self.input.length
+            self._open(self.k + 1)
+            return correct
+        if self.n >= self._m + MAX_EXTRA:
+            return None
+        before = self.distance
+        self.input.append(ch)
+        self.n += 1
+        self._row(self.n)
+        self._settle()
+        return self.distance <= before
+
+    def pop(self):
+        """Backspace; returns False if there was nothing to delete."""
+        if self.k < self._n_words and self.n:
+            before = self.distance
+            fixed = self._last_op() if before else None
+            self.input.pop()
+            self.n -= 1
+            self._settle()
+            if self.distance < before and fixed is not None and fixed[0] != MATCH:
+                self.misses.add(*fixed)  # corrected, but still a mistake
+                self._word_fixed[self.k] += 1
+            return True
+        if not self.k:
+            return False
+        self.input.pop()  # the separator
+        k = self.k - 1
+        self._done_correct -= self._word_correct[k]
+        self._open(k)
+        self._trace(self.n, self._m, self.misses, -1)  # its errors are live again
+        self._settle()
+        return True
+
+    # --- Scoring ---
+    def all_misses(self):
+        """MissCounter of every mistake so far, including the live word's."""
+        misses = self.misses.copy()
+        if self.k < self._n_words:
+            self._trace(self.n, self.end, misses)
+        return misses
+
+    def correct_chars(self):
+        return self._done_correct + self.correct
+
+    def word_errors(self):
+        """(word index, mistakes) for each finished word, corrected ones included.
+
+        The live word counts too once all of its characters are typed (the
+        last word of a text ends without a space).
+        """
+        for k in range(min(self.k, self._n_words)):
+            yield k, self._word_errors[k] + self._word_fixed[k]
+        if self.k < self._n_words and self.n >= self._m:
+            yield self.k, self._dp[self.n * self._cols + self._m] + self._word_fixed[self.k]
+
+    def word(self, k):
+        """Target word k."""
+        return self.text[self._word_start[k]:self._word_start[k + 1] - 1]
+
+    def view(self):
+        """Typed text aligned to the target text, one character per target character."""
+        return self.view_buf.view
+
+    def live_ops(self):
+        """Alignment of the live word so far, in order."""
+        ops = []
+        if self.k < self._n_words:
+            self._trace(self.n, self.end, ops=ops)
+        ops.reverse()
+        return ops
+
+
+def align_word(target, typed, complete=True):
+    """[(kind, expected, typed), ...] aligning one typed word to its target word.
+
+    complete=False aligns to the best-matching prefix of the target, as for
+    a word still being typed.
+    """
+    aligner = WordAligner(target)
+    for ch in typed:
+        aligner.push(ch)
+    ops = []
+    aligner._trace(aligner.n, aligner._m if complete else aligner.end, ops=ops)
+    ops.reverse()
+    return ops
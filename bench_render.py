@@ -0,0 +1,187 @@
+# bench_render.py - Headless rendering benchmark
+#
+# Runs the real Renderer drawing functions under the SDL dummy video driver
+# with scripted typing and reports frames/sec and per-function timings for
+# every combination of theme, font size, text length and window size.
+#
+#   python bench_render.py
+#   python bench_render.py --frames 300 --themes monkeytype,nord --windows 1100x820,1920x1080 --csv bench.csv
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import config
+import render
+from logic import HistoryManager, TypingEngine
+from profiler import FrameProfiler
+
+SECTIONS = ["draw_settings_bar", "draw_hud", "draw_display", "draw_caret", "draw_keyboard", "draw_history_overlay"]
+
+
+def _parse_list(value, cast=str):
+    return [cast(v) for v in value.split(",") if v]
+
+
+def _parse_window(value):
+    w, h = value.lower().split("x")
+    return int(w), int(h)
+
+
+def _make_text(length, rng):
+    words = []
+    total = 0
+    engine = TypingEngine(mode="word", word_count=10, rng=rng)
+    while total < length:
+        engine.reset()
+        for w in engine.words:
+            words.append(w)
+            total += len(w) + 1
+    return " ".join(words)[:length].rstrip()
+
+
+def _fake_history(path, rng, n=50):
+    history = [
+        {"timestamp": f"2026-01-{1 + i % 28:02d} 12:00:00", "mode": "time",
+         "wpm": rng.randint(40, 90), "accuracy": rng.randint(85, 100), "missed": rng.randint(0, 12),
+         "consistency": rng.randint(50, 90),
+         "timeline": {"wpm": [rng.randint(40, 90) for _ in range(30)], "raw": [], "err": []}}
+        for i in range(n)
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(history, f)
+
+
+def run_case(theme_name, font_size, text_length, window, frames, with_history, seed=0):
+    """Benchmark one combination; returns a result dict."""
+    rng = random.Random(seed)
+    screen = pygame.display.set_mode(window)
+    renderer = render.Renderer(config.get_font_size_px(font_size))
+    theme = render.theme_colors(theme_name)
+    settings = config.DEFAULTS.copy()
+    settings.update({"theme": theme_name, "font_size": font_size, "mode": "word"})
+
+    engine = TypingEngine(mode="word", word_count=10, rng=rng)
+    text = _make_text(text_length, rng)
+    engine.target_text = text
+
+    prof = FrameProfiler(frames=frames, enabled=True)
+    renderer.profiler = prof
+    start = time.perf_counter()
+    for frame in range(frames):
+        prof.begin_frame()
+        # Scripted input: one key per frame, a wrong key every 17th
+        idx = engine.caret
+        if idx >= len(engine.target_text):
+            engine.reset()
+            engine.target_text = text
+            idx = 0
+        key = engine.target_text[idx] if frame % 17 else "#"
+        engine.process_key(key)
+
+        cx, cy, cw, ch = render.content_rect(screen.get_size())
+        layouts = render.layout_rects(cx, cy, cw)
+        screen.fill(theme["bg"])
+        with prof.section("draw_settings_bar"):
+            renderer.draw_settings_bar(screen, theme, *layouts["settings"], settings)
+        with prof.section("draw_hud"):
+            renderer.draw_hud(screen, theme, *layouts["hud"], 0, engine.wpm, engine.accuracy)
+        with prof.section("draw_display"):
+            caret = renderer.draw_display(screen, theme, *layouts["display"], engine.target_text, engine.typed)
+        if caret:
+            with prof.section("draw_caret"):
+                renderer.draw_caret(screen, theme, caret)
+        with prof.section("draw_keyboard"):
+            renderer.draw_keyboard(screen, theme, *layouts["keyboard"], settings["layout"], key, key != "#")
+        if with_history:
+            with prof.section("draw_history_overlay"):
+                renderer.draw_history_overlay(screen, theme)
+        with prof.section("flip"):
+            pygame.display.flip()
+        prof.end_frame()
+    elapsed = time.perf_counter() - start
+
+    per_section = {name: (p50, p95) for name, p50, p95, _p99 in prof.summary()}
+    allocs = dict((name, last) for name, last, _peak in prof.counter_summary())
+    return {
+        "theme": theme_name,
+        "font_size": font_size,
+        "text_length": text_length,
+        "window": f"{window[0]}x{window[1]}",
+        "fps": frames / elapsed if elapsed else 0.0,
+        "sections": per_section,
+        "surface_allocs": int(allocs.get("surface_alloc", 0)),
+        "glyph_renders": int(allocs.get("glyph_render", 0)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless PythonType rendering benchmark")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--themes", default="monkeytype,high_contrast")
+    parser.add_argument("--font-sizes", default="small,large")
+    parser.add_argument("--text-lengths", default="100,600")
+    parser.add_argument("--windows", default="1100x820,1920x1080")
+    parser.add_argument("--no-history", action="store_true", help="skip the history overlay")
+    parser.add_argument("--csv", help="also write results to this CSV file")
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    # Synthetic history so the overlay benchmark doesn't depend on the user's file
+    fd, history_path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    original_history_path = HistoryManager.FILE_PATH
+    HistoryManager.FILE_PATH = history_path
+    _fake_history(history_path, random.Random(0))
+
+    results = []
+    try:
+        for theme_name in _parse_list(args.themes):
+            for font_size in _parse_list(args.font_sizes):
+                for text_length in _parse_list(args.text_lengths, int):
+                    for window in _parse_list(args.windows, _parse_window):
+                        results.append(run_case(theme_name, font_size, text_length, window,
+                                                args.frames, not args.no_history))
+    finally:
+        HistoryManager.FILE_PATH = original_history_path
+        os.unlink(history_path)
+        pygame.quit()
+
+    columns = SECTIONS + ["flip", "frame"]
+    header = f"{'theme':<16}{'font':<8}{'len':>5} {'window':<11}{'fps':>8}{'allocs':>7}  " + "  ".join(f"{c[5:] if c.startswith('draw_') else c:>14}" for c in columns)
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        cells = []
+        for c in columns:
+            p50, p95 = r["sections"].get(c, (0.0, 0.0))
+            cells.append(f"{p50:6.2f}/{p95:6.2f} ".rjust(14))
+        print(f"{r['theme']:<16}{r['font_size']:<8}{r['text_length']:>5} {r['window']:<11}{r['fps']:>8.1f}{r['surface_allocs']:>7}{r['glyph_renders']:>7}  " + "  ".join(cells))
+    print("\nper-function cells: p50/p95 ms; allocs / glyphs: Surfaces allocated / text renders in the last frame")
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["theme", "font_size", "text_length", "window", "fps", "surface_allocs", "glyph_renders"]
+                       + [f"{c}_{stat}_ms" for c in columns for stat in ("p50", "p95")])
+            for r in results:
+                row = [r["theme"], r["font_size"], r["text_length"], r["window"], f"{r['fps']:.2f}",
+                       r["surface_allocs"], r["glyph_renders"]]
+                for c in columns:
+                    p50, p95 = r["sections"].get(c, (0.0, 0.0))
+                    row += [f"{p50:.3f}", f"{p95:.3f}"]
+                w.writerow(row)
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,128 @@
+# book.py - Book mode: typing through a large text file a page at a time
+#
+# The file is memory-mapped and only the bytes of the current page are
+# ever decoded, so memory doesn't grow with the file. A page is up to
+# PAGE_BYTES of the file, cut at whitespace. Its text is normalized when
+# the page is read: runs of whitespace (line breaks included) become one
+# space, typographic quotes and dashes become the ASCII ones on the
+# keyboard, and characters that can't be typed are dropped.
+#
+# Progress is a byte offset into the file. Each page keeps the file offset
+# of every word it shows, so a test stopped halfway resumes at the first
+# word that wasn't finished.
+import array
+import mmap
+import os
+import sys
+import unicodedata
+
+PAGE_BYTES = 640  # about a hundred words of English prose
+_WHITESPACE = b" \t\r\n\f\v"
+_TYPOGRAPHY = str.maketrans({
+    "‘": "'", "’": "'", "‚": "'", "‛": "'", "′": "'",
+    "“": '"', "”": '"', "„": '"', "‟": '"', "″": '"',
+    "«": '"', "»": '"',
+    "‐": "-", "‑": "-", "‒": "-", "–": "-", "—": "-", "―": "-", "−": "-",
+    "­": None, "﻿": None, "�": None,
+})
+
+
+def normalize_word(raw):
+    """A word of the file as it is typed: NFKC, ASCII quotes and dashes, printable characters only."""
+    word = unicodedata.normalize("NFKC", raw).translate(_TYPOGRAPHY)
+    return "".join(ch for ch in word if ch.isprintable() and not ch.isspace())
+
+
+class BookPage:
+    """One page: its normalized text and, per word, the file offset it came from."""
+
+    __slots__ = ("start", "end", "text", "word_offsets", "size")
+
+    def __init__(self, start, end, text, word_offsets, size):
+        self.start = start  # file offset of the first word
+        self.end = end  # file offset just past the page
+        self.text = text
+        self.word_offsets = word_offsets  # array("Q"), one per word of text
+        self.size = size  # of the whole file
+
+    @property
+    def progress(self):
+        """Fraction of the file before this page."""
+        return self.start / self.size if self.size else 1.0
+
+    def offset_of_word(self, k):
+        """File offset to resume at word k (the end of the page past the last word)."""
+        return self.word_offsets[k] if k < len(self.word_offsets) else self.end
+
+
+class Book:
+    """A text file read through mmap, one page at a time."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        st = os.fstat(self._file.fileno())
+        self.size = st.st_size
+        self.mtime_ns = st.st_mtime_ns
+        self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+
+    def page(self, offset, max_bytes=PAGE_BYTES):
+        """The page starting at byte `offset` (from the start once past the end of the file)."""
+        buf, size = self._buf, self.size
+        if not 0 <= offset < size:
+            offset = 0
+        # A page may start inside a word or after whitespace (offsets come from word starts)
+        while offset < size and buf[offset] in _WHITESPACE:
+            offset += 1
+        if offset >= size:
+            offset = 0
+            while offset < size and buf[offset] in _WHITESPACE:
+                offset += 1
+        end = min(offset + max_bytes, size)
+        if end < size:
+            cut = max(buf.rfind(ws, offset, end) for ws in (b" ", b"\n", b"\t", b"\r"))
+            if cut > offset:
+                end = cut
+            else:  # one word longer than a page: cut it at a character boundary
+                while end > offset + 1 and buf[end] & 0xC0 == 0x80:
+                    end -= 1
+        words, offsets = [], array.array("Q")
+        word_start = None
+        for i in range(offset, end + 1):
+            at_space = i == end or buf[i] in _WHITESPACE
+            if word_start is None:
+                if not at_space:
+                    word_start = i
+            elif at_space:
+                word = normalize_word(str(buf[word_start:i], "utf-8", "replace"))
+                if word:
+                    words.append(word)
+                    offsets.append(word_start)
+                word_start = None
+        return BookPage(offset, end, " ".join(words), offsets, size)
+
+    def close(self):
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        self._file.close()
+
+
+_books = {}  # path -> Book
+
+
+def open_book(path):
+    """The (cached) Book for a path; reopened if the file changed. None if it can't be read."""
+    path = os.path.abspath(path)
+    book = _books.get(path)
+    try:
+        st = os.stat(path)
+        if book is not None and (book.size, book.mtime_ns) == (st.st_size, st.st_mtime_ns):
+            return book
+        if book is not None:
+            book.close()
+        book = _books[path] = Book(path)
+        return book
+    except (OSError, ValueError) as e:
+        print(f"Error opening book {path}: {e}", file=sys.stderr)
+        _books.pop(path, None)
+        return None
@@ -14,11 +14,28 @@ DEFAULTS = {
     "font_size": "medium",  # small | medium | large
     "sound_on_error": False,
     "reduced_motion": False,
+    "language": "english",  # corpus under corpora/<language>/
+    "word_set": 200,  # top-N most frequent words to sample from
+    "quote_length": "all",  # all | short | medium | long | thicc
+    "drill": "home_row",  # drill mode key set: home_row | top_row | bottom_row | left_hand | right_hand | no_e
+    "book_path": "",  # text file typed in book mode, a page per test
+    "code_dir": "",  # source tree code mode takes snippets from ("" = PythonType's own source)
+    "practice_source": "markov",  # markov (generated pseudo-words) | words (corpus words) | quotes
+    "daily_seed": False,  # everyone gets the same text on the same (UTC) day
+    "record_latency": False,  # save the input-to-display latency histogram with each result
+    "ghost": False,  # race the best previous run on the same text
+    "key_heatmap": False,  # tint the keyboard by the saved time to each key
+    "stats_half_life_days": 14,  # missed characters and key timings fade by half this often (0 = never)
+    "race_port": 0,  # UDP port for races on the LAN (0 = off)
+    "race_peers": [],  # other racers as "host:port"
 }
 
 # Allowed values for validation
 DURATION_OPTIONS = [15, 30, 60, 120]
 WORD_COUNT_OPTIONS = [10, 25, 50, 100]
+WORD_SET_OPTIONS = [200, 1000, 10000]
+QUOTE_LENGTH_OPTIONS = ["all", "short", "medium", "long", "thicc"]
+PRACTICE_SOURCE_OPTIONS = ["markov", "words", "quotes"]
 FONT_SIZE_MAP = {"small": 20, "medium": 28, "large": 36}
 
 
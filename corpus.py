@@ -0,0 +1,292 @@
+# corpus.py - Packed, memory-mapped word and quote corpora
+#
+# A corpus lives in corpora/<language>/ and holds up to two files:
+#   words.bin   - words in frequency order (most common first)
+#   quotes.bin  - one quote per entry
+#
+# A quote index (quotes.idx, see quote_index.py) is built next to quotes.bin
+# the first time quotes are selected.
+#
+# Both use the same packed layout so entries can be read without decoding
+# the whole file:
+#   magic (4s) | version (H) | reserved (H) | count (I)
+#   offsets    (count + 1) x uint32, relative to the start of the data block
+#   data       UTF-8 bytes of every entry, back to back
+#
+# Files are memory-mapped on first use. The built-in English lists in
+# resources.py stand in for any file that is missing or unreadable.
+import mmap
+import os
+import random
+import struct
+import sys
+
+import resources
+from quote_index import QuoteIndex
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPORA_DIR = os.path.join(_APP_DIR, "corpora")
+
+MAGIC = b"PTCP"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHI")
+_OFFSET = struct.Struct("<I")
+
+DEFAULT_LANGUAGE = "english"
+
+
+class PackedList:
+    """Read-only sequence of strings over a packed buffer (mmap or bytes).
+
+    Entries are decoded on access; nothing is materialized up front.
+    """
+
+    def __init__(self, buf, owner=None):
+        try:
+            magic, version, _reserved, count = _HEADER.unpack_from(buf, 0)
+        except struct.error:
+            raise ValueError("truncated corpus header") from None
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a packed corpus file")
+        data_at = _HEADER.size + (count + 1) * _OFFSET.size
+        if data_at > len(buf) or data_at + _OFFSET.unpack_from(buf, data_at - _OFFSET.size)[0] > len(buf):
+            raise ValueError("corpus file is truncated")
+        self._buf = buf
+        self._owner = owner  # keeps the file object alive for the mmap
+        self._count = count
+        self._offsets_at = _HEADER.size
+        self._data_at = data_at
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map a packed file. Empty files cannot be mapped and yield an empty list."""
+        f = open(path, "rb")
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            f.close()
+            return cls(pack_strings([]))
+        except OSError:
+            f.close()
+            raise
+        try:
+            return cls(buf, owner=f)
+        except ValueError:
+            buf.close()
+            f.close()
+            raise
+
+    @classmethod
+    def from_strings(cls, items):
+        return cls(pack_strings(items))
+
+    @property
+    def mapped(self):
+        """True when backed by a memory-mapped file."""
+        return self._owner is not None
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("PackedList index out of range")
+        start, end = struct.unpack_from("<II", self._buf, self._offsets_at + i * _OFFSET.size)
+        return str(self._buf[self._data_at + start : self._data_at + end], "utf-8")
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def entry_length(self, i):
+        """Byte length of entry i without decoding it."""
+        start, end = struct.unpack_from("<II", self._buf, self._offsets_at + i * _OFFSET.size)
+        return end - start
+
+    def sample(self, k, rng=random, limit=None):
+        """Return k distinct entries drawn from the first `limit` entries."""
+        n = self._count if limit is None else min(limit, self._count)
+        idxs = rng.sample(range(n), min(k, n))
+        return [self[i] for i in idxs]
+
+    def choice(self, rng=random, limit=None):
+        n = self._count if limit is None else min(limit, self._count)
+        if n == 0:
+            raise IndexError("cannot choose from an empty corpus")
+        return self[rng.randrange(n)]
+
+    def close(self):
+        if self._owner is not None:
+            self._buf.close()
+            self._owner.close()
+            self._owner = None
+
+
+def pack_strings(items):
+    """Encode a list of strings into the packed corpus layout."""
+    encoded = [s.encode("utf-8") for s in items]
+    offsets = [0]
+    for b in encoded:
+        offsets.append(offsets[-1] + len(b))
+    if offsets[-1] > 0xFFFFFFFF:
+        raise ValueError("corpus too large for 32-bit offsets")
+    header = _HEADER.pack(MAGIC, VERSION, 0, len(encoded))
+    table = struct.pack(f"<{len(offsets)}I", *offsets)
+    return header + table + b"".join(encoded)
+
+
+def write_packed(path, items):
+    """Write strings to `path` in packed form (atomic replace)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(pack_strings(items))
+    os.replace(tmp, path)
+
+
+class Corpus:
+    """Words and quotes for one language, loaded lazily."""
+
+    def __init__(self, language, directory=None):
+        self.language = language
+        self.directory = directory or os.path.join(CORPORA_DIR, language)
+        self._words = None
+        self._quotes = None
+        self._quote_index = None
+
+    def _load(self, filename, fallback):
+        path = os.path.join(self.directory, filename)
+        if os.path.isfile(path):
+            try:
+                return PackedList.open(path)
+            except (OSError, ValueError) as e:
+                print(f"Error loading corpus {path}: {e}", file=sys.stderr)
+        return PackedList.from_strings(fallback)
+
+    # A missing or broken file falls back to the built-in English list, so a
+    # corpus with only words.bin still has quotes (and vice versa)
+    @property
+    def words(self):
+        if self._words is None:
+            self._words = self._load("words.bin", resources.WORD_LIST)
+        return self._words
+
+    @property
+    def quotes(self):
+        if self._quotes is None:
+            self._quotes = self._load("quotes.bin", resources.QUOTE_LIST)
+        return self._quotes
+
+    @property
+    def quote_index(self):
+        if self._quote_index is None:
+            quotes = self.quotes
+            path = os.path.join(self.directory, "quotes.bin")
+            if quotes.mapped:
+                st = os.stat(path)
+                self._quote_index = QuoteIndex.load_or_build(
+                    quotes, os.path.join(self.directory, "quotes.idx"), st.st_size, st.st_mtime_ns
+                )
+            else:
+                # Built-in quotes are tiny; index them in memory only
+                self._quote_index = QuoteIndex.build(quotes)
+        return self._quote_index
+
+    def sample_words(self, k, rng=random, limit=None):
+        """k distinct words from the top-`limit` most frequent words."""
+        return self.words.sample(k, rng=rng, limit=limit)
+
+    def iter_words(self, limit=None):
+        words = self.words
+        n = len(words) if limit is None else min(limit, len(words))
+        for i in range(n):
+            yield words[i]
+
+    def random_quote(self, rng=random, length="all"):
+        """Random quote in a length bucket (short/medium/long/thicc); any length if the bucket is empty."""
+        qid = self.quote_index.pick(length, rng)
+        if qid is None:
+            qid = self.quote_index.pick("all", rng)
+        if qid is None:
+            raise IndexError("cannot choose from an empty corpus")
+        return self.quotes[qid]
+
+    def quote_for_missed(self, missed_counts, rng=random, length="all"):
+        """Random quote heavy in the given missed characters (see QuoteIndex.pick_heavy)."""
+        if self.quote_index.count(length) == 0:
+            length = "all"
+        qid = self.quote_index.pick_heavy(missed_counts, length, rng)
+        if qid is None:
+            raise IndexError("cannot choose from an empty corpus")
+        return self.quotes[qid]
+
+    def close(self):
+        for lst in (self._words, self._quotes):
+            if lst is not None:
+                lst.close()
+        self._words = self._quotes = self._quote_index = None
+
+
+_corpora = {}
+
+
+def get_corpus(language=DEFAULT_LANGUAGE):
+    """Return the (cached) corpus for a language; falls back to English if it doesn't exist."""
+    if language not in _corpora:
+        if not valid_language_name(language):
+            return get_corpus(DEFAULT_LANGUAGE)
+        directory = os.path.join(CORPORA_DIR, language)
+        if language != DEFAULT_LANGUAGE and not os.path.isdir(directory):
+            return get_corpus(DEFAULT_LANGUAGE)
+        _corpora[language] = Corpus(language, directory)
+    return _corpora[language]
+
+
+def valid_language_name(language):
+    """A language is a plain directory name under corpora/ (no separators, no "..")."""
+    return (isinstance(language, str) and bool(language) and not language.startswith(".")
+            and os.path.basename(language) == language and "/" not in language and "\\" not in language)
+
+
+def available_languages():
+    """Languages with a corpus directory, plus the built-in default."""
+    langs = {DEFAULT_LANGUAGE}
+    if os.path.isdir(CORPORA_DIR):
+        for name in os.listdir(CORPORA_DIR):
+            if valid_language_name(name) and os.path.isdir(os.path.join(CORPORA_DIR, name)):
+                langs.add(name)
+    return sorted(langs)
+
+
+def _read_lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def build_corpus(language, words_txt=None, quotes_txt=None):
+    """Pack plain-text lists (one entry per line) into corpora/<language>/.
+
+    The words file must already be sorted by frequency, most common first.
+    """
+    if not valid_language_name(language):
+        raise ValueError(f"invalid language name {language!r}")
+    directory = os.path.join(CORPORA_DIR, language)
+    if words_txt:
+        write_packed(os.path.join(directory, "words.bin"), _read_lines(words_txt))
+    if quotes_txt:
+        write_packed(os.path.join(directory, "quotes.bin"), _read_lines(quotes_txt))
+    cached = _corpora.pop(language, None)
+    if cached is not None:
+        cached.close()
+    return directory
+
+
+if __name__ == "__main__":
+    # Usage: python corpus.py <language> <words.txt> [quotes.txt]
+    if len(sys.argv) < 3:
+        print("usage: python corpus.py <language> <words.txt> [quotes.txt]", file=sys.stderr)
+        sys.exit(1)
+    out = build_corpus(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+    print(f"Corpus written to {out}")
@@ -0,0 +1,59 @@
+# decay.py - Exponentially time-decayed counters for typing_stats.json
+#
+# A counter is stored as [value, last_update] (Unix seconds). Its value
+# halves every half-life, but the decay is only applied when the counter
+# is touched: add() decays the stored value up to now and adds to it, and
+# readers decay on the fly. Saving a test therefore rewrites only the
+# counters it changes, however many have accumulated.
+#
+# Counters saved before decay existed are plain numbers. migrate() stamps
+# them once with the time of the first save that knows about decay; until
+# then they are read as if last updated now.
+import time
+
+DEFAULT_HALF_LIFE_DAYS = 14.0
+DAY = 86400.0
+MIN_VALUE = 0.01  # decayed below this, a counter is treated as forgotten
+
+
+def factor(then, now, half_life_days):
+    """Multiplier for something last updated at `then`; half_life_days <= 0 never decays."""
+    if half_life_days <= 0 or now <= then:
+        return 1.0
+    return 0.5 ** ((now - then) / (half_life_days * DAY))
+
+
+def value(entry, now, half_life_days):
+    """Current value of a stored counter ([value, ts] or a legacy number)."""
+    if isinstance(entry, (int, float)):
+        return entry
+    count, then = entry
+    return count * factor(then, now, half_life_days)
+
+
+def add(counts, key, n, now, half_life_days):
+    """counts[key] += n, decaying the old value to `now` first."""
+    entry = counts.get(key)
+    old = value(entry, now, half_life_days) if entry is not None else 0.0
+    counts[key] = [round(old + n, 6), now]
+
+
+def migrate(counts, now):
+    """Turn plain-number counters into [value, now]; returns how many changed."""
+    changed = 0
+    for key, entry in counts.items():
+        if isinstance(entry, (int, float)):
+            counts[key] = [entry, now]
+            changed += 1
+    return changed
+
+
+def current(counts, now=None, half_life_days=DEFAULT_HALF_LIFE_DAYS):
+    """{key: decayed value} of every counter not yet forgotten, rounded to 2 decimals."""
+    now = time.time() if now is None else now
+    out = {}
+    for key, entry in counts.items():
+        v = value(entry, now, half_life_days)
+        if v >= MIN_VALUE:
+            out[key] = round(v, 2)
+    return out
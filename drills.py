@@ -0,0 +1,123 @@
+# drills.py - Words restricted to a key set (home row, one hand, no "e", ...)
+#
+# Every word of a corpus gets a bitmask of the characters it uses: the keys
+# of the supported layouts have bits of their own, other characters get
+# one in order of appearance, and once those run out the rest share the
+# top bit (which no drill allows).
+# A key set is a mask too, so a word fits the drill when
+#   word_mask & ~keyset_mask == 0
+# NumPy, when installed, does that test for the whole corpus in one
+# vectorized AND; otherwise it runs over an array.array of masks.
+#
+# Masks are built once per (language, word set); the word list that fits
+# a drill is cached per (language, word set, layout, drill).
+import array
+import random
+import string
+
+import corpus
+import keytiming
+
+try:
+    import numpy
+except ImportError:  # optional: the pure-Python filter gives the same result
+    numpy = None
+
+MASK_BITS = 64  # bit 63 stands for every character without its own bit
+DRILLS = ("home_row", "top_row", "bottom_row", "left_hand", "right_hand", "no_e")
+DRILL_LABELS = {"home_row": "Home", "top_row": "Top", "bottom_row": "Bottom",
+                "left_hand": "Left", "right_hand": "Right", "no_e": "No E"}
+MAX_CACHED_DRILLS = 32
+# Every key a drill can ask for, so each has its own bit
+_KEY_CHARS = sorted(set("".join(row for rows in keytiming.LAYOUT_ROWS.values() for row in rows)))
+
+
+def drill_keys(drill, layout="qwerty"):
+    """Characters a drill may use on a keyboard layout (letters and punctuation on the keys)."""
+    rows = keytiming.LAYOUT_ROWS.get(layout, keytiming.KEYBOARD_ROWS_QWERTY)
+    if drill == "top_row":
+        return set(rows[0])
+    if drill == "home_row":
+        return set(rows[1])
+    if drill == "bottom_row":
+        return set(rows[2])
+    if drill in ("left_hand", "right_hand"):
+        left = drill == "left_hand"
+        right_index = keytiming.FINGERS.index("right_index")
+        return {ch for ch, finger in keytiming.finger_map(layout).items()
+                if ch != " " and (finger < right_index) == left}
+    if drill == "no_e":
+        return set("".join(rows)) - {"e"}
+    raise ValueError(f"unknown drill {drill!r}")
+
+
+class CharsetIndex:
+    """Character-set bitmasks of a word list."""
+
+    def __init__(self, words, n=None):
+        self.words = words  # any sequence of str (a PackedList, say); only the first n are indexed
+        n = len(words) if n is None else min(n, len(words))
+        bits = {ch: 1 << i for i, ch in enumerate(_KEY_CHARS)}
+        masks = array.array("Q", bytes(8 * n))
+        other = 1 << (MASK_BITS - 1)
+        for i in range(n):
+            word = words[i]
+            mask = 0
+            for ch in word:
+                bit = bits.get(ch)
+                if bit is None:
+                    bit = bits[ch] = 1 << len(bits) if len(bits) < MASK_BITS - 1 else other
+                mask |= bit
+            masks[i] = mask
+        self.bits = bits
+        self.masks = masks
+        self._np_masks = numpy.frombuffer(masks, dtype=numpy.uint64) if numpy is not None and len(masks) else None
+
+    def mask_of(self, chars):
+        """Mask of a set of characters; characters no word uses are ignored."""
+        mask = 0
+        for ch in chars:
+            mask |= self.bits.get(ch, 0)
+        return mask & ~(1 << (MASK_BITS - 1))  # a rare character never fits a drill
+
+    def matching(self, chars):
+        """Indices (array of uint32) of the words made only of `chars`."""
+        outside = ~self.mask_of(chars) & ((1 << MASK_BITS) - 1)
+        if self._np_masks is not None:
+            hits = numpy.flatnonzero((self._np_masks & numpy.uint64(outside)) == 0)
+            return array.array("I", hits.astype(numpy.uint32).tobytes())
+        return array.array("I", [i for i, mask in enumerate(self.masks) if not mask & outside])
+
+
+_indexes = {}  # (language, word set) -> CharsetIndex
+_drills = {}  # (language, word set, layout, drill) -> matching word indices
+
+
+def get_index(language=corpus.DEFAULT_LANGUAGE, limit=None):
+    key = (language, limit)
+    index = _indexes.get(key)
+    if index is None:
+        index = _indexes[key] = CharsetIndex(corpus.get_corpus(language).words, limit)
+    return index
+
+
+def drill_words(count, drill="home_row", layout="qwerty", language=corpus.DEFAULT_LANGUAGE, limit=None,
+                rng=random):
+    """`count` words for a drill, drawn from the words that only use its keys.
+
+    Words repeat when too few fit; with none at all, the drill is made of
+    3-5 letter groups of its keys.
+    """
+    index = get_index(language, limit)
+    key = (language, limit, layout, drill)
+    hits = _drills.get(key)
+    if hits is None:
+        if len(_drills) >= MAX_CACHED_DRILLS:
+            _drills.clear()
+        hits = _drills[key] = index.matching(drill_keys(drill, layout))
+    if not hits:
+        letters = sorted(ch for ch in drill_keys(drill, layout) if ch in string.ascii_letters) or ["a"]
+        return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 5))) for _ in range(count)]
+    if len(hits) >= count:
+        return [index.words[i] for i in rng.sample(hits, count)]
+    return [index.words[rng.choice(hits)] for _ in range(count)]
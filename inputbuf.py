@@ -0,0 +1,84 @@
+# inputbuf.py - Growable character buffers for the typing engine
+#
+# Characters are stored as code points in an array("I") that doubles when
+# full, so append and pop are O(1) and don't allocate once the buffer has
+# grown to the test's length. Frontends read the text through a TextView:
+# read-only, indexable like a str (view[i] is a 1-character str) and equal
+# to the str it holds.
+import array
+
+INITIAL_CAPACITY = 256
+
+
+class CharBuffer:
+    __slots__ = ("codes", "length", "view")
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.codes = array.array("I", bytes(4 * max(1, capacity)))
+        self.length = 0
+        self.view = TextView(self)
+
+    def clear(self):
+        self.length = 0
+
+    def reserve(self, capacity):
+        """Grow (never shrink) to hold at least `capacity` characters."""
+        while len(self.codes) < capacity:
+            self.codes.extend(self.codes)
+
+    def append(self, ch):
+        if self.length == len(self.codes):
+            self.codes.extend(self.codes)  # double; the copied values are overwritten
+        self.codes[self.length] = ord(ch)
+        self.length += 1
+
+    def pop(self):
+        """Drop the last character and return it ("" when empty)."""
+        if not self.length:
+            return ""
+        self.length -= 1
+        return chr(self.codes[self.length])
+
+
+class TextView:
+    """Read-only str-like view of a CharBuffer."""
+
+    __slots__ = ("_buf",)
+
+    def __init__(self, buf):
+        self._buf = buf
+
+    def __len__(self):
+        return self._buf.length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return str(self)[i]
+        n = self._buf.length
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("TextView index out of range")
+        return chr(self._buf.codes[i])
+
+    def __iter__(self):
+        codes = self._buf.codes
+        for i in range(self._buf.length):
+            yield chr(codes[i])
+
+    def __str__(self):
+        codes = self._buf.codes
+        return "".join(map(chr, codes[: self._buf.length]))
+
+    def __repr__(self):
+        return repr(str(self))
+
+    def __eq__(self, other):
+        if isinstance(other, TextView):
+            other = str(other)
+        if not isinstance(other, str):
+            return NotImplemented
+        return len(other) == self._buf.length and str(self) == other
+
+    def __bool__(self):
+        return self._buf.length > 0
@@ -0,0 +1,172 @@
+# journal.py - Crash-safe checkpoint of the test in progress
+#
+# Nothing of a test is saved until it ends, so the engine also writes it to
+# a small memory-mapped file as it goes: when the first key starts the test,
+# a header with its mode, seed, settings and text; then one 8-byte record
+# per key (seconds since the start as a float32, and the code point). A key
+# costs a struct.pack_into into the mapping plus one for the key count, with
+# no system call: the kernel writes the pages back on its own, so a crash or
+# kill of the app loses nothing. (A power cut can lose the last few seconds.)
+# The count is written after its record, so a torn write drops at most that key.
+#
+# When the test ends (or the app quits normally) the header is marked
+# closed. A journal found still open at launch is an interrupted test: the
+# frontend offers to continue it or to record its result, both by replaying
+# the keys into a TypingEngine (TypingEngine.resume).
+#
+# File layout (little-endian):
+#   magic (4s) | version (H) | state (H) | n_keys (I) | session_len (I) | start_time (d)
+#   session   JSON {"mode", "seed", "daily", "params", "text"}, padded to 8 bytes
+#   keys      n_keys x (t f, code point I)
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+MAGIC = b"PTJR"
+VERSION = 1
+CLOSED, OPEN = 0, 1
+_HEADER = struct.Struct("<4sHHIId")
+_STATE = struct.Struct("<H")
+_COUNT = struct.Struct("<I")
+_KEY = struct.Struct("<fI")
+_STATE_AT = 6
+_COUNT_AT = 8
+FILE_BYTES = 64 * 1024  # a few thousand keys; doubled when a test outgrows it
+
+JOURNAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "typing_journal.bin")
+
+
+class Checkpoint:
+    """An interrupted test read back from the journal."""
+
+    __slots__ = ("mode", "seed", "daily", "params", "text", "start_time", "keys", "times")
+
+    def __init__(self, session, start_time, keys, times):
+        self.mode = session["mode"]
+        self.seed = session["seed"]
+        self.daily = session.get("daily", False)
+        self.params = session["params"]
+        self.text = session["text"]
+        self.start_time = start_time  # time.time() of the first key
+        self.keys = keys  # str of the keys typed, backspaces included
+        self.times = times  # seconds from the start, per key
+
+    def describe(self, now=None):
+        """One line for the recovery prompt."""
+        minutes = int(((time.time() if now is None else now) - self.start_time) // 60)
+        ago = "just now" if minutes < 1 else f"{minutes} min ago" if minutes < 120 else f"{minutes // 60} h ago"
+        return f"{self.mode} test, {len(self.keys)} keys, started {ago}"
+
+
+def _session_end(session_len):
+    return _HEADER.size + (session_len + 7) // 8 * 8
+
+
+def read_checkpoint(path=JOURNAL_PATH):
+    """The interrupted test in a journal file, or None if there is none (or it's unreadable)."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, state, n_keys, session_len, start_time = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION or state != OPEN or not n_keys:
+            return None
+        session = json.loads(data[_HEADER.size:_HEADER.size + session_len].decode("utf-8"))
+        at = _session_end(session_len)
+        records = list(_KEY.iter_unpack(data[at:at + n_keys * _KEY.size]))
+        if len(records) != n_keys:
+            return None
+        return Checkpoint(session, start_time, "".join(chr(code) for _t, code in records),
+                          [t for t, _code in records])
+    except FileNotFoundError:
+        return None
+    except (OSError, struct.error, ValueError, KeyError, TypeError) as e:
+        print(f"Error reading the session journal: {e}", file=sys.stderr)
+        return None
+
+
+class Journal:
+    """Writer of the journal file; TypingEngine calls begin(), key() and end()."""
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self._file = None
+        self._buf = None
+        self._keys_at = 0
+        self._n = 0
+        self._capacity = 0
+        self.active = False
+
+    def pending(self):
+        """Checkpoint of the test interrupted last time, if any."""
+        return read_checkpoint(self.path)
+
+    def _map(self, size):
+        if self._file is None:
+            self._file = open(self.path, "a+b")  # created if missing, never truncated here
+        if self._buf is not None:
+            self._buf.close()
+        self._file.truncate(max(size, os.fstat(self._file.fileno()).st_size))
+        self._buf = mmap.mmap(self._file.fileno(), 0)
+
+    def begin(self, engine):
+        """Start journaling the test `engine` just started."""
+        session = json.dumps({"mode": engine.mode, "seed": engine.seed, "daily": engine.daily,
+                              "params": engine.session_params(), "text": engine.target_text}).encode("utf-8")
+        self._keys_at = _session_end(len(session))
+        try:
+            if self._buf is None or len(self._buf) < self._keys_at + FILE_BYTES // 2:
+                self._map(self._keys_at + FILE_BYTES)
+            buf = self._buf
+            _STATE.pack_into(buf, _STATE_AT, CLOSED)  # not a test until the header is complete
+            buf[_HEADER.size:_HEADER.size + len(session)] = session
+            _HEADER.pack_into(buf, 0, MAGIC, VERSION, OPEN, 0, len(session), engine.start_time)
+        except (OSError, ValueError) as e:
+            print(f"Error opening the session journal: {e}", file=sys.stderr)
+            self.active = False
+            return
+        self._n = 0
+        self._capacity = (len(buf) - self._keys_at) // _KEY.size
+        self.active = True
+
+    def key(self, ch, t):
+        """Append one key, typed t seconds after the start."""
+        if not self.active:
+            return
+        if self._n >= self._capacity:
+            try:
+                self._map(2 * len(self._buf))
+            except (OSError, ValueError) as e:
+                print(f"Error growing the session journal: {e}", file=sys.stderr)
+                self.active = False
+                return
+            self._capacity = (len(self._buf) - self._keys_at) // _KEY.size
+        _KEY.pack_into(self._buf, self._keys_at + self._n * _KEY.size, t, ord(ch))
+        self._n += 1
+        _COUNT.pack_into(self._buf, _COUNT_AT, self._n)
+
+    def end(self):
+        """The test ended (or was abandoned): nothing to recover."""
+        if self.active:
+            _STATE.pack_into(self._buf, _STATE_AT, CLOSED)
+            self.active = False
+
+    def discard(self):
+        """Close an interrupted test found at launch without recovering it."""
+        try:
+            with open(self.path, "r+b") as f:
+                f.seek(_STATE_AT)
+                f.write(_STATE.pack(CLOSED))
+        except OSError:
+            pass
+
+    def close(self):
+        self.end()
+        if self._buf is not None:
+            self._buf.close()
+            self._buf = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
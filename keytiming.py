@@ -0,0 +1,214 @@
+# keytiming.py - Per-key and per-finger keystroke timing
+#
+# Each correct key records the time since the previous key press (of any
+# kind), under the key pressed and the finger that presses it. Every key
+# and finger has a Welford accumulator (count, mean, sum of squared
+# deviations) and a fixed-bucket histogram for the p90, all in arrays
+# allocated once, so a key costs O(1) and allocates nothing.
+#
+# Saved stats ("key_timing" in typing_stats.json) hold the same numbers per
+# key and finger as [n, mean_ms, m2, histogram, last_update]; merge()
+# combines two of them exactly (Chan et al.), so totals don't depend on how
+# tests are split. Saved samples fade with a half-life (see decay.py): when
+# a key is saved again, its old weight, m2 and histogram are scaled down
+# first, so the mean and p90 follow recent typing.
+import array
+import time
+
+import decay
+
+KEYBOARD_ROWS_QWERTY = ["qwertyuiop[]", "asdfghjkl;\'", "zxcvbnm,./"]
+KEYBOARD_ROWS_DVORAK = ["\',.pyfgcrl/=", "aoeuidhtns-", ";qjkxbmwvz"]
+LAYOUT_ROWS = {"qwerty": KEYBOARD_ROWS_QWERTY, "dvorak": KEYBOARD_ROWS_DVORAK}
+
+FINGERS = ("left_pinky", "left_ring", "left_middle", "left_index",
+           "right_index", "right_middle", "right_ring", "right_pinky", "thumb")
+# Finger of each keyboard column (touch typing); later columns are the right pinky
+_COLUMN_FINGERS = (0, 1, 2, 3, 3, 4, 4, 5, 6)
+
+BUCKET_MS = 25  # histogram resolution
+BUCKETS = 40  # the last bucket holds everything from 975 ms up
+MAX_INTERVAL = 2.0  # seconds; longer gaps are pauses, not keystrokes
+MIN_SAMPLES = 5  # keys with fewer samples are left out of the heatmap
+ASCII = 128
+
+
+def finger_map(layout="qwerty"):
+    """{key: finger index into FINGERS} for a keyboard layout."""
+    fingers = {" ": FINGERS.index("thumb")}
+    for row in LAYOUT_ROWS.get(layout, KEYBOARD_ROWS_QWERTY):
+        for col, ch in enumerate(row):
+            fingers[ch] = _COLUMN_FINGERS[col] if col < len(_COLUMN_FINGERS) else FINGERS.index("right_pinky")
+    return fingers
+
+
+class KeyTiming:
+    """Interval stats of one test. Slots 0-127 are ASCII keys, then one per
+    finger; other keys get a slot the first time they are typed."""
+
+    __slots__ = ("layout", "_finger_of", "_extra", "slots", "n", "mean", "m2", "hist", "last")
+
+    def __init__(self, layout="qwerty"):
+        self.layout = layout
+        self._extra = {}  # non-ASCII key -> slot
+        self.slots = ASCII + len(FINGERS)
+        self.n = array.array("I", bytes(4 * self.slots))
+        self.mean = array.array("d", bytes(8 * self.slots))
+        self.m2 = array.array("d", bytes(8 * self.slots))
+        self.hist = array.array("I", bytes(4 * self.slots * BUCKETS))
+        self.set_layout(layout)
+        self.last = None
+
+    def set_layout(self, layout):
+        self.layout = layout
+        fingers = finger_map(layout)
+        # Finger slot per ASCII code, -1 for keys with no home on the layout
+        self._finger_of = array.array("i", [-1] * ASCII)
+        for ch, finger in fingers.items():
+            self._finger_of[ord(ch)] = ASCII + finger
+
+    def clear(self):
+        """Forget everything (keeps the buffers)."""
+        for buf in (self.n, self.mean, self.m2, self.hist):
+            buf[:] = array.array(buf.typecode, bytes(buf.itemsize * len(buf)))
+        self.last = None
+
+    def press(self, key, now, correct=True):
+        """A key went down at `now` (seconds); recorded if it was correct."""
+        last, self.last = self.last, now
+        if not correct or last is None:
+            return
+        dt = now - last
+        if not 0 <= dt <= MAX_INTERVAL:
+            return
+        ms = dt * 1000.0
+        ch = key.lower()
+        code = ord(ch)
+        if code < ASCII:
+            self._add(code, ms)
+            finger = self._finger_of[code]
+            if finger >= 0:
+                self._add(finger, ms)
+        else:
+            self._add(self._slot(ch), ms)
+
+    def _slot(self, ch):
+        slot = self._extra.get(ch)
+        if slot is None:
+            slot = self._extra[ch] = self.slots
+            self.slots += 1
+            self.n.append(0)
+            self.mean.append(0.0)
+            self.m2.append(0.0)
+            self.hist.extend([0] * BUCKETS)
+        return slot
+
+    def _add(self, slot, ms):
+        n = self.n[slot] + 1
+        self.n[slot] = n
+        mean = self.mean[slot]
+        delta = ms - mean
+        mean += delta / n
+        self.mean[slot] = mean
+        self.m2[slot] += delta * (ms - mean)
+        bucket = int(ms // BUCKET_MS)
+        self.hist[slot * BUCKETS + (bucket if bucket < BUCKETS else BUCKETS - 1)] += 1
+
+    def _entry(self, slot):
+        hist = self.hist[slot * BUCKETS:(slot + 1) * BUCKETS].tolist()
+        while hist and not hist[-1]:
+            hist.pop()
+        return [self.n[slot], self.mean[slot], self.m2[slot], hist]
+
+    def to_dict(self):
+        """{"keys": {key: entry}, "fingers": {finger: entry}} for keys typed at least once."""
+        keys = {chr(code): self._entry(code) for code in range(ASCII) if self.n[code]}
+        keys.update((ch, self._entry(slot)) for ch, slot in self._extra.items() if self.n[slot])
+        fingers = {name: self._entry(ASCII + i) for i, name in enumerate(FINGERS) if self.n[ASCII + i]}
+        return {"keys": keys, "fingers": fingers}
+
+    def summary(self, key):
+        """(n, mean_ms, variance, p90_ms) of a key or finger name, or None if never timed."""
+        if key in FINGERS:
+            slot = ASCII + FINGERS.index(key)
+        elif len(key) == 1 and ord(key) < ASCII:
+            slot = ord(key)
+        else:
+            slot = self._extra.get(key)
+        if slot is None or not self.n[slot]:
+            return None
+        return describe(self._entry(slot))
+
+
+# --- Saved entries: [n, mean_ms, m2, histogram(, last_update)] ---
+def merge(a, b):
+    """Combine two entries as if their samples had been recorded together."""
+    na, mean_a, m2a, hist_a = a[:4]
+    nb, mean_b, m2b, hist_b = b[:4]
+    n = na + nb
+    if not n:
+        return [0, 0.0, 0.0, []]
+    delta = mean_b - mean_a
+    hist = [x + y for x, y in zip(hist_a, hist_b)]
+    longer = hist_a if len(hist_a) > len(hist_b) else hist_b
+    hist.extend(longer[len(hist):])
+    return [n, mean_a + delta * nb / n, m2a + m2b + delta * delta * na * nb / n, hist]
+
+
+def percentile(hist, q):
+    """Upper edge (ms) of the bucket holding the q-th quantile; BUCKET_MS resolution."""
+    total = sum(hist)
+    if not total:
+        return 0
+    rank = q * total
+    seen = 0
+    for bucket, count in enumerate(hist):
+        seen += count
+        if seen >= rank:
+            return (bucket + 1) * BUCKET_MS
+    return len(hist) * BUCKET_MS
+
+
+def describe(entry):
+    """(n, mean_ms, variance, p90_ms) of an entry."""
+    n, mean, m2, hist = entry[:4]
+    return n, mean, m2 / (n - 1) if n > 1 else 0.0, percentile(hist, 0.9)
+
+
+def decayed(entry, now, half_life_days):
+    """The entry with its samples' weight faded to `now` (entries without a timestamp don't fade)."""
+    f = decay.factor(entry[4], now, half_life_days) if len(entry) > 4 else 1.0
+    if f == 1.0:
+        return entry[:4]
+    n, mean, m2, hist = entry[:4]
+    return [round(n * f, 4), mean, m2 * f, [round(count * f, 4) for count in hist]]
+
+
+def merge_into(saved, timing, now=None, half_life_days=decay.DEFAULT_HALF_LIFE_DAYS):
+    """Add a KeyTiming.to_dict() into a saved {"keys", "fingers"} dict in place; returns it.
+
+    Only the keys in `timing` are touched; their saved samples are faded to `now` first.
+    """
+    now = time.time() if now is None else now
+    for group in ("keys", "fingers"):
+        entries = saved.setdefault(group, {})
+        for key, entry in timing.get(group, {}).items():
+            if key in entries:
+                entry = merge(decayed(entries[key], now, half_life_days), entry)
+            entries[key] = entry[:4] + [now]
+    return saved
+
+
+def heatmap(saved, min_samples=MIN_SAMPLES, now=None, half_life_days=decay.DEFAULT_HALF_LIFE_DAYS):
+    """{key: 0..1} from saved key timing: 0 for the fastest mean interval, 1 for the slowest.
+
+    Keys count toward min_samples with their faded weight.
+    """
+    now = time.time() if now is None else now
+    means = {key: entry[1] for key, entry in saved.get("keys", {}).items()
+             if decayed(entry, now, half_life_days)[0] >= min_samples}
+    if not means:
+        return {}
+    lo, hi = min(means.values()), max(means.values())
+    span = hi - lo
+    return {key: (mean - lo) / span if span else 0.0 for key, mean in means.items()}
@@ -0,0 +1,158 @@
+# loadtest.py - Simulated typists against server.py
+#
+#   python server.py --no-persist &
+#   python loadtest.py --typists 2000 --wpm 80 --seconds 20
+#   python loadtest.py --spawn --typists 500     # start a throwaway server too
+#
+# Every typist runs word tests back to back, sending what it typed since the
+# last batch every --batch-ms, with occasional mistakes corrected by
+# backspace. Typists share --connections sockets (requests on a socket are
+# answered in order). Reports request throughput and round-trip latency.
+import argparse
+import array
+import asyncio
+import json
+import math
+import random
+import subprocess
+import sys
+import time
+
+import server
+
+DEFAULT_CONNECTIONS = 256  # stay well below the usual 1024 open-file limit
+
+
+class Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def open(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port, limit=server.MAX_LINE)
+        return cls(reader, writer)
+
+    async def request(self, req):
+        async with self._lock:
+            self.writer.write(json.dumps(req, separators=(",", ":")).encode() + b"\n")
+            await self.writer.drain()
+            line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        self.writer.close()
+
+
+class Stats:
+    def __init__(self):
+        self.latencies_ms = array.array("d")
+        self.keys = 0
+        self.tests = 0
+        self.errors = 0
+
+
+def _percentile(sorted_vals, p):
+    """Nearest-rank percentile (0-100)."""
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, max(0, math.ceil(p / 100 * len(sorted_vals)) - 1))]
+
+
+async def typist(name, conn, stats, rng, wpm, error_rate, batch_ms, word_count, deadline):
+    chars_per_batch = wpm * 5 / 60 * batch_ms / 1000
+    owed = rng.random() * chars_per_batch  # desynchronise the typists
+    await asyncio.sleep(rng.random() * batch_ms / 1000)
+    while time.perf_counter() < deadline:
+        resp = await conn.request({"op": "start", "mode": "word", "word_count": word_count,
+                                   "seed": rng.getrandbits(32), "user": name})
+        if not resp.get("ok"):
+            stats.errors += 1
+            return
+        sid, text, pos = resp["session"], resp["text"], 0
+        done = False
+        while not done and time.perf_counter() < deadline:
+            await asyncio.sleep(batch_ms / 1000)
+            owed += chars_per_batch
+            keys = []
+            while owed >= 1 and pos < len(text):
+                owed -= 1
+                if rng.random() < error_rate:
+                    keys += ["#", "\b"]
+                keys.append(text[pos])
+                pos += 1
+            if not keys:
+                continue
+            start = time.perf_counter()
+            resp = await conn.request({"op": "keys", "session": sid, "keys": "".join(keys)})
+            stats.latencies_ms.append((time.perf_counter() - start) * 1000)
+            stats.keys += len(keys)
+            if not resp.get("ok"):
+                stats.errors += 1
+                return
+            done = resp["done"]
+        if done:
+            stats.tests += 1
+        else:
+            await conn.request({"op": "finish", "session": sid})
+
+
+async def run(args):
+    proc = None
+    if args.spawn:
+        proc = subprocess.Popen([sys.executable, server.__file__, "--no-persist",
+                                 "--host", args.host, "--port", str(args.port)])
+        await asyncio.sleep(1.0)
+    try:
+        n_conn = max(1, min(args.connections, args.typists))
+        conns = [await Connection.open(args.host, args.port) for _ in range(n_conn)]
+        stats = Stats()
+        start = time.perf_counter()
+        deadline = start + args.seconds
+        await asyncio.gather(*(
+            typist(f"sim{i}", conns[i % n_conn], stats, random.Random(args.seed + i), args.wpm, args.error_rate,
+                   args.batch_ms, args.words, deadline)
+            for i in range(args.typists)
+        ))
+        elapsed = time.perf_counter() - start
+        server_stats = await conns[0].request({"op": "stats"})
+        for c in conns:
+            c.close()
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    lat = sorted(stats.latencies_ms)
+    print(f"typists {args.typists} over {n_conn} connections, {elapsed:.1f} s")
+    print(f"requests {len(lat)} ({len(lat) / elapsed:.0f}/s), keys {stats.keys} ({stats.keys / elapsed:.0f}/s), "
+          f"tests finished {stats.tests}, errors {stats.errors}")
+    print("round trip ms: " + "  ".join(f"p{p} {_percentile(lat, p):.2f}" for p in (50, 95, 99))
+          + f"  max {lat[-1] if lat else 0.0:.2f}")
+    print(f"server: {server_stats}")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test for server.py")
+    parser.add_argument("--host", default=server.DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=server.DEFAULT_PORT)
+    parser.add_argument("--typists", type=int, default=1000)
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS)
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--wpm", type=float, default=80.0)
+    parser.add_argument("--error-rate", type=float, default=0.03)
+    parser.add_argument("--batch-ms", type=int, default=100, help="how often each typist sends its keys")
+    parser.add_argument("--words", type=int, default=25, help="words per test")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spawn", action="store_true", help="start a non-persisting server subprocess")
+    args = parser.parse_args(argv)
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
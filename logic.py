@@ -1,16 +1,29 @@
 # logic.py
+import array
 import random
 import time
 import json
 import os
 import sys
-from resources import WORD_LIST, QUOTE_LIST
+import book
+import corpus
+import decay
+import drills
+import keytiming
+import markov
+import snippets
+import srs
+from alignment import WordAligner
+from inputbuf import CharBuffer
+from timeline import Timeline
 
 def _app_dir():
     return os.path.dirname(os.path.abspath(__file__))
 
 class StatsManager:
     FILE_PATH = os.path.join(_app_dir(), "typing_stats.json")
+    # Misses and key timings fade with this half-life (see decay.py); <= 0 keeps them forever
+    HALF_LIFE_DAYS = decay.DEFAULT_HALF_LIFE_DAYS
 
     @staticmethod
     def load_stats():
@@ -31,35 +44,113 @@ class StatsManager:
             print(f"Error saving stats: {e}", file=sys.stderr)
 
     @staticmethod
-    def update_missed_chars(missed_list):
-        """missed_list is list of (expected, typed) tuples"""
-        stats = StatsManager.load_stats()
-        missed_counts = stats.get("missed_chars", {})
-        
+    def merge_missed(stats, missed_list, now=None):
+        """Add (expected, typed) misses to a stats dict in place; returns it.
+
+        Transpositions (2-character expected) count toward missed_ngrams.
+        Counters are stored as [value, last_update] and decay lazily (see decay.py).
+        """
+        now = time.time() if now is None else now
+        chars, ngrams = {}, {}
         for expected, typed in missed_list:
             # We track the character that was EXPECTED but missed
-            # We can also track based on what was typed wrong if we want, but usually you practice what you missed.
-            char = expected
-            if char not in missed_counts:
-                missed_counts[char] = 0
-            missed_counts[char] += 1
-            
-        stats["missed_chars"] = missed_counts
+            if len(expected) == 1:
+                chars[expected] = chars.get(expected, 0) + 1
+            elif expected:
+                ngrams[expected] = ngrams.get(expected, 0) + 1
+        if "decay_since" not in stats:  # first save since counters decay: stamp the old ones
+            for field in ("missed_chars", "missed_ngrams"):
+                decay.migrate(stats.get(field, {}), now)
+            stats["decay_since"] = now
+        for field, counts in (("missed_chars", chars), ("missed_ngrams", ngrams)):
+            if counts:
+                saved = stats.setdefault(field, {})
+                for key, n in counts.items():
+                    decay.add(saved, key, n, now, StatsManager.HALF_LIFE_DAYS)
+        return stats
+
+    @staticmethod
+    def missed_weights(stats, now=None):
+        """({char: weight}, {ngram: weight}) of the misses as they stand now, after decay."""
+        return (decay.current(stats.get("missed_chars", {}), now, StatsManager.HALF_LIFE_DAYS),
+                decay.current(stats.get("missed_ngrams", {}), now, StatsManager.HALF_LIFE_DAYS))
+
+    @staticmethod
+    def merge_key_timing(stats, timing, now=None):
+        """Add a KeyTiming's intervals to a stats dict in place; returns it."""
+        keytiming.merge_into(stats.setdefault("key_timing", {}), timing.to_dict(), now,
+                             StatsManager.HALF_LIFE_DAYS)
+        return stats
+
+    @staticmethod
+    def key_heatmap(stats, now=None):
+        """keytiming.heatmap() of the saved key timing, after decay."""
+        return keytiming.heatmap(stats.get("key_timing", {}), now=now, half_life_days=StatsManager.HALF_LIFE_DAYS)
+
+    @staticmethod
+    def schedule(stats, language=corpus.DEFAULT_LANGUAGE):
+        """srs.Schedule of a language's practice items; edits stats in place."""
+        return srs.Schedule(stats.setdefault("srs", {}).setdefault(language, {}))
+
+    @staticmethod
+    def due_items(stats, kind, n, language=corpus.DEFAULT_LANGUAGE, now=None):
+        """Up to n SRS words or ngrams due now, most overdue first (stats is not changed)."""
+        saved = stats.get("srs", {}).get(language)
+        if not saved or not n:
+            return []
+        return srs.Schedule({k: saved.get(k, {}) for k in srs.KINDS}).due(kind, n, time.time() if now is None else now)
+
+    @staticmethod
+    def book_offset(stats, path):
+        """Saved byte offset to resume a book at (0 if it was never opened)."""
+        return stats.get("books", {}).get(os.path.abspath(path), {}).get("offset", 0)
+
+    @staticmethod
+    def set_book_offset(stats, path, offset):
+        stats.setdefault("books", {})[os.path.abspath(path)] = {"offset": offset}
+        return stats
+
+    @staticmethod
+    def update_missed_chars(missed_list, timing=None, reviews=None, language=corpus.DEFAULT_LANGUAGE,
+                            book_progress=None):
+        """missed_list is list of (expected, typed) tuples; timing an optional KeyTiming,
+        reviews optional srs reviews ({kind: [(key, ok), ...]}) and book_progress an
+        optional (path, offset) to merge too"""
+        stats = StatsManager.merge_missed(StatsManager.load_stats(), missed_list)
+        if timing is not None:
+            StatsManager.merge_key_timing(stats, timing)
+        if reviews:
+            StatsManager.schedule(stats, language).review_all(reviews, time.time())
+        if book_progress is not None:
+            StatsManager.set_book_offset(stats, *book_progress)
         StatsManager.save_stats(stats)
 
     @staticmethod
-    def get_weighted_words(count=25):
-        stats = StatsManager.load_stats()
-        missed_counts = stats.get("missed_chars", {})
+    def get_weighted_words(count=25, language=corpus.DEFAULT_LANGUAGE, limit=None, rng=random, stats=None):
+        if stats is None:
+            stats = StatsManager.load_stats()
+        # Words due for review come first; only the rest are ranked by missed characters
+        due = StatsManager.due_items(stats, "words", count, language)
+        if due:
+            if len(due) < count:
+                due += StatsManager._words_by_misses(count - len(due), language, limit, rng, stats)
+            rng.shuffle(due)
+            return due
+        return StatsManager._words_by_misses(count, language, limit, rng, stats)
+
+    @staticmethod
+    def _words_by_misses(count, language, limit, rng, stats):
+        missed_counts = StatsManager.missed_weights(stats)[0]
+        source = corpus.get_corpus(language)
         
         if not missed_counts:
             # No data, return random
-            return random.sample(WORD_LIST, min(len(WORD_LIST), count))
+            return source.sample_words(count, rng=rng, limit=limit)
         
         # Score words based on missed chars
         # Score = sum of counts of chars in word
         word_scores = []
-        for word in WORD_LIST:
+        for word in source.iter_words(limit):
             score = 0
             for char in word:
                 score += missed_counts.get(char, 0)
@@ -81,30 +172,85 @@ class StatsManager:
         if len(top_candidates) < count:
             # Fill rest with random
             needed = count - len(top_candidates)
-            others = [w for w in WORD_LIST if w not in top_candidates]
-            result = top_candidates + random.sample(others, min(len(others), needed))
-            random.shuffle(result)
+            others = [w for w in source.iter_words(limit) if w not in top_candidates]
+            result = top_candidates + rng.sample(others, min(len(others), needed))
+            rng.shuffle(result)
             return result
         
-        return random.sample(top_candidates, count)
+        return rng.sample(top_candidates, count)
+
+    @staticmethod
+    def get_practice_words(count=25, language=corpus.DEFAULT_LANGUAGE, limit=None, rng=random, stats=None):
+        """Pseudo-words from the corpus Markov model, biased toward missed characters.
+
+        Falls back to real corpus words when the model can't be trained.
+        """
+        if stats is None:
+            stats = StatsManager.load_stats()
+        try:
+            generator = markov.get_generator(language, limit)
+            chars, ngrams = StatsManager.missed_weights(stats)
+            # n-grams due for review weigh as much as the most missed one
+            due = StatsManager.due_items(stats, "ngrams", srs.BIAS_NGRAMS, language)
+            if due:
+                ngrams = dict(ngrams)
+                ngrams.update(dict.fromkeys(due, max(ngrams.values(), default=1.0)))
+            generator.set_bias(chars, ngrams)
+            # Up to half the test is real words due for review
+            review = StatsManager.due_items(stats, "words", count // 2, language)
+            words = generator.generate(count - len(review), rng)
+            if review:
+                words += review
+                rng.shuffle(words)
+            return words
+        except ValueError:
+            return StatsManager.get_weighted_words(count, language, limit, rng=rng, stats=stats)
 
 
 class HistoryManager:
     FILE_PATH = os.path.join(_app_dir(), "typing_history.json")
+    MAX_ENTRIES = 50
     _last_save_error = None  # Optional: UI can check and show message
 
     @staticmethod
     def save_attempt(data):
-        HistoryManager._last_save_error = None
-        history = HistoryManager.load_history()
-        history.append({
+        HistoryManager.save_attempts([data])
+
+    @staticmethod
+    def _make_entry(data):
+        entry = {
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
             "mode": data.get("mode"),
             "wpm": data.get("wpm"),
             "accuracy": data.get("accuracy"),
             "missed": data.get("missed_count")
-        })
-        history = history[-50:]
+        }
+        # Everything needed to rebuild the same text (see TypingEngine.from_history)
+        if data.get("latency"):
+            entry["latency"] = data.get("latency")
+        if data.get("seed") is not None:
+            entry["seed"] = data.get("seed")
+            entry["daily"] = bool(data.get("daily"))
+            entry["params"] = data.get("params", {})
+        if data.get("errors"):
+            entry["errors"] = data.get("errors")
+        if data.get("timeline"):
+            entry["timeline"] = data.get("timeline")
+            entry["consistency"] = data.get("consistency")
+        if data.get("user"):
+            entry["user"] = data.get("user")
+        return entry
+
+    @staticmethod
+    def save_attempts(data_list, max_entries=None):
+        """Append several results with one read and one write of the history file.
+
+        Keeps the newest max_entries (MAX_ENTRIES by default).
+        """
+        HistoryManager._last_save_error = None
+        history = HistoryManager.load_history()
+        history.extend(HistoryManager._make_entry(data) for data in data_list)
+        history = history[-(max_entries or HistoryManager.MAX_ENTRIES):]
         try:
             with open(HistoryManager.FILE_PATH, "w", encoding="utf-8") as f:
                 json.dump(history, f, indent=4)
@@ -134,15 +280,125 @@ class HistoryManager:
         return history[-2] if len(history) >= 2 else None
 
 
+def daily_seed(day=None):
+    """Seed shared by every user on a given UTC day (YYYYMMDD as an int)."""
+    return int(day or time.strftime("%Y%m%d", time.gmtime()))
+
+
+class PreparedText:
+    """The text of one test, generated from a seed and a snapshot of the settings.
+
+    Nothing here touches the engine, so build() can run on a worker thread.
+    """
+
+    __slots__ = ("mode", "params", "seed", "stats", "rng", "words", "text", "page", "snippet")
+
+    def __init__(self, mode, params, seed, stats=None):
+        self.mode = mode
+        self.params = params  # TypingEngine.session_params()
+        self.seed = seed
+        self.stats = stats  # stats dict for practice text; None reads typing_stats.json
+        self.rng = None
+        self.words = None  # None for quotes
+        self.text = None
+        self.page = None  # book.BookPage in book mode
+        self.snippet = None  # snippets.Snippet in code mode
+
+    def matches(self, engine):
+        return self.mode == engine.mode and self.params == engine.session_params()
+
+    def build(self):
+        p = self.params
+        self.rng = rng = random.Random(self.seed)
+        source = corpus.get_corpus(p["language"])
+        if self.mode == "time":
+            self.words = source.sample_words(100, rng=rng, limit=p["word_set"]) # Get more words for time mode
+        elif self.mode == "word":
+            self.words = source.sample_words(p["word_count"], rng=rng, limit=p["word_set"])
+        elif self.mode == "quote":
+            self.text = source.random_quote(rng=rng, length=p["quote_length"])
+        elif self.mode == "practice" and p["practice_source"] == "quotes":
+            # A quote heavy in the letters missed most often
+            stats = self.stats if self.stats is not None else StatsManager.load_stats()
+            self.text = source.quote_for_missed(StatsManager.missed_weights(stats)[0], rng=rng, length=p["quote_length"])
+        elif self.mode == "book":
+            opened = book.open_book(p["book"]) if p["book"] else None
+            if opened is not None:
+                self.page = opened.page(p["book_offset"])
+                while not self.page.text and self.page.start < self.page.end < opened.size:
+                    self.page = opened.page(self.page.end)  # nothing typeable on that page
+                self.text = self.page.text
+            if not self.text:  # no book (or an empty one): a quote stands in
+                self.text = source.random_quote(rng=rng)
+                self.page = None
+        elif self.mode == "code":
+            self.snippet = snippets.get_library(p["code_dir"]).snippet(rng)
+            # No source files (or the first scan is still running): a quote stands in
+            self.text = self.snippet.text if self.snippet is not None else source.random_quote(rng=rng)
+        elif self.mode == "drill":
+            self.words = drills.drill_words(p["word_count"], p["drill"], p["layout"], p["language"], p["word_set"],
+                                            rng=rng)
+        elif self.mode == "practice":
+            if p["practice_source"] == "markov":
+                self.words = StatsManager.get_practice_words(p["word_count"], p["language"], p["word_set"], rng=rng,
+                                                             stats=self.stats)
+            else:
+                self.words = StatsManager.get_weighted_words(p["word_count"], p["language"], p["word_set"], rng=rng,
+                                                             stats=self.stats)
+        if self.text is None:
+            self.text = " ".join(self.words or [])
+        return self
+
+
+class KeyBatch:
+    """What TypingEngine.process_keys() did with one run of keys."""
+
+    __slots__ = ("consumed", "finished", "errors")
+
+    def __init__(self):
+        self.consumed = 0  # keys used; the rest came after the test ended
+        self.finished = False  # word/quote/practice text complete
+        self.errors = array.array("I")  # batch positions of keys that added a mistake
+
+
 class TypingEngine:
-    def __init__(self, mode="time", duration=30, word_count=25):
-        self.mode = mode  # "time", "word", "quote", "practice"
+    # Fixed attribute set: no per-instance dict, and a typo'd attribute fails loudly
+    __slots__ = ("mode", "test_duration", "target_word_count", "language", "word_set", "quote_length",
+                 "practice_source", "drill", "book_path", "book_offset", "page", "code_dir", "snippet", "rng", "daily", "persist", "stats", "seed", "text_rng", "latency", "layout", "journal",
+                 "words", "_target_text", "_input", "aligner", "_auto_typed", "key_timing", "start_time", "is_running", "is_finished",
+                 "wpm", "accuracy", "correct_chars", "total_chars", "timeline")
+
+    def __init__(self, mode="time", duration=30, word_count=25, language=corpus.DEFAULT_LANGUAGE, word_set=200,
+                 rng=None, daily=False, persist=True, stats=None, quote_length="all", practice_source="markov",
+                 drill="home_row", layout="qwerty", book_path="", code_dir=""):
+        self.mode = mode  # "time", "word", "quote", "practice", "drill", "book", "code"
         self.test_duration = duration
         self.target_word_count = word_count
-        self.layout = "qwerty"  # "qwerty" or "dvorak" (for keyboard visualizer)
+        self.language = language
+        self.word_set = word_set  # sample from the top-N most frequent words
+        self.quote_length = quote_length  # "all", "short", "medium", "long", "thicc"
+        self.practice_source = practice_source  # "markov" (pseudo-words), "words" (corpus words) or "quotes"
+        self.drill = drill  # key set of drill mode, see drills.DRILLS
+        self.book_path = book_path  # text file of book mode
+        self.book_offset = None  # byte offset book mode resumes at; read from the stats when first needed
+        self.page = None  # the book.BookPage being typed in book mode
+        self.code_dir = code_dir  # source tree of code mode ("" for PythonType's own)
+        self.snippet = None  # the snippets.Snippet being typed in code mode
+        # Each test draws its own seed from `rng`; the text is then sampled from
+        # random.Random(seed), so the seed alone reproduces the test.
+        self.rng = rng if rng is not None else random.Random()
+        self.daily = daily  # same seed for everyone on the same day
+        self.persist = persist  # stop() saves history/stats; servers save results in batches instead
+        self.stats = stats  # stats dict for practice text; None reads typing_stats.json
+        self.seed = None
+        self.text_rng = None
+        self.latency = None  # optional input-to-display summary set by the frontend
+        self.layout = layout  # "qwerty" or "dvorak" (keyboard visualizer, finger stats, drill keys)
+        self.journal = None  # optional journal.Journal the test in progress is checkpointed to
         self.words = []
+        self._input = CharBuffer()  # keys as typed, reused across tests
+        self.key_timing = keytiming.KeyTiming(self.layout)  # per-key/finger intervals, reused across tests
         self.target_text = ""
-        self.user_input = ""
         self.start_time = 0
         self.is_running = False
         self.is_finished = False
@@ -150,24 +406,102 @@ class TypingEngine:
         self.accuracy = 0
         self.correct_chars = 0
         self.total_chars = 0
-        self.missed_data = [] # List of (expected, typed) tuples for mistakes
+        self.timeline = None  # per-second WPM/raw/errors, see timeline.py
         
         self.reset()
 
-    def reset(self):
-        if self.mode == "time":
-            self.words = random.sample(WORD_LIST, 100) # Get more words for time mode
-            self.target_text = " ".join(self.words)
-        elif self.mode == "word":
-            self.words = random.sample(WORD_LIST, self.target_word_count)
-            self.target_text = " ".join(self.words)
-        elif self.mode == "quote":
-            self.target_text = random.choice(QUOTE_LIST)
-        elif self.mode == "practice":
-            self.words = StatsManager.get_weighted_words(self.target_word_count)
-            self.target_text = " ".join(self.words)
-            
-        self.user_input = ""
+    @classmethod
+    def from_history(cls, entry):
+        """Rebuild the engine for a saved history entry, with the same target text.
+
+        Practice mode text also depends on typing_stats.json at the time of the run,
+        and code mode text on the source files indexed at the time.
+        """
+        params = entry.get("params", {})
+        engine = cls(
+            mode=entry.get("mode", "time"),
+            duration=params.get("duration", 30),
+            word_count=params.get("word_count", 25),
+            language=params.get("language", corpus.DEFAULT_LANGUAGE),
+            word_set=params.get("word_set", 200),
+            quote_length=params.get("quote_length", "all"),
+            practice_source=params.get("practice_source", "words"),
+            drill=params.get("drill", "home_row"),
+            layout=params.get("layout", "qwerty"),
+            book_path=params.get("book", ""),
+            code_dir=params.get("code_dir", ""),
+        )
+        engine.book_offset = params.get("book_offset")
+        engine.reset(seed=entry.get("seed"))
+        return engine
+
+    def session_params(self):
+        """Settings that, with the seed, determine the target text."""
+        if self.mode == "book":
+            if self.book_offset is None:
+                stats = self.stats if self.stats is not None else StatsManager.load_stats()
+                self.book_offset = StatsManager.book_offset(stats, self.book_path) if self.book_path else 0
+            return {"book": self.book_path, "book_offset": self.book_offset, "language": self.language}
+        if self.mode == "code":
+            return {"code_dir": self.code_dir, "language": self.language}
+        return {
+            "duration": self.test_duration,
+            "word_count": self.target_word_count,
+            "language": self.language,
+            "word_set": self.word_set,
+            "quote_length": self.quote_length,
+            "practice_source": self.practice_source,
+            "drill": self.drill,
+            "layout": self.layout,
+        }
+
+    def resume(self, checkpoint, now=None):
+        """Continue an interrupted test (a journal.Checkpoint) in this engine.
+
+        The test gets back its mode, seed, duration and text, and its keys are
+        replayed at their original spacing, so that the last one lands `now`:
+        the time the app was down doesn't count. Returns the replay's KeyBatch.
+        """
+        now = time.time() if now is None else now
+        params = checkpoint.params
+        self.mode = checkpoint.mode
+        self.daily = checkpoint.daily
+        self.test_duration = params.get("duration", self.test_duration)
+        if self.mode == "book":
+            self.book_offset = params.get("book_offset")
+        self.reset(seed=checkpoint.seed)
+        if self._target_text != checkpoint.text:  # practice, book and code text depend on files
+            self.target_text = checkpoint.text
+            self.page = self.snippet = None
+        start = now - (checkpoint.times[-1] if checkpoint.times else 0)
+        self.start(start)
+        return self.process_keys(checkpoint.keys, [start + t for t in checkpoint.times])
+
+    def prepare_text(self, seed=None):
+        """A PreparedText for the next test with the current settings; build() it anywhere."""
+        if seed is None:
+            seed = daily_seed() if self.daily else self.rng.getrandbits(32)
+        return PreparedText(self.mode, self.session_params(), seed, self.stats)
+
+    def reset(self, seed=None, prepared=None):
+        """Start a new test: with `prepared` if it was built for the current settings
+        (see prefetch.NextTest), otherwise generating the text now."""
+        if prepared is None or prepared.text is None or not prepared.matches(self):
+            prepared = self.prepare_text(seed).build()
+        if self.journal is not None:
+            self.journal.end()
+        self.seed = prepared.seed
+        self.text_rng = prepared.rng
+        if prepared.words is not None:
+            self.words = prepared.words
+        self.page = prepared.page
+        self.snippet = prepared.snippet
+        if self.page is not None:
+            self.book_offset = self.page.start
+        self.target_text = prepared.text
+        if self.key_timing.layout != self.layout:
+            self.key_timing.set_layout(self.layout)
+        self.key_timing.clear()
         self.start_time = 0
         self.is_running = False
         self.is_finished = False
@@ -175,29 +509,130 @@ class TypingEngine:
         self.accuracy = 100
         self.correct_chars = 0
         self.total_chars = 0
-        self.missed_data = []
+        self.latency = None
+        self.timeline = Timeline(self.test_duration if self.mode == "time" else None)
+
+    @property
+    def target_text(self):
+        return self._target_text
+
+    @target_text.setter
+    def target_text(self, text):
+        self._target_text = text
+        self.aligner = WordAligner(text, self._input)  # word-level scoring of the input
+        self._auto_typed = 0  # indentation typed by code mode's auto-indent
+
+    @property
+    def user_input(self):
+        """The keys typed so far, as a read-only str-like view."""
+        return self._input.view
 
-    def start(self):
+    @property
+    def missed_data(self):
+        """(expected, typed) for every mistake, including corrected ones."""
+        return self.aligner.all_misses().pairs()
+
+    def error_counts(self):
+        """{kind: count} of the mistakes, kinds as in alignment.ERROR_KINDS."""
+        return dict(self.aligner.all_misses().kinds)
+
+    @property
+    def caret(self):
+        """Index in target_text where the next key lands."""
+        return self.aligner.caret
+
+    @property
+    def typed(self):
+        """The input aligned to target_text: typed[i] is what was typed for target_text[i]."""
+        return self.aligner.view()
+
+    def start(self, now=None):
         if not self.is_running and not self.is_finished:
             self.is_running = True
-            self.start_time = time.time()
+            self.start_time = time.time() if now is None else now
+            if self.journal is not None:
+                self.journal.begin(self)
 
     def stop(self):
+        self.finish()
+        self.save()
+
+    def finish(self):
+        """End the test and freeze its stats without saving anything (see save())."""
         self.is_running = False
         self.is_finished = True
+        if self.journal is not None:
+            self.journal.end()
         self.calculate_stats()
+        if self.start_time:
+            elapsed = time.time() - self.start_time
+            if self.mode == "time":
+                elapsed = min(elapsed, self.test_duration)
+            self.timeline.finish(elapsed)
+
+    def save(self):
+        """Write the finished test to history and stats, unless persist is off."""
+        if not self.persist:
+            self._advance_book()
+            return
+
+        # Save to history (its params still hold the offset of this page)
+        HistoryManager.save_attempt(self.result())
+        self._advance_book()
         
-        # Save to history
-        HistoryManager.save_attempt({
+        # Save detailed stats
+        missed = self.missed_data
+        reviews = self.srs_reviews()
+        book_progress = (self.book_path, self.book_offset) if self.page is not None else None
+        if missed or self.key_timing.last is not None or reviews["words"] or reviews["ngrams"] or book_progress:
+            StatsManager.update_missed_chars(missed, self.key_timing, reviews, self.language, book_progress)
+
+    def _advance_book(self):
+        if self.page is not None:
+            self.book_offset = self.page_progress()
+
+    def page_progress(self):
+        """Book offset to resume at: past the page once it is typed, else the first unfinished word."""
+        if self.aligner.caret >= len(self._target_text):
+            return self.page.end
+        return self.page.offset_of_word(self.aligner.k)
+
+    def srs_reviews(self):
+        """{"words": [(word, clean)], "ngrams": [(bigram, clean)]} for the words finished in this test.
+
+        A word is clean if it was typed without mistakes (corrected ones count);
+        a bigram if it was never transposed. Markov practice words aren't real
+        words, nor are code tokens, so only their bigrams are reviewed.
+        """
+        aligner = self.aligner
+        transposed = {expected for expected, _typed, _n in aligner.all_misses().items() if len(expected) == 2}
+        real_words = self.mode != "code" and not (self.mode == "practice" and self.practice_source == "markov")
+        words, ngrams = {}, {}
+        for k, errors in aligner.word_errors():
+            word = aligner.word(k)
+            key = srs.word_key(word) if real_words else ""
+            if key:
+                words[key] = words.get(key, True) and not errors
+            for i in range(len(word) - 1):
+                gram = word[i:i + 2]
+                ngrams[gram] = ngrams.get(gram, True) and gram not in transposed
+        return {"words": list(words.items()), "ngrams": list(ngrams.items())}
+
+    def result(self):
+        """The attempt as passed to HistoryManager.save_attempt."""
+        return {
             "mode": self.mode,
             "wpm": self.wpm,
             "accuracy": self.accuracy,
-            "missed_count": len(self.missed_data)
-        })
-        
-        # Save detailed stats
-        if self.missed_data:
-             StatsManager.update_missed_chars(self.missed_data)
+            "missed_count": self.aligner.all_misses().total,
+            "errors": self.error_counts(),
+            "seed": self.seed,
+            "daily": self.daily,
+            "params": self.session_params(),
+            "latency": self.latency,
+            "timeline": self.timeline.to_dict(),
+            "consistency": self.timeline.consistency(),
+        }
 
     def process_key(self, key_text):
         if self.is_finished:
@@ -206,52 +641,114 @@ class TypingEngine:
         if not self.is_running:
             self.start()
 
+        self._type(key_text, time.time())
+        self.calculate_stats()
+        return self._text_done()
+
+    def process_keys(self, keys, timestamps=None):
+        """Type a run of keys at once: a replayed log, a network batch, an IME commit.
+
+        timestamps: time.time() of each key, or None for all of them now.
+        Stats are recalculated once, at the last key. Returns a KeyBatch;
+        keys after the end of the text are not consumed.
+        """
+        batch = KeyBatch()
+        if self.is_finished:
+            return batch
+        now = time.time()
+        times = iter(timestamps) if timestamps is not None else None
+        type_key, errors, aligner = self._type, batch.errors, self.aligner
+        ends = self.mode in ("word", "quote", "practice", "drill", "book", "code")
+        end = len(self._target_text)
+        i = -1
+        for i, key in enumerate(keys):
+            if times is not None:
+                now = next(times)
+            if not self.is_running:
+                self.start(now)
+            if type_key(key, now) is False:
+                errors.append(i)
+            if ends and aligner.caret >= end:
+                batch.finished = True
+                break
+        batch.consumed = i + 1
+        self.calculate_stats(now)
+        return batch
+
+    def _type(self, key_text, now):
+        """Apply one key; returns whether it was correct (None for backspace or ignored keys)."""
+        if self.journal is not None:
+            self.journal.key(key_text, now - self.start_time)
         # Handle backspace
         if key_text == '\b': 
-            if len(self.user_input) > 0:
-                self.user_input = self.user_input[:-1]
-                # Optional: remove last missed data if it was at this position? 
-                # Monkeytype usually counts every mistake even if corrected.
-        else:
-            # Track mistake and append only if not past end
-            idx = len(self.user_input)
-            if idx < len(self.target_text):
-                expected = self.target_text[idx]
-                if key_text != expected:
-                    self.missed_data.append((expected, key_text))
-                self.user_input += key_text
-                self.total_chars += 1
+            if self._auto_typed:
+                self._unindent()
+            # Monkeytype counts every mistake even if corrected; the aligner keeps those.
+            self.aligner.pop()
+            self.key_timing.press(key_text, now, False)
+            return None
+        if self.aligner.caret >= len(self._target_text):
+            return None
+        if key_text == "\n" and self.mode != "code":
+            return None  # Enter only types line breaks of code
+        # Scored per word: only the current word is realigned
+        correct = self.aligner.push(key_text)
+        if correct is not None:
+            self.timeline.add(now - self.start_time, correct)
+            self.total_chars += 1
+            self.key_timing.press(key_text, now, correct)
+            if self.mode == "code" and (key_text == "\n" or key_text == " "):
+                self._indent()
+        return correct
 
-        self.calculate_stats()
+    def _indent(self):
+        """Auto-indent: at the start of a line, type its leading spaces."""
+        text, aligner = self._target_text, self.aligner
+        caret = aligner.caret
+        if not caret or text[caret - 1] != "\n":
+            return
+        while caret < len(text) and text[caret] == " ":
+            aligner.push(" ")
+            self._auto_typed += 1
+            caret += 1
 
+    def _unindent(self):
+        """Backspace in auto-typed indentation takes it back up to the start of the line,
+        so that backspace then joins the line to the one before."""
+        text, aligner = self._target_text, self.aligner
+        caret = aligner.caret
+        line_start = text.rfind("\n", 0, caret) + 1
+        if not line_start or caret == line_start or not text[line_start:caret].isspace():
+            return
+        for _ in range(caret - line_start):
+            aligner.pop()
+            self._auto_typed -= 1
+
+    def _text_done(self):
         # In word/quote/practice mode, test is complete when user has typed the full text
-        if self.mode in ("word", "quote", "practice") and len(self.user_input) >= len(self.target_text):
-            return True
-        return False
+        return self.mode in ("word", "quote", "practice", "drill", "book", "code") and self.aligner.caret >= len(self._target_text)
 
-    def calculate_stats(self):
+    def calculate_stats(self, now=None):
         if not self.start_time:
             return
 
-        current_time = time.time()
+        current_time = time.time() if now is None else now
         elapsed = current_time - self.start_time
         
         if elapsed == 0:
             elapsed = 0.001
 
-        # Count correct chars
-        self.correct_chars = 0
-        for i, char in enumerate(self.user_input):
-            if i < len(self.target_text) and char == self.target_text[i]:
-                self.correct_chars += 1
+        # Count correct chars (word-aligned, see alignment.py); auto-indentation wasn't typed
+        self.correct_chars = self.aligner.correct_chars() - self._auto_typed
+        typed = len(self.user_input) - self._auto_typed
         
         # WPM: (correct_chars / 5) / (minutes)
         minutes = elapsed / 60
         self.wpm = int((self.correct_chars / 5) / minutes)
         
         # Accuracy
-        if len(self.user_input) > 0:
-            self.accuracy = int((self.correct_chars / len(self.user_input)) * 100)
+        if typed > 0:
+            self.accuracy = int((self.correct_chars / typed) * 100)
         else:
             self.accuracy = 100
 
@@ -2,47 +2,32 @@
 import os
 import pygame
 import sys
-from logic import TypingEngine, HistoryManager
+import time
+from logic import StatsManager, TypingEngine
 import resources
 import config
+import journal
 import sound_util
+import prefetch
+import profiler
+import race
+import render
+import snippets
+import themes
+from render import THEME_DROPDOWN_MAX_H, THEME_ITEM_H, THEME_DROPDOWN_W
 
 # --- Helpers ---
-def hex_to_rgb(hex_str):
-    h = hex_str.lstrip("#")
-    return tuple(int(h[i : i + 2], 16) for i in (0, 2, 4))
-
 def lerp(start, end, amount):
     return start + (end - start) * amount
 
 # --- Constants ---
 WINDOW_W = 1100
 WINDOW_H = 820
-CONTENT_W = 850  # Slightly wider for better spacing
-HUD_TIMER_SIZE = 48
-KEY_SIZE = 46
-KEY_SPACE_W = 340
-KEY_SPACE_H = 42
-KEY_GAP = 6
-KEYBOARD_ROWS_QWERTY = ["qwertyuiop[]", "asdfghjkl;\'", "zxcvbnm,./"]
-KEYBOARD_ROWS_DVORAK = ["\',.pyfgcrl/=", "aoeuidhtns-", ";qjkxbmwvz"]
 HIGHLIGHT_MS = 150
-THEME_DROPDOWN_MAX_H = 300
-THEME_ITEM_H = 32
 CARET_BLINK_MS = 500
 LERP_SPEED = 0.5  # 0.0 to 1.0, higher is faster
-
-def _font_path(name):
-    base = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(base, "fonts", name)
-
-def _load_font(path, size):
-    if os.path.isfile(path):
-        try:
-            return pygame.font.Font(path, size)
-        except Exception:
-            pass
-    return None
+PROFILE_PANEL_REFRESH_MS = 250
+PROFILE_TRACE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profile_trace.csv")
 
 def main():
     pygame.init()
@@ -53,48 +38,53 @@ def main():
 
     # Load config and apply
     cfg = config.load_config()
-    resources.CURRENT_THEME = cfg.get("theme", "monkeytype")
+    StatsManager.HALF_LIFE_DAYS = float(cfg.get("stats_half_life_days", 14))
+    themes.set_theme(cfg.get("theme", themes.DEFAULT_THEME))
     font_size_px = config.get_font_size_px(cfg.get("font_size", "medium"))
     resources.FONT_SIZE = font_size_px
 
-    # --- Fonts ---
-    # Increased UI font sizes for better readability
-    roboto_regular = _font_path("Roboto-Regular.ttf")
-    roboto_bold = _font_path("Roboto-Bold.ttf")
-    
-    font_mono = _load_font(roboto_regular, font_size_px) or pygame.font.SysFont("consolas", font_size_px)
-    font_mono_large = _load_font(roboto_regular, HUD_TIMER_SIZE) or pygame.font.SysFont("consolas", HUD_TIMER_SIZE)
-    
-    # UI Fonts
-    font_ui = _load_font(roboto_regular, 16) or pygame.font.SysFont("segoeui", 16)
-    font_ui_bold = _load_font(roboto_bold, 14) or pygame.font.SysFont("segoeui", 14, bold=True)
-    font_ui_small = _load_font(roboto_bold, 12) or pygame.font.SysFont("segoeui", 12, bold=True)
-    font_key = _load_font(roboto_bold, 14) or pygame.font.SysFont("consolas", 14, bold=True)
+    # --- Fonts & drawing ---
+    renderer = render.Renderer(font_size_px)
+
+    # Code mode's snippet index is loaded and brought up to date in the background
+    snippets.get_library(cfg.get("code_dir", ""))
 
     # Game state
     engine = TypingEngine(
         mode=cfg.get("mode", "time"),
         duration=int(cfg.get("duration", 30)),
-        word_count=int(cfg.get("word_count", 25))
+        word_count=int(cfg.get("word_count", 25)),
+        language=cfg.get("language", "english"),
+        word_set=int(cfg.get("word_set", 200)),
+        daily=bool(cfg.get("daily_seed", False)),
+        quote_length=cfg.get("quote_length", "all"),
+        practice_source=cfg.get("practice_source", "markov"),
+        drill=cfg.get("drill", "home_row"),
+        layout=cfg.get("layout", "qwerty"),
+        book_path=cfg.get("book_path", ""),
+        code_dir=cfg.get("code_dir", ""),
     )
-    engine.layout = cfg.get("layout", "qwerty")
+    # The test in progress is checkpointed key by key; one cut short by a crash is offered back
+    session_journal = journal.Journal()
+    recovered = session_journal.pending()  # journal.Checkpoint until the prompt is answered
+    engine.journal = session_journal
     
     # Options
-    mode_options = ["time", "word", "quote", "practice"]
-    theme_names = list(resources.THEMES.keys())
-    layout_options = ["qwerty", "dvorak"]
-    duration_options = config.DURATION_OPTIONS
-    word_count_options = config.WORD_COUNT_OPTIONS
+    theme_names = themes.theme_names()
 
     # Local state mirrors config for UI
     current_mode = cfg.get("mode", "time")
-    current_theme_name = resources.CURRENT_THEME
+    current_theme_name = themes.registry().current
     current_layout = cfg.get("layout", "qwerty")
     current_duration = engine.test_duration
     current_word_count = engine.target_word_count
     current_font_size = cfg.get("font_size", "medium")
     sound_on_error = cfg.get("sound_on_error", False)
     reduced_motion = cfg.get("reduced_motion", False)
+    current_language = engine.language
+    current_word_set = engine.word_set
+    current_quote_length = engine.quote_length
+    daily_seed = engine.daily
 
     # UI State
     show_overlay = False
@@ -102,18 +92,57 @@ def main():
     overlay_wpm = 0
     overlay_acc = 0
     overlay_missed = ""
+    overlay_timeline = None
+    overlay_consistency = None
 
     theme_dropdown_rects = None
     theme_dropdown_scroll = 0
     key_highlight = None
     
+    # Profiler (F3 toggles, F4 dumps a CSV trace)
+    prof = profiler.FrameProfiler()
+    renderer.profiler = prof
+    prof_rows = []
+    prof_counters = []
+    prof_last_refresh = 0
+
+    # Input-to-display latency: KEYDOWN timestamp -> first flip showing the result
+    record_latency = cfg.get("record_latency", False)
+    latency_hist = profiler.LatencyHistogram()
+    pending_key_times = []  # perf_counter() times of keys not yet on screen
+    # pygame-ce stamps events with the SDL time; pygame 2.x doesn't, so key
+    # times then start when the loop polls the event (SDL queueing not counted)
+    latency_source = "event_poll"
+    # A test that ended this frame is saved after the flip showing its last key
+    save_pending = False
+
+    # Races: the ghost of the best run on this text, plus LAN racers if configured
+    race_transports = []
+    race_peers = race.parse_peers(cfg.get("race_peers"))
+    if cfg.get("race_port") and race_peers:
+        try:
+            race_transports.append(race.UdpTransport(int(cfg["race_port"]), race_peers))
+        except OSError as e:
+            print(f"Race transport unavailable: {e}", file=sys.stderr)
+    race_session = race.RaceSession(race_transports, ghost=bool(cfg.get("ghost", False)))
+    race_session.new_text(engine.target_text)
+    # The next test's text, layout and glyphs are prepared while this one runs
+    next_test = prefetch.NextTest(engine)
+    # Keyboard heatmap of the mean time to each key, from the saved stats
+    show_heatmap = bool(cfg.get("key_heatmap", False))
+    key_heat = {}
+
+    def load_heatmap():
+        nonlocal key_heat
+        key_heat = StatsManager.key_heatmap(StatsManager.load_stats()) if show_heatmap else {}
+
     # Smooth Caret
     caret_visible = True
     last_caret_toggle = 0
     caret_rect_current = None  # (x, y, w, h) float
 
-    def save_cfg():
-        c = {
+    def current_settings():
+        return {
             "theme": current_theme_name,
             "layout": current_layout,
             "mode": current_mode,
@@ -122,553 +151,33 @@ def main():
             "font_size": current_font_size,
             "sound_on_error": sound_on_error,
             "reduced_motion": reduced_motion,
+            "language": current_language,
+            "word_set": current_word_set,
+            "quote_length": current_quote_length,
+            "practice_source": engine.practice_source,
+            "drill": engine.drill,
+            "book_path": engine.book_path,
+            "code_dir": engine.code_dir,
+            "daily_seed": daily_seed,
+            "record_latency": record_latency,
+            "ghost": race_session.ghost_enabled,
+            "key_heatmap": show_heatmap,
+            "stats_half_life_days": StatsManager.HALF_LIFE_DAYS,
+            "race_port": cfg.get("race_port", 0),
+            "race_peers": cfg.get("race_peers", []),
         }
-        config.save_config(c)
 
-    # --- Layout Calculations ---
-    def content_rect():
-        w, h = screen.get_size()
-        x = max(0, (w - CONTENT_W) // 2)
-        return x, 40, CONTENT_W, h - 60
+    def save_cfg():
+        config.save_config(current_settings())
 
     def get_theme():
-        return {k: hex_to_rgb(v) for k, v in resources.get_theme().items()}
-
-    def layout_rects(cx, cy, cw):
-        y = cy
-        settings_h = 110 
-        settings_rect = (cx, y, cw, settings_h)
-        y += settings_h + 30
-        hud_h = 90
-        hud_rect = (cx, y, cw, hud_h)
-        y += hud_h + 20
-        display_h = 280
-        display_rect = (cx, y, cw, display_h)
-        y += display_h + 30
-        keyboard_rect = (cx, y, cw, 240)
-        return {
-            "settings": settings_rect,
-            "hud": hud_rect,
-            "display": display_rect,
-            "keyboard": keyboard_rect,
-        }
-
-    # --- Drawing Helpers ---
-    def draw_button_bg(surface, rect, color, border_color=None, radius=6):
-        pygame.draw.rect(surface, color, rect, border_radius=radius)
-        if border_color:
-            pygame.draw.rect(surface, border_color, rect, 1, border_radius=radius)
-
-    def draw_text_centered(surface, text, font, color, center_pos):
-        surf = font.render(text, True, color)
-        surface.blit(surf, (center_pos[0] - surf.get_width() // 2, center_pos[1] - surf.get_height() // 2))
-
-    # ---- Settings Bar ----
-    def draw_settings_bar(surface, theme, cx, cy, cw, ch):
-        y_row1 = cy
-        x = cx
-        
-        lbl = font_ui_bold.render("Mode:", True, theme["main"])
-        surface.blit(lbl, (x, y_row1 + 8))
-        x += lbl.get_width() + 12
-
-        mode_rects = {}
-        for opt in mode_options:
-            label = opt.title()
-            w, h = font_ui.size(label)
-            w += 24
-            h += 16
-            r = pygame.Rect(x, y_row1, w, h)
-            mode_rects[opt] = r
-            
-            is_active = (opt == current_mode)
-            bg_color = theme["caret"] if is_active else theme["bg"]
-            text_color = theme["bg"] if is_active else theme["main"]
-            border = None if is_active else theme["main"]
-            
-            draw_button_bg(surface, r, bg_color, border, radius=6)
-            draw_text_centered(surface, label, font_ui_bold, text_color, r.center)
-            x += w + 8
-        
-        # Separator
-        x += 20
-        pygame.draw.line(surface, theme["main"], (x, y_row1 + 5), (x, y_row1 + 25), 1)
-        x += 20
-
-        # Dynamic Options
-        duration_rects = {}
-        words_rects = {}
-        
-        if current_mode == "time":
-            for d in duration_options:
-                label = str(d)
-                w, h = font_ui.size(label)
-                w += 20
-                h += 16
-                r = pygame.Rect(x, y_row1, w, h)
-                duration_rects[d] = r
-                
-                is_active = (d == current_duration)
-                bg_color = theme["caret"] if is_active else theme["bg"]
-                text_color = theme["bg"] if is_active else theme["main"]
-                border = None if is_active else theme["main"]
-                draw_button_bg(surface, r, bg_color, border, radius=6)
-                draw_text_centered(surface, label, font_ui_bold, text_color, r.center)
-                x += w + 6
-
-        elif current_mode in ("word", "practice"):
-            # Practice mode also uses word count for length of test
-            for w_count in word_count_options:
-                label = str(w_count)
-                w, h = font_ui.size(label)
-                w += 20
-                h += 16
-                r = pygame.Rect(x, y_row1, w, h)
-                words_rects[w_count] = r
-                
-                is_active = (w_count == current_word_count)
-                bg_color = theme["caret"] if is_active else theme["bg"]
-                text_color = theme["bg"] if is_active else theme["main"]
-                border = None if is_active else theme["main"]
-                draw_button_bg(surface, r, bg_color, border, radius=6)
-                draw_text_centered(surface, label, font_ui_bold, text_color, r.center)
-                x += w + 6
-        
-        elif current_mode == "quote":
-            lbl = font_ui.render("Random Quote", True, theme["main"])
-            surface.blit(lbl, (x, y_row1 + 8))
-
-        # --- Row 2 ---
-        y_row2 = cy + 50
-        x = cx
-
-        theme_lbl_w = font_ui.size(current_theme_name)[0] + 40
-        theme_btn = pygame.Rect(x, y_row2, max(140, theme_lbl_w), 34)
-        draw_button_bg(surface, theme_btn, theme["main"], radius=6)
-        draw_text_centered(surface, current_theme_name, font_ui_bold, theme["bg"], theme_btn.center)
-        x += theme_btn.width + 16
-
-        layout_rects = {}
-        for l_opt in layout_options:
-            label = l_opt.upper()
-            w, h = font_ui_small.size(label)
-            w += 16
-            h += 14
-            r = pygame.Rect(x, y_row2, w, h)
-            layout_rects[l_opt] = r
-            is_active = (l_opt == current_layout)
-            bg_color = theme["caret"] if is_active else theme["bg"]
-            text_color = theme["bg"] if is_active else theme["main"]
-            border = None if is_active else theme["main"]
-            draw_button_bg(surface, r, bg_color, border, radius=6)
-            draw_text_centered(surface, label, font_ui_small, text_color, r.center)
-            x += w + 6
-        x += 16 
-
-        font_rects = {}
-        for f_opt in ["small", "medium", "large"]:
-            label = f_opt[0].upper()
-            w, h = 34, 34
-            r = pygame.Rect(x, y_row2, w, h)
-            font_rects[f_opt] = r
-            is_active = (f_opt == current_font_size)
-            bg_color = theme["caret"] if is_active else theme["bg"]
-            text_color = theme["bg"] if is_active else theme["main"]
-            border = None if is_active else theme["main"]
-            draw_button_bg(surface, r, bg_color, border, radius=6)
-            draw_text_centered(surface, label, font_ui_bold, text_color, r.center)
-            x += w + 6
-        x += 16
-
-        sound_rect = pygame.Rect(x, y_row2, 40, 34)
-        is_active = sound_on_error
-        bg_color = theme["caret"] if is_active else theme["bg"]
-        text_color = theme["bg"] if is_active else theme["main"]
-        border = None if is_active else theme["main"]
-        draw_button_bg(surface, sound_rect, bg_color, border, radius=6)
-        draw_text_centered(surface, "Snd", font_ui_small, text_color, sound_rect.center)
-        x += 46
-
-        reduced_rect = pygame.Rect(x, y_row2, 40, 34)
-        is_active = reduced_motion
-        bg_color = theme["caret"] if is_active else theme["bg"]
-        text_color = theme["bg"] if is_active else theme["main"]
-        border = None if is_active else theme["main"]
-        draw_button_bg(surface, reduced_rect, bg_color, border, radius=6)
-        draw_text_centered(surface, "Mot", font_ui_small, text_color, reduced_rect.center)
-        
-        hist_w = 100
-        hist_rect = pygame.Rect(cx + cw - hist_w, y_row2, hist_w, 34)
-        draw_button_bg(surface, hist_rect, theme["bg"], theme["caret"], radius=6)
-        draw_text_centered(surface, "History", font_ui_bold, theme["caret"], hist_rect.center)
-
-        return {
-            "mode": mode_rects, "theme": theme_btn, "layout": layout_rects,
-            "duration": duration_rects, "words": words_rects, "font": font_rects,
-            "sound": sound_rect, "reduced": reduced_rect, "history": hist_rect
-        }
-
-    def get_settings_bar_rects(cx, cy, cw, ch):
-        y_row1 = cy
-        x = cx
-        x += font_ui_bold.size("Mode:")[0] + 12
-        mode_rects = {}
-        for opt in mode_options:
-            w = font_ui.size(opt.title())[0] + 24
-            mode_rects[opt] = pygame.Rect(x, y_row1, w, 16 + font_ui.get_height())
-            x += w + 8
-        x += 40 
-        duration_rects = {}
-        words_rects = {}
-        if current_mode == "time":
-            for d in duration_options:
-                w = font_ui.size(str(d))[0] + 20
-                duration_rects[d] = pygame.Rect(x, y_row1, w, 16 + font_ui.get_height())
-                x += w + 6
-        elif current_mode in ("word", "practice"):
-            for w_count in word_count_options:
-                w = font_ui.size(str(w_count))[0] + 20
-                words_rects[w_count] = pygame.Rect(x, y_row1, w, 16 + font_ui.get_height())
-                x += w + 6
-
-        y_row2 = cy + 50
-        x = cx
-        theme_lbl_w = font_ui.size(current_theme_name)[0] + 40
-        theme_btn = pygame.Rect(x, y_row2, max(140, theme_lbl_w), 34)
-        x += theme_btn.width + 16
-        layout_rects = {}
-        for l_opt in layout_options:
-            w = font_ui_small.size(l_opt.upper())[0] + 16
-            layout_rects[l_opt] = pygame.Rect(x, y_row2, w, 14 + font_ui_small.get_height())
-            x += w + 6
-        x += 16
-        font_rects = {}
-        for f_opt in ["small", "medium", "large"]:
-            font_rects[f_opt] = pygame.Rect(x, y_row2, 34, 34)
-            x += 40
-        x += 16
-        sound_rect = pygame.Rect(x, y_row2, 40, 34)
-        x += 46
-        reduced_rect = pygame.Rect(x, y_row2, 40, 34)
-        
-        hist_w = 100
-        hist_rect = pygame.Rect(cx + cw - hist_w, y_row2, hist_w, 34)
-
-        return {
-            "mode": mode_rects, "theme": theme_btn, "layout": layout_rects,
-            "duration": duration_rects, "words": words_rects, "font": font_rects,
-            "sound": sound_rect, "reduced": reduced_rect, "history": hist_rect
-        }
-
-    # ---- Draw HUD ----
-    def draw_hud(surface, theme, cx, cy, cw, ch, time_val, wpm, acc):
-        time_surf = font_mono_large.render(str(time_val), True, theme["caret"])
-        surface.blit(time_surf, (cx + 20, cy + 10))
-        stats_text = f"WPM: {wpm}   ACC: {acc}%"
-        stats_surf = font_ui.render(stats_text, True, theme["main"])
-        surface.blit(stats_surf, (cx + cw - stats_surf.get_width() - 20, cy + 30))
-
-    # ---- Wrap text ----
-    def wrap_text(text, font, max_width):
-        lines = []
-        line = ""
-        for ch in text:
-            test = line + ch
-            w = font.size(test)[0]
-            if w <= max_width:
-                line = test
-            else:
-                if line:
-                    lines.append(line)
-                line = ch
-        if line:
-            lines.append(line)
-        return lines
-
-    # ---- Draw Display (Returns Target Cursor Rect) ----
-    def draw_display(surface, theme, cx, cy, cw, ch, target_text, user_input):
-        rect = pygame.Rect(cx, cy, cw, ch)
-        pygame.draw.rect(surface, theme["bg"], rect)
-        
-        padding = 10
-        inner_w = cw - 2 * padding
-        inner_x, inner_y = cx + padding, cy + padding
+        return themes.get_palette()
 
-        target_lines = wrap_text(target_text, font_mono, inner_w)
-        line_height = font_mono.get_height() + 8 
-        cursor_idx = len(user_input)
-
-        py = inner_y
-        idx = 0
-        max_rows = ch // line_height
-        
-        target_caret_rect = None
-
-        for row_idx, tline in enumerate(target_lines):
-            if row_idx >= max_rows: break
-            
-            uline = user_input[idx : idx + len(tline)] if idx < len(user_input) else ""
-            px = inner_x
-            for i, tc in enumerate(tline):
-                color = theme["main"]
-                bg = None
-                is_cursor_pos = (idx + i) == cursor_idx
-                
-                if i < len(uline):
-                    if uline[i] == tc:
-                        color = theme["correct"]
-                    else:
-                        color = theme["error"]
-                
-                if is_cursor_pos:
-                    cw_char = font_mono.size(tc)[0]
-                    target_caret_rect = pygame.Rect(px, py, cw_char, line_height)
-                    pass
-
-                cs = font_mono.render(tc, True, color)
-                surface.blit(cs, (px, py))
-                px += cs.get_width()
-            
-            if (idx + len(tline) == cursor_idx):
-                cw_char = font_mono.size(" ")[0]
-                target_caret_rect = pygame.Rect(px, py, cw_char, line_height)
-                
-            idx += len(tline)
-            py += line_height
-            
-        return target_caret_rect
-
-    # ---- Keyboard ----
-    def build_key_rects(cx, cy, cw, layout_name):
-        rows = KEYBOARD_ROWS_QWERTY if layout_name == "qwerty" else KEYBOARD_ROWS_DVORAK
-        key_w = KEY_SIZE
-        key_gap = KEY_GAP
-        key_rects = {}
-        max_row_len = max(len(r) for r in rows)
-        block_width = max_row_len * (key_w + key_gap) - key_gap
-        block_left = cx + (cw - block_width) // 2
-        row_y = cy + 10
-        for row_str in rows:
-            row_width = len(row_str) * (key_w + key_gap) - key_gap
-            start_x = block_left + (block_width - row_width) // 2
-            x = start_x
-            for ch in row_str:
-                key_rects[ch] = pygame.Rect(x, row_y, key_w, key_w)
-                x += key_w + key_gap
-            row_y += key_w + key_gap
-        space_x = block_left + (block_width - KEY_SPACE_W) // 2
-        key_rects[" "] = pygame.Rect(space_x, row_y, KEY_SPACE_W, KEY_SPACE_H)
-        return key_rects
-
-    def draw_keyboard(surface, theme, cx, cy, cw, ch, layout_name, highlight_char=None, highlight_correct=True):
-        key_rects = build_key_rects(cx, cy, cw, layout_name)
-        for ch, r in key_rects.items():
-            if ch == highlight_char:
-                color = theme["correct"] if highlight_correct else theme["error"]
-                bg_col = color
-                txt_col = theme["bg"]
-            else:
-                bg_col = theme["main"]
-                txt_col = theme["bg"]
-            
-            pygame.draw.rect(surface, bg_col, r, border_radius=4)
-            label = "SPACE" if ch == " " else ch.upper()
-            txt = font_key.render(label, True, txt_col)
-            surface.blit(txt, (r.centerx - txt.get_width() // 2, r.centery - txt.get_height() // 2))
-        return key_rects
-
-    # ---- Overlays ----
-    def draw_overlay(surface, theme, wpm, acc, missed_str):
-        overlay = pygame.Surface(surface.get_size(), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
-        surface.blit(overlay, (0, 0))
-
-        sw, sh = surface.get_size()
-        ow, oh = 600, 450
-        ox, oy = (sw - ow) // 2, (sh - oh) // 2
-        rect = pygame.Rect(ox, oy, ow, oh)
-        
-        pygame.draw.rect(surface, theme["bg"], rect, border_radius=12)
-        pygame.draw.rect(surface, theme["main"], rect, 2, border_radius=12)
-
-        draw_text_centered(surface, "Result", font_ui_bold, theme["caret"], (rect.centerx, oy + 40))
-        y = oy + 100
-        wpm_str = f"{wpm} WPM"
-        acc_str = f"{acc}% ACC"
-        wpm_surf = font_mono_large.render(wpm_str, True, theme["main"])
-        acc_surf = font_mono_large.render(acc_str, True, theme["main"])
-        surface.blit(wpm_surf, (rect.centerx - wpm_surf.get_width() - 20, y))
-        surface.blit(acc_surf, (rect.centerx + 20, y))
-
-        y += 80
-        if missed_str:
-            lines = missed_str.split("\n")
-            for line in lines[:5]: 
-                t = font_ui.render(line, True, theme["error"])
-                surface.blit(t, (rect.centerx - t.get_width() // 2, y))
-                y += 24
-        else:
-            t = font_ui.render("Perfect!", True, theme["correct"])
-            surface.blit(t, (rect.centerx - t.get_width() // 2, y))
-
-        hint = font_ui.render("Press TAB to restart", True, theme["main"])
-        surface.blit(hint, (rect.centerx - hint.get_width() // 2, rect.bottom - 40))
-
-    def draw_history_overlay(surface, theme):
-        # Semi-transparent bg
-        overlay = pygame.Surface(surface.get_size(), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 210))
-        surface.blit(overlay, (0, 0))
-
-        sw, sh = surface.get_size()
-        ow, oh = 800, 700 
-        ox, oy = (sw - ow) // 2, (sh - oh) // 2
-        rect = pygame.Rect(ox, oy, ow, oh)
-        
-        pygame.draw.rect(surface, theme["bg"], rect, border_radius=12)
-        pygame.draw.rect(surface, theme["main"], rect, 2, border_radius=12)
-
-        draw_text_centered(surface, "Typing History", font_ui_bold, theme["caret"], (rect.centerx, oy + 30))
-        
-        # --- Table (Top Half) ---
-        headers = ["Date", "Mode", "WPM", "Accuracy", "Missed"]
-        col_x = [ox + 40, ox + 220, ox + 350, ox + 450, ox + 580]
-        header_y = oy + 60
-        
-        for i, h in enumerate(headers):
-            txt = font_ui_bold.render(h, True, theme["main"])
-            surface.blit(txt, (col_x[i], header_y))
-        
-        pygame.draw.line(surface, theme["main"], (ox + 20, header_y + 25), (ox + ow - 20, header_y + 25), 1)
-
-        history = HistoryManager.load_history()
-        recent_count = 8
-        recent = list(reversed(history))[:recent_count]
-        
-        row_y = header_y + 35
-        for entry in recent:
-            date_str = entry.get("timestamp", "")[5:-3]
-            mode_str = entry.get("mode", "?").title()
-            wpm_val = str(entry.get("wpm", 0))
-            acc_val = f"{entry.get('accuracy', 0)}%"
-            miss_val = str(entry.get("missed", 0))
-
-            vals = [date_str, mode_str, wpm_val, acc_val, miss_val]
-            for i, val in enumerate(vals):
-                c = theme["main"]
-                if i == 2: c = theme["caret"]
-                txt = font_ui.render(val, True, c)
-                surface.blit(txt, (col_x[i], row_y))
-            row_y += 28
-
-        # --- Graph (Bottom Half) ---
-        graph_top = row_y + 40
-        graph_h = rect.bottom - graph_top - 90 
-        graph_w = ow - 120
-        graph_rect = pygame.Rect(ox + 80, graph_top, graph_w, graph_h)
-        
-        # Graph Background/Grid
-        # pygame.draw.rect(surface, (30, 30, 30), graph_rect) # Optional dark bg for graph area
-        
-        graph_data = history[-50:]
-        if len(graph_data) > 1:
-            wpm_values = [d.get("wpm", 0) for d in graph_data]
-            max_wpm = max(wpm_values)
-            min_wpm = min(wpm_values)
-            if max_wpm == min_wpm:
-                max_wpm += 10
-                min_wpm = max(0, min_wpm - 10)
-            
-            # Grid Lines
-            grid_steps = 4
-            for i in range(grid_steps + 1):
-                val = min_wpm + (max_wpm - min_wpm) * (i / grid_steps)
-                y_pos = graph_rect.bottom - (i / grid_steps) * graph_rect.height
-                
-                # Grid line
-                pygame.draw.line(surface, theme["main"], (graph_rect.left, y_pos), (graph_rect.right, y_pos), 1)
-                
-                # Axis Label
-                lbl = font_ui_small.render(f"{int(val)}", True, theme["main"])
-                surface.blit(lbl, (graph_rect.left - lbl.get_width() - 10, y_pos - lbl.get_height() // 2))
-
-            # Calculate Points
-            points = []
-            count = len(wpm_values)
-            for i, wpm in enumerate(wpm_values):
-                px = graph_rect.left + (i / (count - 1)) * graph_rect.width if count > 1 else graph_rect.centerx
-                norm = (wpm - min_wpm) / (max_wpm - min_wpm)
-                py = graph_rect.bottom - norm * graph_rect.height
-                points.append((px, py))
-
-            # Draw Fill Under Curve (Raw WPM)
-            if len(points) >= 2:
-                poly_points = points.copy()
-                poly_points.append((points[-1][0], graph_rect.bottom))
-                poly_points.append((points[0][0], graph_rect.bottom))
-                
-                fill_surf = pygame.Surface(surface.get_size(), pygame.SRCALPHA)
-                r, g, b = theme["caret"]
-                pygame.draw.polygon(fill_surf, (r, g, b, 40), poly_points)
-                surface.blit(fill_surf, (0, 0))
-
-                # Antialiased Line
-                pygame.draw.aalines(surface, theme["caret"], False, points)
-                # Markers
-                for p in points:
-                    pygame.draw.circle(surface, theme["caret"], (int(p[0]), int(p[1])), 2)
-
-            # Moving Average
-            window_size = 10
-            if len(wpm_values) >= window_size:
-                avg_points = []
-                for i in range(len(wpm_values) - window_size + 1):
-                    window = wpm_values[i : i + window_size]
-                    avg = sum(window) / window_size
-                    avg_points.append((i + window_size - 1, avg))
-                
-                if len(avg_points) >= 2:
-                    ma_screen_points = []
-                    for idx, val in avg_points:
-                        px = graph_rect.left + (idx / (count - 1)) * graph_rect.width
-                        norm = (val - min_wpm) / (max_wpm - min_wpm)
-                        norm = max(0, min(1, norm))
-                        py = graph_rect.bottom - norm * graph_rect.height
-                        ma_screen_points.append((px, py))
-                    
-                    # Draw thick smooth line for average
-                    # Since aalines doesn't support thickness > 1 well, we draw multiple offsets or just normal lines
-                    # For "Curve", standard lines with thickness 2 or 3 is best.
-                    pygame.draw.lines(surface, theme["main"], False, ma_screen_points, 3)
-
-            # Legend
-            legend_y = graph_rect.bottom + 25
-            
-            # Legend Item 1
-            lx1 = rect.centerx - 80
-            pygame.draw.circle(surface, theme["caret"], (lx1, legend_y + 6), 4)
-            l1 = font_ui_small.render("Raw WPM", True, theme["main"])
-            surface.blit(l1, (lx1 + 10, legend_y))
-            
-            # Legend Item 2
-            lx2 = rect.centerx + 40
-            pygame.draw.circle(surface, theme["main"], (lx2, legend_y + 6), 4)
-            l2 = font_ui_small.render(f"Avg ({window_size})", True, theme["main"])
-            surface.blit(l2, (lx2 + 10, legend_y))
-        
-        elif len(graph_data) == 1:
-             msg = font_ui.render("Not enough data for graph", True, theme["main"])
-             surface.blit(msg, (graph_rect.centerx - msg.get_width()//2, graph_rect.centery))
-        else:
-             msg = font_ui.render("No history data", True, theme["main"])
-             surface.blit(msg, (graph_rect.centerx - msg.get_width()//2, graph_rect.centery))
-
-        close_btn_rect = pygame.Rect(0, 0, 100, 34)
-        close_btn_rect.center = (rect.centerx, rect.bottom - 30)
-        draw_button_bg(surface, close_btn_rect, theme["bg"], theme["main"], radius=6)
-        draw_text_centered(surface, "Close", font_ui_bold, theme["main"], close_btn_rect.center)
-        
-        return close_btn_rect
+    def display_warmer():
+        """warm() callback for NextTest: lay out and render a text for the current window and theme."""
+        display_w = render.layout_rects(*render.content_rect(screen.get_size())[:3])["display"][2]
+        color = get_theme()["main"]
+        return lambda text: renderer.prepare_display(text, display_w, color)
 
     def open_theme_dropdown(theme_btn_rect):
         nonlocal theme_dropdown_rects, theme_dropdown_scroll
@@ -677,20 +186,63 @@ def main():
         tx = theme_btn_rect.left
         theme_dropdown_rects = []
         for i, name in enumerate(theme_names):
-            r = pygame.Rect(tx, ty + i * THEME_ITEM_H, 180, THEME_ITEM_H - 2)
+            r = pygame.Rect(tx, ty + i * THEME_ITEM_H, THEME_DROPDOWN_W, THEME_ITEM_H - 2)
             theme_dropdown_rects.append((r, name))
         return theme_dropdown_rects
 
+    def attach_latency():
+        if record_latency and latency_hist.n:
+            summary = latency_hist.summary()
+            summary["timestamp_source"] = latency_source
+            summary["settings"] = {
+                "reduced_motion": reduced_motion,
+                "font_size": current_font_size,
+                "window": list(screen.get_size()),
+                "vsync": False,
+            }
+            engine.latency = summary
+
+    def recover_session(record):
+        """Continue the interrupted test, or with record=True end it there and save its result."""
+        nonlocal recovered, current_mode, daily_seed
+        batch = engine.resume(recovered)
+        recovered = None
+        current_mode = engine.mode
+        daily_seed = engine.daily
+        race_session.new_text(engine.target_text)
+        next_test.prepare(display_warmer())
+        if record or batch.finished:
+            end_game()
+
+    def end_game():
+        """Stop the clock now; results are saved by finish_game() after the next flip."""
+        nonlocal save_pending
+        if engine.is_running:
+            engine.finish()
+        save_pending = True
+
     def finish_game():
-        nonlocal show_overlay, overlay_wpm, overlay_acc, overlay_missed
-        engine.stop()
+        nonlocal show_overlay, overlay_wpm, overlay_acc, overlay_missed, overlay_timeline, overlay_consistency
+        nonlocal save_pending
+        save_pending = False
+        attach_latency()
+        if not engine.is_finished:
+            engine.finish()
+        engine.save()
+        load_heatmap()
+        if engine.mode in ("practice", "book"):
+            next_test.prepare(display_warmer())  # practice text and book pages depend on what was just saved
+        race_session.finished(engine.wpm)
         overlay_wpm = engine.wpm
         overlay_acc = engine.accuracy
-        if not engine.missed_data:
+        overlay_timeline = engine.timeline.to_dict()
+        overlay_consistency = engine.timeline.consistency()
+        missed = engine.missed_data
+        if not missed:
             overlay_missed = ""
         else:
             misses = {}
-            for exp, typed in engine.missed_data:
+            for exp, typed in missed:
                 key = f"'{exp}'" if exp != " " else "[Space]"
                 misses[key] = misses.get(key, 0) + 1
             overlay_missed = "Characters missed:\n"
@@ -700,15 +252,25 @@ def main():
         show_overlay = True
 
     def restart_game():
-        nonlocal show_overlay, theme_dropdown_rects, key_highlight, caret_visible
-        if engine.is_running:
-            engine.stop()
-        engine.reset()
+        nonlocal show_overlay, theme_dropdown_rects, key_highlight, caret_visible, save_pending
+        if engine.is_running or save_pending:
+            attach_latency()
+            if not engine.is_finished:
+                engine.finish()
+            engine.save()
+            save_pending = False
+        next_test.restart(display_warmer())
+        race_session.new_text(engine.target_text)
+        latency_hist.reset()
+        pending_key_times.clear()
         show_overlay = False
         theme_dropdown_rects = None
         key_highlight = None
         caret_visible = True
 
+    next_test.prepare(display_warmer())
+    load_heatmap()
+
     # ---- Main loop ----
     last_tick = pygame.time.get_ticks()
     settings_rects_cache = None
@@ -718,147 +280,192 @@ def main():
 
     running = True
     while running:
+        prof.begin_frame()
         now = pygame.time.get_ticks()
         theme = get_theme()
-        cx, cy, cw, ch = content_rect()
-        layouts = layout_rects(cx, cy, cw)
+        cx, cy, cw, ch = render.content_rect(screen.get_size())
+        layouts = render.layout_rects(cx, cy, cw)
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                save_cfg()
-                running = False
+        with prof.section("events"):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    save_cfg()
+                    session_journal.close()
+                    running = False
             
-            elif event.type == pygame.KEYDOWN:
-                if show_history:
-                    if event.key == pygame.K_ESCAPE:
-                        show_history = False
-                    continue
-
-                if event.key == pygame.K_TAB:
-                    restart_game()
-                    continue
-                
-                if show_overlay:
-                    if event.key == pygame.K_ESCAPE:
+                elif event.type == pygame.KEYDOWN:
+                    if recovered is not None:
+                        if event.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
+                            recover_session(record=False)
+                        elif event.key == pygame.K_r:
+                            recover_session(record=True)
+                        elif event.key == pygame.K_ESCAPE:
+                            session_journal.discard()
+                            recovered = None
+                        continue
+                    if event.key == pygame.K_F3:
+                        prof.toggle()
+                        prof_rows, prof_counters = [], []
+                        continue
+                    if event.key == pygame.K_F4:
+                        if prof.dump_csv(PROFILE_TRACE_PATH):
+                            print(f"Profile trace written to {PROFILE_TRACE_PATH}")
+                        continue
+                    if event.key == pygame.K_F5:
+                        race_session.ghost_enabled = not race_session.ghost_enabled
+                        save_cfg()
                         restart_game()
-                    continue
+                        continue
+                    if event.key == pygame.K_F6:
+                        show_heatmap = not show_heatmap
+                        load_heatmap()
+                        save_cfg()
+                        continue
 
-                if event.key == pygame.K_BACKSPACE:
-                    char = "\b"
-                else:
-                    char = event.unicode if event.unicode and event.unicode.isprintable() else None
-                    if event.key == pygame.K_SPACE:
-                        char = " "
+                    if show_history:
+                        if event.key == pygame.K_ESCAPE:
+                            show_history = False
+                        continue
+
+                    if event.key == pygame.K_TAB:
+                        restart_game()
+                        continue
                 
-                if char is not None:
-                    if char == "\b":
-                        key_highlight = None
+                    if show_overlay:
+                        if event.key == pygame.K_ESCAPE:
+                            restart_game()
+                        continue
+
+                    if event.key == pygame.K_BACKSPACE:
+                        char = "\b"
+                    elif event.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
+                        char = "\n" if engine.mode == "code" else None
                     else:
-                        idx = len(engine.user_input)
-                        correct = idx < len(engine.target_text) and engine.target_text[idx] == char
-                        key_highlight = (char, correct, now)
-                        if sound_on_error and not correct and idx < len(engine.target_text):
-                            try:
-                                sound_util.play_error_beep()
-                            except Exception:
-                                pass
-                    if not engine.is_finished:
-                        finished = engine.process_key(char)
-                        if finished:
-                            finish_game()
-
-            elif event.type == pygame.MOUSEWHEEL:
-                if theme_dropdown_rects:
-                    max_scroll = max(0, len(theme_names) * THEME_ITEM_H - THEME_DROPDOWN_MAX_H)
-                    theme_dropdown_scroll = max(0, min(max_scroll, theme_dropdown_scroll - event.y * 30))
-
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button != 1:
-                    continue
-                pos = event.pos
+                        char = event.unicode if event.unicode and event.unicode.isprintable() else None
+                        if event.key == pygame.K_SPACE:
+                            char = " "
+                
+                    if char is not None:
+                        if char == "\b":
+                            key_highlight = None
+                        else:
+                            idx = engine.caret
+                            correct = idx < len(engine.target_text) and engine.target_text[idx] == char
+                            key_highlight = (char, correct, now)
+                            if sound_on_error and not correct and idx < len(engine.target_text):
+                                try:
+                                    sound_util.play_error_beep()
+                                except Exception:
+                                    pass
+                        if not engine.is_finished:
+                            # SDL stamps events in get_ticks() ms; map that onto perf_counter()
+                            key_time = time.perf_counter()
+                            ev_ticks = getattr(event, "timestamp", None)
+                            if ev_ticks:
+                                key_time -= max(0, pygame.time.get_ticks() - ev_ticks) / 1000
+                                latency_source = "sdl_event"
+                            pending_key_times.append(key_time)
+                            finished = engine.process_key(char)
+                            race_session.key(engine.caret, (time.time() - engine.start_time) * 1000)
+                            if finished:
+                                end_game()
+
+                elif event.type == pygame.MOUSEWHEEL:
+                    if theme_dropdown_rects:
+                        max_scroll = max(0, len(theme_names) * THEME_ITEM_H - THEME_DROPDOWN_MAX_H)
+                        theme_dropdown_scroll = max(0, min(max_scroll, theme_dropdown_scroll - event.y * 30))
+
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    if event.button != 1:
+                        continue
+                    pos = event.pos
+                    if recovered is not None:
+                        continue
                 
-                if show_history:
-                     if history_close_btn_rect and history_close_btn_rect.collidepoint(pos):
-                         show_history = False
-                     continue
-
-                # Theme dropdown
-                if theme_dropdown_rects:
-                    tx = theme_dropdown_rects[0][0].x
-                    ty = theme_dropdown_rects[0][0].y
-                    drop_h = min(THEME_DROPDOWN_MAX_H, len(theme_names) * THEME_ITEM_H)
-                    vis_top = ty - theme_dropdown_scroll
-                    if (tx <= pos[0] <= tx + 180 and vis_top <= pos[1] <= vis_top + drop_h):
-                        item_idx = (pos[1] - vis_top + theme_dropdown_scroll) // THEME_ITEM_H
-                        if 0 <= item_idx < len(theme_names):
-                            name = theme_names[item_idx]
-                            resources.CURRENT_THEME = name
-                            current_theme_name = name
-                            save_cfg()
+                    if show_history:
+                         if history_close_btn_rect and history_close_btn_rect.collidepoint(pos):
+                             show_history = False
+                         continue
+
+                    # Theme dropdown
+                    if theme_dropdown_rects:
+                        tx = theme_dropdown_rects[0][0].x
+                        ty = theme_dropdown_rects[0][0].y
+                        drop_h = min(THEME_DROPDOWN_MAX_H, len(theme_names) * THEME_ITEM_H)
+                        vis_top = ty - theme_dropdown_scroll
+                        if (tx <= pos[0] <= tx + THEME_DROPDOWN_W and vis_top <= pos[1] <= vis_top + drop_h):
+                            item_idx = (pos[1] - vis_top + theme_dropdown_scroll) // THEME_ITEM_H
+                            if 0 <= item_idx < len(theme_names):
+                                current_theme_name = themes.set_theme(theme_names[item_idx]).name
+                                save_cfg()
+                                theme_dropdown_rects = None
+                        else:
                             theme_dropdown_rects = None
-                    else:
-                        theme_dropdown_rects = None
-                    continue
+                        continue
 
-                # Settings clicks
-                sx, sy, sw, sh = layouts["settings"]
-                settings_rects_cache = get_settings_bar_rects(sx, sy, sw, sh)
+                    # Settings clicks: answered from the rect table of the last drawn bar
+                    hit = renderer.settings_bar.hit_test(pos)
+                    if hit is None:
+                        continue
+                    group, value = hit
                 
-                if settings_rects_cache["history"].collidepoint(pos):
-                    show_history = not show_history
-                    continue
+                    if group == "history":
+                        show_history = not show_history
+                        continue
 
-                if show_overlay:
-                    continue 
+                    if show_overlay:
+                        continue 
                 
-                if settings_rects_cache["theme"].collidepoint(pos):
-                    theme_dropdown_rects = open_theme_dropdown(settings_rects_cache["theme"])
-                    continue
-                
-                for opt, r in settings_rects_cache["mode"].items():
-                    if r.collidepoint(pos):
-                        current_mode = opt
-                        engine.mode = opt
+                    if group == "theme":
+                        theme_dropdown_rects = open_theme_dropdown(settings_rects_cache["theme"])
+                    elif group == "mode":
+                        current_mode = value
+                        engine.mode = value
+                        save_cfg()
+                        restart_game()
+                    elif group == "layout":
+                        current_layout = value
+                        engine.layout = value
                         save_cfg()
                         restart_game()
-                        break
-                for opt, r in settings_rects_cache["layout"].items():
-                    if r.collidepoint(pos):
-                        current_layout = opt
-                        engine.layout = opt
+                    elif group == "duration":
+                        current_duration = value
+                        engine.test_duration = value
                         save_cfg()
                         restart_game()
-                        break
-                for d, r in settings_rects_cache["duration"].items():
-                    if r.collidepoint(pos):
-                        current_duration = d
-                        engine.test_duration = d
+                    elif group == "words":
+                        current_word_count = value
+                        engine.target_word_count = value
                         save_cfg()
                         restart_game()
-                        break
-                for w, r in settings_rects_cache["words"].items():
-                    if r.collidepoint(pos):
-                        current_word_count = w
-                        engine.target_word_count = w
+                    elif group == "quote":
+                        current_quote_length = value
+                        engine.quote_length = value
                         save_cfg()
                         restart_game()
-                        break
-                for f, r in settings_rects_cache["font"].items():
-                    if r.collidepoint(pos):
-                        current_font_size = f
+                    elif group == "drill":
+                        engine.drill = value
                         save_cfg()
-                        font_size_px = config.get_font_size_px(f)
+                        restart_game()
+                    elif group == "font":
+                        current_font_size = value
+                        save_cfg()
+                        font_size_px = config.get_font_size_px(value)
                         resources.FONT_SIZE = font_size_px
-                        font_mono = _load_font(roboto_regular, font_size_px) or pygame.font.SysFont("consolas", font_size_px)
-                        break
-                if settings_rects_cache["sound"].collidepoint(pos):
-                    sound_on_error = not sound_on_error
-                    save_cfg()
-                if settings_rects_cache["reduced"].collidepoint(pos):
-                    reduced_motion = not reduced_motion
-                    save_cfg()
-                    if reduced_motion:
-                        caret_visible = True
+                        renderer.set_font_size(font_size_px)
+                    elif group == "sound":
+                        sound_on_error = not sound_on_error
+                        save_cfg()
+                    elif group == "reduced":
+                        reduced_motion = not reduced_motion
+                        save_cfg()
+                        if reduced_motion:
+                            caret_visible = True
+                    elif group == "daily":
+                        daily_seed = not daily_seed
+                        engine.daily = daily_seed
+                        save_cfg()
+                        restart_game()
 
         # --- Update ---
         if not show_overlay and not show_history and engine.is_running:
@@ -866,7 +473,7 @@ def main():
             if engine.mode == "time":
                 remaining = engine.test_duration - int(elapsed)
                 if remaining <= 0:
-                    finish_game()
+                    end_game()
         
         if now - last_tick >= 100:
             last_tick = now
@@ -880,7 +487,8 @@ def main():
         screen.fill(theme["bg"])
         
         sx, sy, sw, sh = layouts["settings"]
-        settings_rects_cache = draw_settings_bar(screen, theme, sx, sy, sw, sh)
+        with prof.section("draw_settings_bar"):
+            settings_rects_cache = renderer.draw_settings_bar(screen, theme, sx, sy, sw, sh, current_settings())
         
         hx, hy, hw, hh = layouts["hud"]
         if engine.mode == "time":
@@ -888,10 +496,16 @@ def main():
             time_val = remaining
         else:
             time_val = int(engine.get_time_elapsed()) if engine.is_running else 0
-        draw_hud(screen, theme, hx, hy, hw, hh, time_val, engine.wpm, engine.accuracy)
+        with prof.section("draw_hud"):
+            renderer.draw_hud(screen, theme, hx, hy, hw, hh, time_val, engine.wpm, engine.accuracy)
 
         dx, dy, dw, dh = layouts["display"]
-        target_caret_rect = draw_display(screen, theme, dx, dy, dw, dh, engine.target_text, engine.user_input)
+        with prof.section("draw_display"):
+            target_caret_rect = renderer.draw_display(screen, theme, dx, dy, dw, dh, engine.target_text, engine.typed)
+        race_ms = engine.get_time_elapsed() * 1000 if engine.is_running else None
+        remote_carets = race_session.frame(race_ms)
+        if remote_carets and not show_overlay and not show_history:
+            renderer.draw_remote_carets(screen, theme, remote_carets)
 
         # Smooth Caret Animation
         if target_caret_rect:
@@ -915,10 +529,8 @@ def main():
                          caret_rect_current = [cx_cur, cy_cur, cw_cur, ch_cur]
 
             if caret_visible and not show_overlay and not show_history:
-                 s = pygame.Surface((caret_rect_current[2], caret_rect_current[3]), pygame.SRCALPHA)
-                 r, g, b = theme["caret"]
-                 s.fill((r, g, b, 128)) 
-                 screen.blit(s, (caret_rect_current[0], caret_rect_current[1]))
+                with prof.section("draw_caret"):
+                    renderer.draw_caret(screen, theme, caret_rect_current)
                  
         else:
             pass
@@ -934,32 +546,49 @@ def main():
                 highlight_correct = hcorrect
             else:
                 key_highlight = None
-        draw_keyboard(screen, theme, kx, ky, kw, kh, current_layout, highlight_char, highlight_correct)
+        with prof.section("draw_keyboard"):
+            renderer.draw_keyboard(screen, theme, kx, ky, kw, kh, current_layout, highlight_char, highlight_correct,
+                                   key_heat)
 
         if theme_dropdown_rects and not show_history and not show_overlay:
-            tx, ty = theme_dropdown_rects[0][0].x, theme_dropdown_rects[0][0].y
-            drop_h = min(THEME_DROPDOWN_MAX_H, len(theme_names) * THEME_ITEM_H)
-            clip_rect = pygame.Rect(tx, ty, 180, drop_h)
-            screen.set_clip(clip_rect)
-            for i, (r, name) in enumerate(theme_dropdown_rects):
-                draw_r = pygame.Rect(r.x, r.y - theme_dropdown_scroll, r.w, r.h)
-                if draw_r.bottom <= ty or draw_r.top >= ty + drop_h:
-                    continue
-                pygame.draw.rect(screen, theme["main"], draw_r, border_radius=0)
-                pygame.draw.line(screen, theme["bg"], draw_r.bottomleft, draw_r.bottomright)
-                t = font_ui.render(name[:20], True, theme["bg"])
-                screen.blit(t, (draw_r.x + 8, draw_r.centery - t.get_height() // 2))
-            screen.set_clip(None)
+            with prof.section("draw_dropdown"):
+                renderer.draw_theme_dropdown(screen, theme, theme_dropdown_rects, theme_dropdown_scroll, len(theme_names))
 
         if show_overlay:
-            draw_overlay(screen, theme, overlay_wpm, overlay_acc, overlay_missed)
+            with prof.section("draw_overlay"):
+                renderer.draw_overlay(screen, theme, overlay_wpm, overlay_acc, overlay_missed,
+                                      overlay_timeline, overlay_consistency)
         
         if show_history:
-            history_close_btn_rect = draw_history_overlay(screen, theme)
-
-        pygame.display.flip()
+            with prof.section("draw_history_overlay"):
+                history_close_btn_rect = renderer.draw_history_overlay(screen, theme)
+
+        if recovered is not None:
+            renderer.draw_recovery_prompt(screen, theme, recovered.describe())
+
+        if prof.enabled:
+            if now - prof_last_refresh >= PROFILE_PANEL_REFRESH_MS:
+                prof_rows, prof_counters = prof.summary(), prof.counter_summary()
+                if latency_hist.n:
+                    prof_rows.append(("key->flip", latency_hist.percentile(50),
+                                      latency_hist.percentile(95), latency_hist.percentile(99)))
+                prof_last_refresh = now
+            renderer.draw_profiler_panel(screen, theme, prof_rows, prof_counters)
+
+        with prof.section("flip"):
+            pygame.display.flip()
+        if pending_key_times:
+            flipped_at = time.perf_counter()
+            for key_time in pending_key_times:
+                latency_hist.add((flipped_at - key_time) * 1000)
+            pending_key_times.clear()
+        if save_pending:
+            finish_game()
+        prof.end_frame()
         clock.tick(60)
 
+    race_session.close()
+    next_test.close()
     pygame.quit()
     sys.exit(0)
 
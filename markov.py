@@ -0,0 +1,164 @@
+# markov.py - Character-level Markov generator for practice pseudo-words
+#
+# Trained once per corpus. Transitions are stored in flat arrays:
+#   row_start[s] .. row_start[s + 1]  transitions leaving state s
+#   next_sym[t]    emitted symbol (0 = end of word)
+#   next_state[t]  state reached after emitting next_sym[t]
+#   count[t]       training count
+#   cum[t]         running sum of (biased) weights over all transitions,
+#                  so sampling a row is one bisect
+#   row_base[s], row_total[s]  cum value before row s and the row's weight
+# A state is the last ORDER - 1 characters of the word so far.
+import array
+import random
+from bisect import bisect_right
+
+import corpus
+
+ORDER = 3  # characters of context + 1
+END = 0
+_START = -1  # padding symbol for the start of a word (never emitted)
+
+MIN_WORD_LEN = 2
+MAX_WORD_LEN = 12
+MAX_ATTEMPTS = 50  # per word; the longest candidate is used after that
+# How strongly missed characters / n-grams pull the transitions
+MISS_BIAS = 4.0
+NGRAM_BIAS = 8.0
+
+
+class MarkovGenerator:
+    def __init__(self, words):
+        alphabet = sorted({ch for w in words for ch in w})
+        self.alphabet = alphabet
+        # Corpora of single characters (e.g. CJK) never produce MIN_WORD_LEN
+        self.min_len = min(MIN_WORD_LEN, max((len(w) for w in words), default=0))
+        self._sym = {ch: i + 1 for i, ch in enumerate(alphabet)}  # 0 is END
+
+        counts = {}  # (context tuple) -> {sym: count}
+        for w in words:
+            if not w:
+                continue
+            ctx = (_START,) * (ORDER - 1)
+            for ch in w:
+                sym = self._sym[ch]
+                row = counts.setdefault(ctx, {})
+                row[sym] = row.get(sym, 0) + 1
+                ctx = ctx[1:] + (sym,)
+            row = counts.setdefault(ctx, {})
+            row[END] = row.get(END, 0) + 1
+
+        contexts = list(counts)
+        start_ctx = (_START,) * (ORDER - 1)
+        if start_ctx in counts:
+            contexts.remove(start_ctx)
+            contexts.insert(0, start_ctx)
+        state_of = {ctx: i for i, ctx in enumerate(contexts)}
+        self.n_states = len(contexts)
+        # Context symbols per state, used to match n-grams when biasing
+        self.state_ctx = [ctx for ctx in contexts]
+
+        self.row_start = array.array("I", [0])
+        self.next_sym = array.array("H")
+        self.next_state = array.array("I")
+        self.count = array.array("I")
+        for ctx in contexts:
+            for sym, c in sorted(counts[ctx].items()):
+                self.next_sym.append(sym)
+                self.count.append(c)
+                nxt = ctx[1:] + (sym,)
+                # END transitions and dead ends restart from the start state
+                self.next_state.append(state_of.get(nxt, 0) if sym != END else 0)
+            self.row_start.append(len(self.next_sym))
+
+        self.cum = array.array("d", bytes(8 * len(self.count)))
+        self.row_base = array.array("d", bytes(8 * self.n_states))
+        self.row_total = array.array("d", bytes(8 * self.n_states))
+        self._bias_key = None
+        self.set_bias()
+
+    @classmethod
+    def from_corpus(cls, language=corpus.DEFAULT_LANGUAGE, limit=None):
+        return cls(list(corpus.get_corpus(language).iter_words(limit)))
+
+    def set_bias(self, missed_counts=None, ngrams=None):
+        """Reweight transitions toward missed characters and n-grams.
+
+        missed_counts: {char: count}; ngrams: {"th": count, ...} (2 or 3 chars).
+        One pass over the transition table; skipped if the bias is unchanged.
+        """
+        key = (tuple(sorted((missed_counts or {}).items())), tuple(sorted((ngrams or {}).items())))
+        if key == self._bias_key:
+            return
+        self._bias_key = key
+
+        sym_boost = [1.0] * (len(self.alphabet) + 1)
+        if missed_counts:
+            top = max(missed_counts.values()) or 1
+            for ch, c in missed_counts.items():
+                sym = self._sym.get(ch)
+                if sym is not None and c > 0:
+                    sym_boost[sym] += MISS_BIAS * c / top
+
+        # n-gram boosts keyed by (context suffix, sym)
+        ngram_boost = {}
+        if ngrams:
+            top = max(ngrams.values()) or 1
+            for gram, c in ngrams.items():
+                syms = [self._sym.get(ch) for ch in gram]
+                if c <= 0 or len(syms) < 2 or len(syms) > ORDER or None in syms:
+                    continue
+                ngram_boost[(tuple(syms[:-1]), syms[-1])] = 1.0 + NGRAM_BIAS * c / top
+
+        running = 0.0
+        cum = self.cum
+        for s in range(self.n_states):
+            ctx = self.state_ctx[s]
+            self.row_base[s] = running
+            for t in range(self.row_start[s], self.row_start[s + 1]):
+                sym = self.next_sym[t]
+                w = self.count[t] * sym_boost[sym]
+                if ngram_boost:
+                    for n in range(1, ORDER):
+                        w *= ngram_boost.get((ctx[-n:], sym), 1.0)
+                running += w
+                cum[t] = running
+            self.row_total[s] = running - self.row_base[s]
+
+    def generate_word(self, rng=random):
+        if not self.n_states:
+            raise ValueError("generator was trained on an empty corpus")
+        alphabet = self.alphabet
+        row_start, next_sym, next_state, cum = self.row_start, self.next_sym, self.next_state, self.cum
+        row_base, row_total = self.row_base, self.row_total
+        rand = rng.random
+        best = ""
+        for _ in range(MAX_ATTEMPTS):
+            s = 0
+            word = ""
+            for _ in range(MAX_WORD_LEN):
+                t = bisect_right(cum, row_base[s] + rand() * row_total[s], row_start[s], row_start[s + 1] - 1)
+                sym = next_sym[t]
+                if sym == END:
+                    break
+                word += alphabet[sym - 1]
+                s = next_state[t]
+            if len(word) >= self.min_len:
+                return word
+            if len(word) > len(best):
+                best = word
+        return best
+
+    def generate(self, n_words, rng=random):
+        return [self.generate_word(rng) for _ in range(n_words)]
+
+
+_generators = {}
+
+
+def get_generator(language=corpus.DEFAULT_LANGUAGE, limit=None):
+    """Generator trained on a corpus (top-`limit` words), built once and cached."""
+    key = (language, limit)
+    if key not in _generators:
+        _generators[key] = MarkovGenerator.from_corpus(language, limit)
+    return _generators[key]
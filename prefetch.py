@@ -0,0 +1,53 @@
+# prefetch.py - Prepares the next test on a worker thread
+#
+# Generating a test can hit the disk (practice mode reads typing_stats.json)
+# and its first frame has to lay out and render the whole text. NextTest
+# does both ahead of time: prepare() draws a seed on the caller's thread
+# and a single worker builds the text, then runs an optional warm(text)
+# callback (the app lays out the display and renders its glyphs there).
+# restart() swaps the result in, so TAB only resets counters.
+#
+# A prepared test is only used if it was made for the engine's current
+# settings; otherwise restart() resets synchronously, as before.
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+
+class NextTest:
+    def __init__(self, engine):
+        self.engine = engine
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="next-test")
+        self._future = None
+
+    def prepare(self, warm=None):
+        """Start preparing a test with the engine's current settings (replacing any older one)."""
+        if self._future is not None:
+            self._future.cancel()
+        job = self.engine.prepare_text()
+        self._future = self._pool.submit(self._build, job, warm)
+
+    @staticmethod
+    def _build(job, warm):
+        job.build()
+        if warm is not None:
+            warm(job.text)
+        return job
+
+    def take(self):
+        """The prepared PreparedText, waiting for the worker if it is still busy; None on failure."""
+        future, self._future = self._future, None
+        if future is None or future.cancelled():
+            return None
+        try:
+            return future.result()
+        except Exception as e:  # a broken prepared test must not break TAB
+            print(f"Error preparing next test: {e}", file=sys.stderr)
+            return None
+
+    def restart(self, warm=None):
+        """engine.reset() with the prepared text, then start preparing the one after."""
+        self.engine.reset(prepared=self.take())
+        self.prepare(warm)
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
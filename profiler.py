@@ -0,0 +1,238 @@
+# profiler.py - Per-frame subsystem timing with rolling percentiles
+#
+# Enable with the F3 hotkey or PYTHONTYPE_PROFILE=1. Each frame, the time
+# spent in every named section is summed and pushed into a fixed-size ring
+# buffer, so memory stays constant however long the app runs.
+import array
+import csv
+import math
+import os
+import sys
+import time
+
+ENV_VAR = "PYTHONTYPE_PROFILE"
+DEFAULT_FRAMES = 240  # ~4 s of history at 60 FPS
+FRAME = "frame"  # pseudo-section: whole frame time
+
+
+class RingBuffer:
+    """Fixed-size float ring buffer."""
+
+    def __init__(self, size):
+        self.size = size
+        self._data = array.array("d", bytes(8 * size))
+        self._next = 0
+        self.count = 0
+
+    def push(self, value):
+        self._data[self._next] = value
+        self._next = (self._next + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def values(self):
+        """Values oldest to newest."""
+        if self.count < self.size:
+            return self._data[: self.count].tolist()
+        return self._data[self._next :].tolist() + self._data[: self._next].tolist()
+
+    def percentiles(self, *ps):
+        """Nearest-rank percentiles (0-100) of the buffered values."""
+        vals = sorted(self.values())
+        if not vals:
+            return tuple(0.0 for _ in ps)
+        n = len(vals)
+        return tuple(vals[min(n - 1, max(0, math.ceil(p / 100 * n) - 1))] for p in ps)
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of latencies in milliseconds."""
+
+    # Upper bucket edges in ms; the last bucket is everything above
+    EDGES_MS = (2, 4, 6, 8, 10, 12, 14, 16, 20, 25, 33, 50, 75, 100, 150, 250)
+
+    def __init__(self):
+        self.counts = array.array("I", bytes(4 * (len(self.EDGES_MS) + 1)))
+        self.n = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def reset(self):
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.n = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        i = 0
+        edges = self.EDGES_MS
+        while i < len(edges) and ms > edges[i]:
+            i += 1
+        self.counts[i] += 1
+        self.n += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, p):
+        """Upper edge of the bucket holding the p-th percentile (max for the open bucket)."""
+        if not self.n:
+            return 0.0
+        rank = max(1, math.ceil(p / 100 * self.n))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return float(self.EDGES_MS[i]) if i < len(self.EDGES_MS) else self.max_ms
+        return self.max_ms
+
+    def summary(self):
+        """Compact dict for history entries."""
+        return {
+            "n": self.n,
+            "mean_ms": round(self.total_ms / self.n, 2) if self.n else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 2),
+            "edges_ms": list(self.EDGES_MS),
+            "counts": self.counts.tolist(),
+        }
+
+
+class _Section:
+    __slots__ = ("_prof", "name", "_start")
+
+    def __init__(self, prof, name):
+        self._prof = prof
+        self.name = name
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._prof._add(self.name, time.perf_counter() - self._start)
+        return False
+
+
+class _NullSection:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SECTION = _NullSection()
+
+
+class FrameProfiler:
+    def __init__(self, frames=DEFAULT_FRAMES, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get(ENV_VAR, "") not in ("", "0")
+        self.enabled = enabled
+        self.frames = frames
+        self._rings = {}  # name -> RingBuffer of seconds
+        self._counters = {}  # name -> RingBuffer of per-frame counts
+        self._sections = {}  # name -> reusable _Section
+        self._current = {}
+        self._current_counts = {}
+        self._frame_start = 0.0
+        self.frame_count = 0
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self._current.clear()
+        self._current_counts.clear()
+        self._frame_start = 0.0
+        return self.enabled
+
+    def section(self, name):
+        """Context manager timing `name`; a shared no-op when disabled."""
+        if not self.enabled:
+            return _NULL_SECTION
+        sec = self._sections.get(name)
+        if sec is None:
+            sec = self._sections[name] = _Section(self, name)
+        return sec
+
+    def _add(self, name, seconds):
+        self._current[name] = self._current.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        """Add to a per-frame counter (e.g. Surface allocations)."""
+        if self.enabled:
+            self._current_counts[name] = self._current_counts.get(name, 0) + n
+
+    def begin_frame(self):
+        if self.enabled:
+            self._frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if not self.enabled or not self._frame_start:
+            return
+        self._current[FRAME] = time.perf_counter() - self._frame_start
+        for name in self._current:
+            if name not in self._rings:
+                self._rings[name] = RingBuffer(self.frames)
+        # Sections not hit this frame record 0 so all rings stay frame-aligned
+        for name, ring in self._rings.items():
+            ring.push(self._current.get(name, 0.0))
+        for name in self._current_counts:
+            if name not in self._counters:
+                self._counters[name] = RingBuffer(self.frames)
+        for name, ring in self._counters.items():
+            ring.push(self._current_counts.get(name, 0))
+        self._current.clear()
+        self._current_counts.clear()
+        self.frame_count += 1
+
+    def summary(self):
+        """[(name, p50_ms, p95_ms, p99_ms)] with the frame total first."""
+        rows = []
+        for name, ring in self._rings.items():
+            p50, p95, p99 = ring.percentiles(50, 95, 99)
+            rows.append((name, p50 * 1000, p95 * 1000, p99 * 1000))
+        rows.sort(key=lambda r: (r[0] != FRAME, -r[2]))
+        return rows
+
+    def counter_summary(self):
+        """[(name, last, max)] over the buffered frames."""
+        out = []
+        for name, ring in self._counters.items():
+            vals = ring.values()
+            out.append((name, vals[-1] if vals else 0, max(vals) if vals else 0))
+        return out
+
+    def dump_csv(self, path):
+        """Write the buffered frames (one row per frame, ms per section). Returns True on success."""
+        columns = [self._rings[n].values() for n in self._rings]
+        columns += [self._counters[n].values() for n in self._counters]
+        n_rows = max((len(c) for c in columns), default=0)
+        first_frame = self.frame_count - n_rows
+        try:
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                w = csv.writer(f)
+                w.writerow(["frame"] + [f"{n}_ms" for n in self._rings] + list(self._counters))
+                n_timed = len(self._rings)
+                for i in range(n_rows):
+                    row = [first_frame + i]
+                    for j, col in enumerate(columns):
+                        # Rings created later hold fewer frames; pad the start
+                        k = i - (n_rows - len(col))
+                        if k < 0:
+                            row.append("")
+                        elif j < n_timed:
+                            row.append(f"{col[k] * 1000:.3f}")
+                        else:
+                            row.append(int(col[k]))
+                    w.writerow(row)
+            return True
+        except OSError as e:
+            print(f"Error writing profile trace: {e}", file=sys.stderr)
+            return False
@@ -0,0 +1,195 @@
+# quote_index.py - Length buckets and letter-heavy lists for quote selection
+#
+# The index is built once per quotes file and persisted next to it
+# (quotes.idx). It stores, for every length filter, the ids of matching
+# quotes plus 26 "heavy" lists (quotes where a letter is over-represented),
+# so choosing a quote for any filter is a single random index.
+#
+# The index is rebuilt when the quotes file's size or mtime changes.
+#
+# File layout (little-endian):
+#   magic (4s) | version (H) | reserved (H) | n_quotes (I) | source_size (I) | source_mtime_ns (Q) | n_lists (I)
+#   list lengths  n_lists x uint32
+#   list data     concatenated uint32 quote ids
+import array
+import os
+import random
+import struct
+import sys
+
+MAGIC = b"PTQI"
+VERSION = 2
+_HEADER = struct.Struct("<4sHHIIQI")
+
+# (name, min_chars, max_chars) - inclusive bounds, None = unbounded
+LENGTH_BUCKETS = [
+    ("short", 0, 100),
+    ("medium", 101, 300),
+    ("long", 301, 600),
+    ("thicc", 601, None),
+]
+LENGTH_FILTERS = ["all"] + [name for name, _, _ in LENGTH_BUCKETS]
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+# A letter is "heavy" in a quote when its share of the quote's letters is
+# at least this multiple of its share across the whole corpus.
+HEAVY_RATIO = 1.5
+HEAVY_MIN_COUNT = 2
+
+
+def length_bucket(n_chars):
+    for name, lo, hi in LENGTH_BUCKETS:
+        if n_chars >= lo and (hi is None or n_chars <= hi):
+            return name
+    return LENGTH_BUCKETS[-1][0]
+
+
+def _list_slot(filter_idx, letter_idx=None):
+    """Position of a list in the table: per filter, the base list then 26 heavy lists."""
+    base = filter_idx * 27
+    return base if letter_idx is None else base + 1 + letter_idx
+
+
+class QuoteIndex:
+    def __init__(self, n_quotes, lists, source_size=0, source_mtime_ns=0):
+        self.n_quotes = n_quotes
+        self._lists = lists  # list of array('I'), see _list_slot
+        self.source_size = source_size
+        self.source_mtime_ns = source_mtime_ns
+
+    # --- Building ---
+    @classmethod
+    def build(cls, quotes, source_size=0, source_mtime_ns=0):
+        """Scan every quote once and bucket it."""
+        n = len(quotes)
+        per_quote_counts = []
+        totals = [0] * 26
+        lengths = array.array("I")
+        for i in range(n):
+            text = quotes[i]
+            counts = [0] * 26
+            for ch in text.lower():
+                j = ord(ch) - 97
+                if 0 <= j < 26:
+                    counts[j] += 1
+            for j in range(26):
+                totals[j] += counts[j]
+            per_quote_counts.append(counts)
+            lengths.append(len(text))
+
+        grand_total = sum(totals) or 1
+        corpus_share = [t / grand_total for t in totals]
+        lists = [array.array("I") for _ in range(len(LENGTH_FILTERS) * 27)]
+        for i in range(n):
+            bucket = LENGTH_FILTERS.index(length_bucket(lengths[i]))
+            counts = per_quote_counts[i]
+            letters_in_quote = sum(counts) or 1
+            lists[_list_slot(0)].append(i)
+            lists[_list_slot(bucket)].append(i)
+            for j in range(26):
+                if counts[j] < HEAVY_MIN_COUNT or corpus_share[j] == 0:
+                    continue
+                if counts[j] / letters_in_quote >= HEAVY_RATIO * corpus_share[j]:
+                    lists[_list_slot(0, j)].append(i)
+                    lists[_list_slot(bucket, j)].append(i)
+        return cls(n, lists, source_size, source_mtime_ns)
+
+    # --- Persistence ---
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, 0, self.n_quotes, self.source_size, self.source_mtime_ns,
+                                 len(self._lists)))
+            lengths = array.array("I", [len(lst) for lst in self._lists])
+            for arr in [lengths] + self._lists:
+                if sys.byteorder == "big":
+                    arr = array.array("I", arr)
+                    arr.byteswap()
+                arr.tofile(f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            magic, version, _reserved, n_quotes, source_size, source_mtime_ns, n_lists = _HEADER.unpack_from(data, 0)
+        except struct.error:
+            raise ValueError("truncated quote index") from None
+        if magic != MAGIC or version != VERSION or n_lists != len(LENGTH_FILTERS) * 27:
+            raise ValueError("not a quote index file")
+
+        pos = _HEADER.size
+
+        def take(count):
+            nonlocal pos
+            arr = array.array("I")
+            arr.frombytes(data[pos : pos + count * 4])
+            if sys.byteorder == "big":
+                arr.byteswap()
+            pos += count * 4
+            return arr
+
+        lengths = take(n_lists)
+        lists = [take(length) for length in lengths]
+        if pos != len(data):
+            raise ValueError("truncated quote index")
+        return cls(n_quotes, lists, source_size, source_mtime_ns)
+
+    @classmethod
+    def load_or_build(cls, quotes, path, source_size, source_mtime_ns=0):
+        """Load the persisted index for a quotes file, rebuilding it if stale or missing."""
+        if os.path.isfile(path):
+            try:
+                idx = cls.load(path)
+                if (idx.n_quotes == len(quotes) and idx.source_size == source_size
+                        and idx.source_mtime_ns == source_mtime_ns):
+                    return idx
+            except (OSError, ValueError):
+                pass
+        idx = cls.build(quotes, source_size, source_mtime_ns)
+        try:
+            idx.save(path)
+        except OSError as e:
+            print(f"Error saving quote index: {e}", file=sys.stderr)
+        return idx
+
+    # --- Selection ---
+    @staticmethod
+    def _filter_idx(length):
+        """Position of a length filter; unknown filters mean "all"."""
+        return LENGTH_FILTERS.index(length) if length in LENGTH_FILTERS else 0
+
+    def ids(self, length="all"):
+        return self._lists[_list_slot(self._filter_idx(length))]
+
+    def heavy_ids(self, letter, length="all"):
+        return self._lists[_list_slot(self._filter_idx(length), LETTERS.index(letter))]
+
+    def count(self, length="all"):
+        return len(self.ids(length))
+
+    def pick(self, length="all", rng=random):
+        """Random quote id for a length filter, or None if the filter is empty."""
+        ids = self.ids(length)
+        if not ids:
+            return None
+        return ids[rng.randrange(len(ids))]
+
+    def pick_heavy(self, missed_counts, length="all", rng=random):
+        """Pick a quote heavy in one of the missed letters, weighted by miss count.
+
+        missed_counts maps characters to counts (as stored in typing_stats.json).
+        Falls back to pick() when no missed letter has matching quotes.
+        """
+        letters = []
+        weights = []
+        for ch, count in missed_counts.items():
+            ch = ch.lower()
+            if len(ch) == 1 and ch in LETTERS and count > 0 and self.heavy_ids(ch, length):
+                letters.append(ch)
+                weights.append(count)
+        if not letters:
+            return self.pick(length, rng)
+        letter = rng.choices(letters, weights)[0]
+        ids = self.heavy_ids(letter, length)
+        return ids[rng.randrange(len(ids))]
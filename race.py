@@ -0,0 +1,313 @@
+# race.py - Races against other typists and against your own best run
+#
+# Racers type the same target text (same seed and settings, e.g. with the
+# Day toggle on). Once per frame each racer sends at most one update: a
+# 12-byte packet holding a checksum of the text, its caret index and the
+# ms since it started typing. Receivers keep the latest update per racer
+# and ignore updates for other texts.
+#
+# Transports only move bytes: send(payload) to every other racer and
+# receive() -> [(sender, payload)] without blocking. LoopbackHub connects
+# racers inside one process (tests and ghost replays); UdpTransport talks
+# to peers on the LAN.
+#
+# A ghost replays a finished run through the same updates. Runs are
+# recorded as (index delta, ms delta) pairs; the best run per text is kept
+# in typing_ghosts.json.
+import array
+import hashlib
+import json
+import os
+import socket
+import struct
+import sys
+import zlib
+from bisect import bisect_right
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_UPDATE = struct.Struct("<III")  # text checksum, caret index, ms since start
+MAX_DATAGRAM = 64
+
+
+def text_checksum(text):
+    return zlib.crc32(text.encode("utf-8"))
+
+
+# --- Transports ---
+class LoopbackHub:
+    """In-process transport: every message reaches every other endpoint."""
+
+    def __init__(self):
+        self._queues = {}  # racer name -> list of (sender, payload)
+
+    def join(self, name):
+        if name in self._queues:
+            raise ValueError(f"racer {name!r} already joined")
+        self._queues[name] = []
+        return LoopbackEndpoint(self, name)
+
+    def _deliver(self, sender, payload):
+        for name, queue in self._queues.items():
+            if name != sender:
+                queue.append((sender, payload))
+
+    def _drain(self, name):
+        queue = self._queues[name]
+        self._queues[name] = []
+        return queue
+
+    def leave(self, name):
+        self._queues.pop(name, None)
+
+
+class LoopbackEndpoint:
+    def __init__(self, hub, name):
+        self.hub = hub
+        self.name = name
+
+    def send(self, payload):
+        self.hub._deliver(self.name, payload)
+
+    def receive(self):
+        return self.hub._drain(self.name)
+
+    def close(self):
+        self.hub.leave(self.name)
+
+
+class UdpTransport:
+    """Non-blocking UDP to a fixed list of peers; senders are (host, port) tuples."""
+
+    def __init__(self, port, peers, host="0.0.0.0"):
+        self.peers = [(h, int(p)) for h, p in peers]
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+
+    def send(self, payload):
+        for peer in self.peers:
+            try:
+                self.sock.sendto(payload, peer)
+            except OSError:
+                pass  # an unreachable peer must not stall the frame
+
+    def receive(self):
+        out = []
+        while True:
+            try:
+                payload, addr = self.sock.recvfrom(MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                return out
+            except OSError:  # e.g. ICMP port unreachable reported on Windows
+                continue
+            out.append((addr, payload))
+
+    def close(self):
+        self.sock.close()
+
+
+def parse_peers(peers):
+    """["host:port", ...] from the config -> [(host, port), ...]; bad entries are skipped."""
+    out = []
+    for peer in peers or []:
+        host, _, port = str(peer).rpartition(":")
+        if host and port.isdigit():
+            out.append((host, int(port)))
+        else:
+            print(f"Ignoring race peer {peer!r} (expected host:port)", file=sys.stderr)
+    return out
+
+
+# --- Racing ---
+class RaceClient:
+    """One racer's view of a race: sends its own caret, tracks everyone else's."""
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.positions = {}  # sender -> (index, ms)
+        self._checksum = 0
+        self._pending = None
+        self._sent = None
+
+    def start(self, text):
+        """New target text: forget old positions and ignore updates for other texts."""
+        self._checksum = text_checksum(text)
+        self.positions.clear()
+        self._pending = self._sent = None
+
+    def update(self, index, t_ms):
+        """Record the local caret; may be called for every key."""
+        self._pending = (index, t_ms)
+
+    def flush(self):
+        """Send the latest local position if the caret moved (call once per frame)."""
+        pending, self._pending = self._pending, None
+        if pending is not None and pending[0] != self._sent:
+            self._sent = pending[0]
+            self.transport.send(_UPDATE.pack(self._checksum, pending[0], max(0, int(pending[1]))))
+
+    def poll(self):
+        """Apply received updates; returns {sender: caret index}."""
+        for sender, payload in self.transport.receive():
+            if len(payload) != _UPDATE.size:
+                continue
+            checksum, index, t_ms = _UPDATE.unpack(payload)
+            if checksum != self._checksum:
+                continue
+            last = self.positions.get(sender)
+            if last is None or t_ms >= last[1]:  # UDP may reorder
+                self.positions[sender] = (index, t_ms)
+        return {sender: index for sender, (index, _t) in self.positions.items()}
+
+
+class RunRecorder:
+    """Caret index over time for one run, as flat (index delta, ms delta) pairs."""
+
+    def __init__(self):
+        self.trace = array.array("i")
+        self._index = 0
+        self._t_ms = 0
+
+    def record(self, index, t_ms):
+        t_ms = int(t_ms)
+        if index != self._index:
+            self.trace.extend((index - self._index, t_ms - self._t_ms))
+            self._index, self._t_ms = index, t_ms
+
+
+class Ghost:
+    """Replays a recorded trace: position(t_ms) is the caret index at that time."""
+
+    def __init__(self, trace):
+        self.times = array.array("i")
+        self.indices = array.array("i")
+        index = t_ms = 0
+        for i in range(0, len(trace) - 1, 2):
+            index += trace[i]
+            t_ms += trace[i + 1]
+            self.indices.append(index)
+            self.times.append(t_ms)
+
+    def position(self, t_ms):
+        i = bisect_right(self.times, t_ms)
+        return self.indices[i - 1] if i else 0
+
+
+class GhostRacer:
+    """Feeds a Ghost into a race transport, like a remote racer would."""
+
+    def __init__(self, ghost, transport):
+        self.ghost = ghost
+        self.client = RaceClient(transport)
+
+    def start(self, text):
+        self.client.start(text)
+
+    def tick(self, t_ms):
+        self.client.update(self.ghost.position(t_ms), t_ms)
+        self.client.flush()
+
+
+class GhostStore:
+    FILE_PATH = os.path.join(_APP_DIR, "typing_ghosts.json")
+    MAX_GHOSTS = 200
+
+    @staticmethod
+    def text_key(text):
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _load():
+        if not os.path.exists(GhostStore.FILE_PATH):
+            return {}
+        try:
+            with open(GhostStore.FILE_PATH, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError) as e:
+            print(f"Error loading ghosts: {e}", file=sys.stderr)
+            return {}
+
+    @staticmethod
+    def best(text):
+        """Ghost of the best run on this text, or None."""
+        entry = GhostStore._load().get(GhostStore.text_key(text))
+        if not entry or not entry.get("trace"):
+            return None
+        return Ghost(entry["trace"])
+
+    @staticmethod
+    def save_if_best(text, wpm, recorder):
+        """Keep this run if it is the fastest on its text; returns True if saved."""
+        if not recorder.trace:
+            return False
+        ghosts = GhostStore._load()
+        key = GhostStore.text_key(text)
+        if key in ghosts and ghosts[key].get("wpm", 0) >= wpm:
+            return False
+        ghosts.pop(key, None)
+        ghosts[key] = {"wpm": wpm, "trace": recorder.trace.tolist()}
+        while len(ghosts) > GhostStore.MAX_GHOSTS:
+            del ghosts[next(iter(ghosts))]  # oldest first
+        try:
+            with open(GhostStore.FILE_PATH, "w", encoding="utf-8") as f:
+                json.dump(ghosts, f, separators=(",", ":"))
+        except OSError as e:
+            print(f"Error saving ghost: {e}", file=sys.stderr)
+            return False
+        return True
+
+
+class RaceSession:
+    """Everything a frontend needs for one racer: call new_text() after every
+    reset, key() after every key and frame() once per frame."""
+
+    def __init__(self, transports=(), ghost=False):
+        self.hub = LoopbackHub()
+        self.transports = list(transports)
+        self.clients = [RaceClient(self.hub.join("you"))] + [RaceClient(t) for t in self.transports]
+        self.ghost_enabled = ghost
+        self.ghost = None
+        self.recorder = RunRecorder()
+        self.text = ""
+
+    def new_text(self, text):
+        self.text = text
+        self.recorder = RunRecorder()
+        for client in self.clients:
+            client.start(text)
+        if self.ghost is not None:
+            self.ghost.client.transport.close()
+            self.ghost = None
+        best = GhostStore.best(text) if self.ghost_enabled else None
+        if best is not None:
+            self.ghost = GhostRacer(best, self.hub.join("ghost"))
+            self.ghost.start(text)
+
+    def key(self, index, t_ms):
+        self.recorder.record(index, t_ms)
+        for client in self.clients:
+            client.update(index, t_ms)
+
+    def frame(self, t_ms=None):
+        """Send/receive this frame's updates; t_ms (None before the first key) drives the ghost.
+
+        Returns the caret indices of every other racer.
+        """
+        if self.ghost is not None and t_ms is not None:
+            self.ghost.tick(t_ms)
+            self.ghost.client.poll()  # drain our own updates
+        indices = []
+        for client in self.clients:
+            client.flush()
+            indices.extend(client.poll().values())
+        return indices
+
+    def finished(self, wpm):
+        """Keep the run as the text's ghost if it is the best so far."""
+        return GhostStore.save_if_best(self.text, wpm, self.recorder)
+
+    def close(self):
+        for transport in self.transports:
+            transport.close()
@@ -0,0 +1,667 @@
+# render.py - Pygame drawing for PythonType
+#
+# All drawing lives on Renderer so it can run outside main(): the app,
+# the headless benchmark (bench_render.py) and tests share the same code.
+# `settings` arguments are dicts shaped like the config (see config.DEFAULTS).
+import array
+import os
+from bisect import bisect_right
+
+import pygame
+from keytiming import KEYBOARD_ROWS_DVORAK, KEYBOARD_ROWS_QWERTY
+from logic import HistoryManager
+import themes
+from widgets import SettingsBar
+
+# --- Constants ---
+CONTENT_W = 850  # Slightly wider for better spacing
+HUD_TIMER_SIZE = 48
+KEY_SIZE = 46
+KEY_SPACE_W = 340
+KEY_SPACE_H = 42
+KEY_GAP = 6
+THEME_DROPDOWN_MAX_H = 300
+THEME_ITEM_H = 32
+THEME_DROPDOWN_W = 180
+MAX_CACHED_GLYPHS = 2048
+MAX_CACHED_LAYOUTS = 8
+REMOTE_CARET_W = 3
+DISPLAY_PADDING = 10
+
+
+# --- Helpers ---
+def theme_colors(name=None):
+    """Compiled palette for a theme (the current one by default)."""
+    return themes.get_palette(name)
+
+def _font_path(name):
+    base = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base, "fonts", name)
+
+def _load_font(path, size):
+    if os.path.isfile(path):
+        try:
+            return pygame.font.Font(path, size)
+        except Exception:
+            pass
+    return None
+
+# --- Layout Calculations ---
+def content_rect(screen_size):
+    w, h = screen_size
+    x = max(0, (w - CONTENT_W) // 2)
+    return x, 40, CONTENT_W, h - 60
+
+def layout_rects(cx, cy, cw):
+    y = cy
+    settings_h = 110 
+    settings_rect = (cx, y, cw, settings_h)
+    y += settings_h + 30
+    hud_h = 90
+    hud_rect = (cx, y, cw, hud_h)
+    y += hud_h + 20
+    display_h = 280
+    display_rect = (cx, y, cw, display_h)
+    y += display_h + 30
+    keyboard_rect = (cx, y, cw, 240)
+    return {
+        "settings": settings_rect,
+        "hud": hud_rect,
+        "display": display_rect,
+        "keyboard": keyboard_rect,
+    }
+
+
+class TextLayout:
+    """Wrapped text with the position of every character, built once per (text, width, font).
+
+    Rows break greedily at any character, and after every line break (which
+    takes the width of a space at the end of its row, for the caret). x[i] is
+    character i's offset in its row and row_start[r] the index of row r's
+    first character (with a final entry of len(text)), so any caret is found
+    without re-measuring text.
+    """
+
+    def __init__(self, text, advance, max_width, line_height):
+        self.text = text
+        self.line_height = line_height
+        self.x = array.array("i", bytes(4 * len(text)))
+        self.row_start = array.array("i", [0])
+        self.row_width = array.array("i")
+        self._advance = advance
+        px = 0
+        for i, ch in enumerate(text):
+            w = advance(ch if ch != "\n" else " ")
+            if px + w > max_width and px > 0:
+                self.row_start.append(i)
+                self.row_width.append(px)
+                px = 0
+            self.x[i] = px
+            px += w
+            if ch == "\n" and i + 1 < len(text):
+                self.row_start.append(i + 1)
+                self.row_width.append(px)
+                px = 0
+        if text:
+            self.row_start.append(len(text))
+            self.row_width.append(px)
+        else:
+            self.row_start = array.array("i")
+
+    @property
+    def n_rows(self):
+        return len(self.row_width)
+
+    def lines(self):
+        rs = self.row_start
+        return [self.text[rs[r] : rs[r + 1]] for r in range(self.n_rows)]
+
+    def row_of(self, index):
+        return min(bisect_right(self.row_start, index) - 1, self.n_rows - 1)
+
+    def caret(self, index):
+        """(x, row, width) of a caret before character `index`, or None for empty text.
+
+        A caret past the last character sits at the end of the last row.
+        """
+        if not self.n_rows:
+            return None
+        if index < len(self.text):
+            row = self.row_of(index)
+            ch = self.text[index]
+            return self.x[index], row, self._advance(ch if ch != "\n" else " ")
+        return self.row_width[-1], self.n_rows - 1, self._advance(" ")
+
+
+class Renderer:
+    """Fonts plus every drawing function of the app. Requires pygame.font to be initialised."""
+
+    def __init__(self, font_size_px):
+        # Increased UI font sizes for better readability
+        self.roboto_regular = _font_path("Roboto-Regular.ttf")
+        self.roboto_bold = _font_path("Roboto-Bold.ttf")
+        roboto_regular, roboto_bold = self.roboto_regular, self.roboto_bold
+
+        self.set_font_size(font_size_px)
+        self.font_mono_large = _load_font(roboto_regular, HUD_TIMER_SIZE) or pygame.font.SysFont("consolas", HUD_TIMER_SIZE)
+
+        # UI Fonts
+        self.font_ui = _load_font(roboto_regular, 16) or pygame.font.SysFont("segoeui", 16)
+        self.font_ui_bold = _load_font(roboto_bold, 14) or pygame.font.SysFont("segoeui", 14, bold=True)
+        self.font_ui_small = _load_font(roboto_bold, 12) or pygame.font.SysFont("segoeui", 12, bold=True)
+        self.font_key = _load_font(roboto_bold, 14) or pygame.font.SysFont("consolas", 14, bold=True)
+
+        self.settings_bar = SettingsBar(self)
+        # Long-lived scratch surfaces: name -> (Surface, fill color)
+        self._buffers = {}
+        # Optional FrameProfiler; Surface allocations are counted on it
+        self.profiler = None
+        # Rendered text: (font attr, text, color) -> Surface
+        self._glyphs = {}
+        # (text, width, font size) -> TextLayout; the last one drawn by draw_display
+        self._layouts = {}
+        self._display = None  # (layout, inner x, inner y, first visible row, visible rows)
+        themes.subscribe(self.on_theme_change)
+
+    def set_font_size(self, font_size_px):
+        """Reload the typing font (small/medium/large setting)."""
+        self.font_size_px = font_size_px
+        self.font_mono = _load_font(self.roboto_regular, font_size_px) or pygame.font.SysFont("consolas", font_size_px)
+        self._glyphs = {}
+        self._advances = {}
+        self._layouts = {}
+        self._display = None
+
+    def on_theme_change(self, palette):
+        """Drop everything rendered in the old theme's colors."""
+        self._glyphs.clear()
+        self.settings_bar.invalidate()
+
+    def glyph(self, text, color, font="font_mono"):
+        """Cached antialiased render of text in one of the renderer's fonts."""
+        key = (font, text, color)
+        surf = self._glyphs.get(key)
+        if surf is None:
+            if len(self._glyphs) >= MAX_CACHED_GLYPHS:
+                self._glyphs.clear()
+            if self.profiler is not None:
+                self.profiler.count("glyph_render")
+            surf = self._glyphs[key] = getattr(self, font).render(text, True, color)
+        return surf
+
+    def advance(self, ch):
+        """Width of one typing-font character (what draw_display steps by)."""
+        w = self._advances.get(ch)
+        if w is None:
+            w = self._advances[ch] = self.font_mono.size(ch)[0]
+        return w
+
+    def text_layout(self, text, max_width):
+        """Cached TextLayout of text in the typing font."""
+        key = (text, max_width, self.font_size_px)
+        layout = self._layouts.get(key)
+        if layout is None:
+            if len(self._layouts) >= MAX_CACHED_LAYOUTS:
+                self._layouts.clear()
+            if self.profiler is not None:
+                self.profiler.count("text_layout")
+            layout = self._layouts[key] = TextLayout(text, self.advance, max_width, self.font_mono.get_height() + 8)
+        return layout
+
+    def prepare_display(self, text, display_w, color):
+        """Lay out text for a display `display_w` wide and render its glyphs in `color`,
+        so the first draw_display of a new test finds everything cached.
+
+        Safe to call from a worker thread: it only adds cache entries.
+        """
+        layout = self.text_layout(text, display_w - 2 * DISPLAY_PADDING)
+        for ch in set(text) - {"\n"}:
+            self.glyph(ch, color)
+        return layout
+
+    # ---- Surfaces ----
+    def new_surface(self, size, flags=0):
+        """Allocate a Surface, counting it as "surface_alloc" on the profiler."""
+        if self.profiler is not None:
+            self.profiler.count("surface_alloc")
+        return pygame.Surface(size, flags)
+
+    def _buffer(self, name, size, fill=None, grow=False):
+        """Persistent SRCALPHA surface, reallocated only when `size` changes.
+
+        With grow=True any buffer at least as large as `size` is reused (blit
+        it with an area). A changed fill color refills in place.
+        """
+        entry = self._buffers.get(name)
+        if entry is not None:
+            w, h = entry[0].get_size()
+            if (w, h) == tuple(size) or (grow and w >= size[0] and h >= size[1]):
+                if fill is not None and entry[1] != fill:
+                    entry[0].fill(fill)
+                    self._buffers[name] = (entry[0], fill)
+                return entry[0]
+            if grow:
+                size = (max(w, size[0]), max(h, size[1]))
+        surf = self.new_surface(size, pygame.SRCALPHA)
+        if fill is not None:
+            surf.fill(fill)
+        self._buffers[name] = (surf, fill)
+        return surf
+
+    def draw_button_bg(self, surface, rect, color, border_color=None, radius=6):
+        pygame.draw.rect(surface, color, rect, border_radius=radius)
+        if border_color:
+            pygame.draw.rect(surface, border_color, rect, 1, border_radius=radius)
+
+    def draw_text_centered(self, surface, text, font, color, center_pos):
+        """Blit text centered on center_pos; font is a renderer font attribute name."""
+        surf = self.glyph(text, color, font)
+        surface.blit(surf, (center_pos[0] - surf.get_width() // 2, center_pos[1] - surf.get_height() // 2))
+
+    # ---- Settings Bar ----
+    def draw_settings_bar(self, surface, theme, cx, cy, cw, ch, settings):
+        return self.settings_bar.draw(surface, theme, cx, cy, cw, ch, settings)
+
+    def get_settings_bar_rects(self, cx, cy, cw, ch, settings):
+        return self.settings_bar.rects(cx, cy, cw, settings)
+
+    # ---- Draw HUD ----
+    def draw_hud(self, surface, theme, cx, cy, cw, ch, time_val, wpm, acc):
+        time_surf = self.glyph(str(time_val), theme["caret"], "font_mono_large")
+        surface.blit(time_surf, (cx + 20, cy + 10))
+        stats_text = f"WPM: {wpm}   ACC: {acc}%"
+        stats_surf = self.glyph(stats_text, theme["main"], "font_ui")
+        surface.blit(stats_surf, (cx + cw - stats_surf.get_width() - 20, cy + 30))
+
+    # ---- Wrap text ----
+    def wrap_text(self, text, font, max_width):
+        """Rows of text as drawn by draw_display (font must be the typing font)."""
+        return self.text_layout(text, max_width).lines()
+
+    # ---- Draw Display (Returns Target Cursor Rect) ----
+    def draw_display(self, surface, theme, cx, cy, cw, ch, target_text, typed):
+        """typed is the input aligned to target_text (TypingEngine.typed).
+
+        Text with more rows than fit scrolls to keep the caret on the second
+        visible row (code snippets, long quotes and book pages).
+        """
+        rect = pygame.Rect(cx, cy, cw, ch)
+        pygame.draw.rect(surface, theme["bg"], rect)
+        
+        padding = DISPLAY_PADDING
+        inner_w = cw - 2 * padding
+        inner_x, inner_y = cx + padding, cy + padding
+
+        layout = self.text_layout(target_text, inner_w)
+        line_height = layout.line_height
+        max_rows = ch // line_height
+        n_typed = len(typed)
+        first = 0
+        if layout.n_rows > max_rows:
+            first = max(0, min(layout.row_of(n_typed) - 1, layout.n_rows - max_rows))
+        self._display = (layout, inner_x, inner_y, first, max_rows)
+
+        xs, row_start = layout.x, layout.row_start
+        main, correct, error = theme["main"], theme["correct"], theme["error"]
+        glyph = self.glyph
+        for row in range(first, min(layout.n_rows, first + max_rows)):
+            py = inner_y + (row - first) * line_height
+            for i in range(row_start[row], row_start[row + 1]):
+                tc = target_text[i]
+                if tc == "\n":
+                    continue
+                if i < n_typed:
+                    color = correct if typed[i] == tc else error
+                else:
+                    color = main
+                surface.blit(glyph(tc, color), (inner_x + xs[i], py))
+
+        return self.caret_rect(n_typed)
+
+    def caret_rect(self, index):
+        """Caret Rect before character `index` of the text last drawn by draw_display.
+
+        Uses the cached layout; None if nothing was drawn or the row is scrolled out.
+        """
+        if self._display is None:
+            return None
+        layout, inner_x, inner_y, first, max_rows = self._display
+        caret = layout.caret(index)
+        if caret is None or not first <= caret[1] < first + max_rows:
+            return None
+        x, row, w = caret
+        return pygame.Rect(inner_x + x, inner_y + (row - first) * layout.line_height, w, layout.line_height)
+
+    def draw_remote_carets(self, surface, theme, indices):
+        """Thin carets for other racers / the ghost at their character indices."""
+        for index in indices:
+            r = self.caret_rect(index)
+            if r is not None:
+                pygame.draw.rect(surface, theme.dim, (r.x - 1, r.y + 4, REMOTE_CARET_W, r.height - 8))
+
+    # ---- Keyboard ----
+    def build_key_rects(self, cx, cy, cw, layout_name):
+        rows = KEYBOARD_ROWS_QWERTY if layout_name == "qwerty" else KEYBOARD_ROWS_DVORAK
+        key_w = KEY_SIZE
+        key_gap = KEY_GAP
+        key_rects = {}
+        max_row_len = max(len(r) for r in rows)
+        block_width = max_row_len * (key_w + key_gap) - key_gap
+        block_left = cx + (cw - block_width) // 2
+        row_y = cy + 10
+        for row_str in rows:
+            row_width = len(row_str) * (key_w + key_gap) - key_gap
+            start_x = block_left + (block_width - row_width) // 2
+            x = start_x
+            for ch in row_str:
+                key_rects[ch] = pygame.Rect(x, row_y, key_w, key_w)
+                x += key_w + key_gap
+            row_y += key_w + key_gap
+        space_x = block_left + (block_width - KEY_SPACE_W) // 2
+        key_rects[" "] = pygame.Rect(space_x, row_y, KEY_SPACE_W, KEY_SPACE_H)
+        return key_rects
+
+    def draw_keyboard(self, surface, theme, cx, cy, cw, ch, layout_name, highlight_char=None, highlight_correct=True,
+                      heatmap=None):
+        """heatmap: {key: 0..1} (see keytiming.heatmap); keys are tinted toward the error color by it."""
+        key_rects = self.build_key_rects(cx, cy, cw, layout_name)
+        for ch, r in key_rects.items():
+            if ch == highlight_char:
+                color = theme["correct"] if highlight_correct else theme["error"]
+                bg_col = color
+                txt_col = theme["bg"]
+            elif heatmap and ch in heatmap:
+                bg_col = themes.blend(theme["main"], theme["error"], heatmap[ch])
+                txt_col = theme["bg"]
+            else:
+                bg_col = theme["main"]
+                txt_col = theme["bg"]
+            
+            pygame.draw.rect(surface, bg_col, r, border_radius=4)
+            label = "SPACE" if ch == " " else ch.upper()
+            txt = self.glyph(label, txt_col, "font_key")
+            surface.blit(txt, (r.centerx - txt.get_width() // 2, r.centery - txt.get_height() // 2))
+        return key_rects
+
+    # ---- Overlays ----
+    def draw_overlay(self, surface, theme, wpm, acc, missed_str, timeline=None, consistency=None):
+        """Result card; timeline is a saved {"wpm", "raw", "err"} series (see timeline.py)."""
+        surface.blit(self._buffer("overlay_dim", surface.get_size(), (0, 0, 0, 180)), (0, 0))
+
+        sw, sh = surface.get_size()
+        ow, oh = 600, 560
+        ox, oy = (sw - ow) // 2, (sh - oh) // 2
+        rect = pygame.Rect(ox, oy, ow, oh)
+        
+        pygame.draw.rect(surface, theme["bg"], rect, border_radius=12)
+        pygame.draw.rect(surface, theme["main"], rect, 2, border_radius=12)
+
+        self.draw_text_centered(surface, "Result", "font_ui_bold", theme["caret"], (rect.centerx, oy + 40))
+        y = oy + 80
+        wpm_str = f"{wpm} WPM"
+        acc_str = f"{acc}% ACC"
+        wpm_surf = self.glyph(wpm_str, theme["main"], "font_mono_large")
+        acc_surf = self.glyph(acc_str, theme["main"], "font_mono_large")
+        surface.blit(wpm_surf, (rect.centerx - wpm_surf.get_width() - 20, y))
+        surface.blit(acc_surf, (rect.centerx + 20, y))
+
+        y += 70
+        if consistency is not None:
+            self.draw_text_centered(surface, f"{consistency}% consistency", "font_ui", theme.dim, (rect.centerx, y))
+        y += 20
+        if timeline and timeline.get("raw"):
+            self.draw_timeline(surface, theme, pygame.Rect(ox + 50, y, ow - 100, 120), timeline)
+        y += 140
+
+        if missed_str:
+            lines = missed_str.split("\n")
+            for line in lines[:5]: 
+                t = self.glyph(line, theme["error"], "font_ui")
+                surface.blit(t, (rect.centerx - t.get_width() // 2, y))
+                y += 24
+        else:
+            t = self.glyph("Perfect!", theme["correct"], "font_ui")
+            surface.blit(t, (rect.centerx - t.get_width() // 2, y))
+
+        hint = self.glyph("Press TAB to restart", theme.dim, "font_ui")
+        surface.blit(hint, (rect.centerx - hint.get_width() // 2, rect.bottom - 40))
+
+    def draw_recovery_prompt(self, surface, theme, description):
+        """Card offering to recover a test cut short by a crash (see journal.py)."""
+        surface.blit(self._buffer("overlay_dim", surface.get_size(), (0, 0, 0, 180)), (0, 0))
+        sw, sh = surface.get_size()
+        rect = pygame.Rect((sw - 520) // 2, (sh - 180) // 2, 520, 180)
+        pygame.draw.rect(surface, theme["bg"], rect, border_radius=12)
+        pygame.draw.rect(surface, theme["main"], rect, 2, border_radius=12)
+        self.draw_text_centered(surface, "Unfinished test", "font_ui_bold", theme["caret"], (rect.centerx, rect.y + 40))
+        self.draw_text_centered(surface, description, "font_ui", theme["main"], (rect.centerx, rect.y + 85))
+        self.draw_text_centered(surface, "ENTER continue    R record result    ESC discard", "font_ui", theme.dim,
+                                (rect.centerx, rect.bottom - 40))
+
+    def draw_timeline(self, surface, theme, rect, timeline, raw=True):
+        """Per-second WPM (caret color) over raw WPM (dim), errors as marks along the top."""
+        wpm_vals = timeline.get("wpm") or []
+        raw_vals = (timeline.get("raw") or []) if raw else []
+        top = max(max(wpm_vals, default=0), max(raw_vals, default=0), 1)
+        n = max(len(wpm_vals), len(raw_vals))
+
+        def points(vals):
+            step = rect.width / (n - 1) if n > 1 else 0
+            return [(rect.left + i * step, rect.bottom - v / top * rect.height) for i, v in enumerate(vals)]
+
+        if raw:
+            pygame.draw.line(surface, theme.dim, rect.bottomleft, rect.bottomright, 1)
+        for vals, color in ((raw_vals, theme.dim), (wpm_vals, theme["caret"])):
+            if len(vals) > 1:
+                pygame.draw.lines(surface, color, False, points(vals), 2)
+        if raw:
+            step = rect.width / (n - 1) if n > 1 else 0
+            for i, e in enumerate(timeline.get("err") or []):
+                if e:
+                    x = rect.left + i * step
+                    pygame.draw.line(surface, theme["error"], (x - 3, rect.top - 3), (x + 3, rect.top + 3), 2)
+                    pygame.draw.line(surface, theme["error"], (x - 3, rect.top + 3), (x + 3, rect.top - 3), 2)
+
+    def draw_history_overlay(self, surface, theme):
+        # Semi-transparent bg
+        surface.blit(self._buffer("history_dim", surface.get_size(), (0, 0, 0, 210)), (0, 0))
+
+        sw, sh = surface.get_size()
+        ow, oh = 800, 700 
+        ox, oy = (sw - ow) // 2, (sh - oh) // 2
+        rect = pygame.Rect(ox, oy, ow, oh)
+        
+        pygame.draw.rect(surface, theme["bg"], rect, border_radius=12)
+        pygame.draw.rect(surface, theme["main"], rect, 2, border_radius=12)
+
+        self.draw_text_centered(surface, "Typing History", "font_ui_bold", theme["caret"], (rect.centerx, oy + 30))
+        
+        # --- Table (Top Half) ---
+        headers = ["Date", "Mode", "WPM", "Accuracy", "Missed", "Cons."]
+        col_x = [ox + 40, ox + 200, ox + 310, ox + 390, ox + 490, ox + 570]
+        header_y = oy + 60
+        
+        for i, h in enumerate(headers):
+            txt = self.glyph(h, theme["main"], "font_ui_bold")
+            surface.blit(txt, (col_x[i], header_y))
+        
+        pygame.draw.line(surface, theme["main"], (ox + 20, header_y + 25), (ox + ow - 20, header_y + 25), 1)
+
+        history = HistoryManager.load_history()
+        recent_count = 8
+        recent = list(reversed(history))[:recent_count]
+        
+        row_y = header_y + 35
+        for entry in recent:
+            date_str = entry.get("timestamp", "")[5:-3]
+            mode_str = entry.get("mode", "?").title()
+            wpm_val = str(entry.get("wpm", 0))
+            acc_val = f"{entry.get('accuracy', 0)}%"
+            miss_val = str(entry.get("missed", 0))
+            cons = entry.get("consistency")
+            cons_val = f"{cons}%" if cons is not None else "-"
+
+            vals = [date_str, mode_str, wpm_val, acc_val, miss_val, cons_val]
+            for i, val in enumerate(vals):
+                c = theme["main"]
+                if i == 2: c = theme["caret"]
+                txt = self.glyph(val, c, "font_ui")
+                surface.blit(txt, (col_x[i], row_y))
+            # Saved per-second WPM as a sparkline
+            if entry.get("timeline"):
+                self.draw_timeline(surface, theme, pygame.Rect(ox + 640, row_y + 2, 120, 16), entry["timeline"], raw=False)
+            row_y += 28
+
+        # --- Graph (Bottom Half) ---
+        graph_top = row_y + 40
+        graph_h = rect.bottom - graph_top - 90 
+        graph_w = ow - 120
+        graph_rect = pygame.Rect(ox + 80, graph_top, graph_w, graph_h)
+        
+        # Graph Background/Grid
+        # pygame.draw.rect(surface, (30, 30, 30), graph_rect) # Optional dark bg for graph area
+        
+        graph_data = history[-50:]
+        if len(graph_data) > 1:
+            wpm_values = [d.get("wpm", 0) for d in graph_data]
+            max_wpm = max(wpm_values)
+            min_wpm = min(wpm_values)
+            if max_wpm == min_wpm:
+                max_wpm += 10
+                min_wpm = max(0, min_wpm - 10)
+            
+            # Grid Lines
+            grid_steps = 4
+            for i in range(grid_steps + 1):
+                val = min_wpm + (max_wpm - min_wpm) * (i / grid_steps)
+                y_pos = graph_rect.bottom - (i / grid_steps) * graph_rect.height
+                
+                # Grid line
+                pygame.draw.line(surface, theme.dim, (graph_rect.left, y_pos), (graph_rect.right, y_pos), 1)
+                
+                # Axis Label
+                lbl = self.glyph(f"{int(val)}", theme["main"], "font_ui_small")
+                surface.blit(lbl, (graph_rect.left - lbl.get_width() - 10, y_pos - lbl.get_height() // 2))
+
+            # Calculate Points
+            points = []
+            count = len(wpm_values)
+            for i, wpm in enumerate(wpm_values):
+                px = graph_rect.left + (i / (count - 1)) * graph_rect.width if count > 1 else graph_rect.centerx
+                norm = (wpm - min_wpm) / (max_wpm - min_wpm)
+                py = graph_rect.bottom - norm * graph_rect.height
+                points.append((px, py))
+
+            # Draw Fill Under Curve (Raw WPM)
+            if len(points) >= 2:
+                poly_points = points.copy()
+                poly_points.append((points[-1][0], graph_rect.bottom))
+                poly_points.append((points[0][0], graph_rect.bottom))
+                
+                # Graph-sized buffer, cleared and redrawn in graph coordinates
+                fill_surf = self._buffer("graph_fill", (graph_rect.width + 1, graph_rect.height + 1))
+                fill_surf.fill((0, 0, 0, 0))
+                local = [(x - graph_rect.left, y - graph_rect.top) for x, y in poly_points]
+                pygame.draw.polygon(fill_surf, theme.caret_fill, local)
+                surface.blit(fill_surf, graph_rect.topleft)
+
+                # Antialiased Line
+                pygame.draw.aalines(surface, theme["caret"], False, points)
+                # Markers
+                for p in points:
+                    pygame.draw.circle(surface, theme["caret"], (int(p[0]), int(p[1])), 2)
+
+            # Moving Average
+            window_size = 10
+            if len(wpm_values) >= window_size:
+                avg_points = []
+                for i in range(len(wpm_values) - window_size + 1):
+                    window = wpm_values[i : i + window_size]
+                    avg = sum(window) / window_size
+                    avg_points.append((i + window_size - 1, avg))
+                
+                if len(avg_points) >= 2:
+                    ma_screen_points = []
+                    for idx, val in avg_points:
+                        px = graph_rect.left + (idx / (count - 1)) * graph_rect.width
+                        norm = (val - min_wpm) / (max_wpm - min_wpm)
+                        norm = max(0, min(1, norm))
+                        py = graph_rect.bottom - norm * graph_rect.height
+                        ma_screen_points.append((px, py))
+                    
+                    # Draw thick smooth line for average
+                    # Since aalines doesn't support thickness > 1 well, we draw multiple offsets or just normal lines
+                    # For "Curve", standard lines with thickness 2 or 3 is best.
+                    pygame.draw.lines(surface, theme["main"], False, ma_screen_points, 3)
+
+            # Legend
+            legend_y = graph_rect.bottom + 25
+            
+            # Legend Item 1
+            lx1 = rect.centerx - 80
+            pygame.draw.circle(surface, theme["caret"], (lx1, legend_y + 6), 4)
+            l1 = self.glyph("Raw WPM", theme["main"], "font_ui_small")
+            surface.blit(l1, (lx1 + 10, legend_y))
+            
+            # Legend Item 2
+            lx2 = rect.centerx + 40
+            pygame.draw.circle(surface, theme["main"], (lx2, legend_y + 6), 4)
+            l2 = self.glyph(f"Avg ({window_size})", theme["main"], "font_ui_small")
+            surface.blit(l2, (lx2 + 10, legend_y))
+        
+        elif len(graph_data) == 1:
+             msg = self.glyph("Not enough data for graph", theme["main"], "font_ui")
+             surface.blit(msg, (graph_rect.centerx - msg.get_width()//2, graph_rect.centery))
+        else:
+             msg = self.glyph("No history data", theme["main"], "font_ui")
+             surface.blit(msg, (graph_rect.centerx - msg.get_width()//2, graph_rect.centery))
+
+        close_btn_rect = pygame.Rect(0, 0, 100, 34)
+        close_btn_rect.center = (rect.centerx, rect.bottom - 30)
+        self.draw_button_bg(surface, close_btn_rect, theme["bg"], theme["main"], radius=6)
+        self.draw_text_centered(surface, "Close", "font_ui_bold", theme["main"], close_btn_rect.center)
+        
+        return close_btn_rect
+
+    def draw_profiler_panel(self, surface, theme, rows, counters):
+        line_h = self.font_ui_small.get_height() + 2
+        n_lines = 1 + len(rows) + len(counters)
+        panel = pygame.Rect(8, 8, 300, n_lines * line_h + 12)
+        pygame.draw.rect(surface, theme["bg"], panel, border_radius=6)
+        pygame.draw.rect(surface, theme["main"], panel, 1, border_radius=6)
+        y = panel.y + 6
+        header = self.glyph(f"{'ms':<16}{'p50':>7}{'p95':>7}{'p99':>7}", theme["caret"], "font_ui_small")
+        surface.blit(header, (panel.x + 8, y))
+        y += line_h
+        for name, p50, p95, p99 in rows:
+            surface.blit(self.glyph(name, theme["main"], "font_ui_small"), (panel.x + 8, y))
+            vals = self.glyph(f"{p50:6.2f} {p95:6.2f} {p99:6.2f}", theme["correct"], "font_ui_small")
+            surface.blit(vals, (panel.right - vals.get_width() - 8, y))
+            y += line_h
+        for name, last, peak in counters:
+            surface.blit(self.glyph(name, theme["main"], "font_ui_small"), (panel.x + 8, y))
+            vals = self.glyph(f"{last} (max {peak})", theme["correct"], "font_ui_small")
+            surface.blit(vals, (panel.right - vals.get_width() - 8, y))
+            y += line_h
+
+    def draw_caret(self, surface, theme, rect):
+        # The caret's size animates, so keep one buffer as large as the
+        # largest caret so far and blit only the part we need
+        w, h = max(1, int(rect[2])), max(1, int(rect[3]))
+        s = self._buffer("caret", (w, h), theme.caret_alpha, grow=True)
+        surface.blit(s, (rect[0], rect[1]), (0, 0, w, h))
+
+    def draw_theme_dropdown(self, surface, theme, dropdown_rects, scroll, n_themes):
+        tx, ty = dropdown_rects[0][0].x, dropdown_rects[0][0].y
+        drop_h = min(THEME_DROPDOWN_MAX_H, n_themes * THEME_ITEM_H)
+        clip_rect = pygame.Rect(tx, ty, THEME_DROPDOWN_W, drop_h)
+        surface.set_clip(clip_rect)
+        for i, (r, name) in enumerate(dropdown_rects):
+            draw_r = pygame.Rect(r.x, r.y - scroll, r.w, r.h)
+            if draw_r.bottom <= ty or draw_r.top >= ty + drop_h:
+                continue
+            pygame.draw.rect(surface, theme["main"], draw_r, border_radius=0)
+            pygame.draw.line(surface, theme["bg"], draw_r.bottomleft, draw_r.bottomright)
+            t = self.glyph(name[:20], theme["bg"], "font_ui")
+            surface.blit(t, (draw_r.x + 8, draw_r.centery - t.get_height() // 2))
+        surface.set_clip(None)
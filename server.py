@@ -0,0 +1,261 @@
+# server.py - Multi-session typing server for classrooms (asyncio)
+#
+#   python server.py --port 8765 --data-dir /srv/pythontype
+#
+# Every workstation connects over a local socket and runs its tests on the
+# server; results from all sessions go to one history/stats file, written
+# in batches by a single background task. One process, one thread.
+#
+# Protocol: newline-delimited JSON. Each request line gets exactly one
+# response line, in order. "\b" in keys is a backspace.
+#   {"op": "start", "mode": "word", "word_count": 25, "seed": 7, "user": "ana"}
+#       -> {"ok": true, "session": 1, "text": "...", "seed": 7}
+#       Drills take "mode": "drill", "drill": "left_hand" and "layout": "dvorak".
+#   {"op": "keys", "session": 1, "keys": "the q"}
+#       -> {"ok": true, "pos": 5, "wpm": 61, "accuracy": 100, "done": false, "errors": []}
+#       "errors" lists the positions in "keys" that were mistakes.
+#   {"op": "finish", "session": 1}
+#       -> {"ok": true, "wpm": 62, "accuracy": 97, "missed": 3}
+#   {"op": "stats"}
+#       -> {"ok": true, "sessions": 12, "started": 40, "finished": 28, "requests": 9001, "keys": 51234}
+# Errors: {"ok": false, "error": "..."}. Sessions belong to their connection
+# and unfinished ones are dropped when it closes.
+import argparse
+import asyncio
+import copy
+import json
+import os
+import sys
+
+import config
+import corpus
+import drills
+import keytiming
+from logic import HistoryManager, StatsManager, TypingEngine
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+FLUSH_INTERVAL = 2.0  # seconds between batched writes of results
+MAX_LINE = 64 * 1024
+MODES = ("time", "word", "quote", "practice", "drill")
+# The shared history keeps every student's results, not just the last 50
+SERVER_MAX_HISTORY = 100000
+
+
+class ResultStore:
+    """Collects finished results and persists them in batches off the event loop.
+
+    `stats` is the in-memory copy of typing_stats.json that practice-mode
+    sessions read; the file itself is only ever written, by the flusher.
+    """
+
+    def __init__(self, persist=True):
+        self.persist = persist
+        self._pending = []  # (result dict, missed_data)
+        self.saved = 0
+        self.stats = StatsManager.load_stats() if persist else {}
+
+    def add(self, result, missed):
+        self._pending.append((result, missed))
+
+    def _write(self, results, stats):
+        HistoryManager.save_attempts(results, max_entries=SERVER_MAX_HISTORY)
+        if stats is not None:
+            StatsManager.save_stats(stats)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        missed = [m for _, misses in batch for m in misses]
+        if missed:
+            # Merged on the loop thread; the writer gets its own copy
+            StatsManager.merge_missed(self.stats, missed)
+        if self.persist:
+            # File IO runs in a worker thread so typing requests keep flowing
+            stats = copy.deepcopy(self.stats) if missed else None
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._write, [result for result, _ in batch], stats)
+        self.saved += len(batch)
+
+    async def run(self, interval=FLUSH_INTERVAL):
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await self.flush()
+        finally:
+            await self.flush()
+
+
+class TypingServer:
+    def __init__(self, store):
+        self.store = store
+        self._next_id = 1
+        self.active = 0
+        self.started = 0
+        self.finished = 0
+        self.requests = 0
+        self.keys = 0
+        # Only corpora present at startup can be requested
+        self.languages = set(corpus.available_languages())
+
+    # --- Requests ---
+    @staticmethod
+    def _option(req, key, default, allowed):
+        value = req.get(key, default)
+        if value not in allowed:
+            raise ValueError(f"{key} must be one of {sorted(allowed)}")
+        return value
+
+    def _start(self, req, sessions):
+        opt = self._option
+        engine = TypingEngine(
+            mode=opt(req, "mode", "time", MODES),
+            duration=opt(req, "duration", 30, config.DURATION_OPTIONS),
+            word_count=opt(req, "word_count", 25, config.WORD_COUNT_OPTIONS),
+            language=opt(req, "language", config.DEFAULTS["language"], self.languages),
+            word_set=opt(req, "word_set", 200, config.WORD_SET_OPTIONS),
+            daily=bool(req.get("daily", False)),
+            persist=False,
+            stats=self.store.stats,
+            quote_length=opt(req, "quote_length", "all", config.QUOTE_LENGTH_OPTIONS),
+            practice_source=opt(req, "practice_source", "markov", config.PRACTICE_SOURCE_OPTIONS),
+            drill=opt(req, "drill", "home_row", drills.DRILLS),
+            layout=opt(req, "layout", "qwerty", keytiming.LAYOUT_ROWS),
+        )
+        engine.reset(seed=req.get("seed"))
+        sid = self._next_id
+        self._next_id += 1
+        sessions[sid] = (engine, req.get("user"))
+        self.active += 1
+        self.started += 1
+        return {"ok": True, "session": sid, "text": engine.target_text, "seed": engine.seed}
+
+    def _session(self, req, sessions):
+        entry = sessions.get(req.get("session"))
+        if entry is None:
+            raise KeyError("no such session")
+        return entry[0]
+
+    def _finish(self, sid, engine, sessions):
+        if not engine.is_finished:
+            engine.stop()
+        result = engine.result()
+        result["user"] = sessions[sid][1]
+        self.store.add(result, engine.missed_data)
+        del sessions[sid]
+        self.active -= 1
+        self.finished += 1
+        return result
+
+    def _keys(self, req, sessions):
+        engine = self._session(req, sessions)
+        keys = req.get("keys", "")
+        batch = engine.process_keys(keys)
+        done = batch.finished
+        self.keys += len(keys)
+        if engine.mode == "time" and engine.get_time_elapsed() >= engine.test_duration:
+            done = True
+        resp = {"ok": True, "pos": engine.caret, "wpm": engine.wpm,
+                "accuracy": engine.accuracy, "done": done, "errors": batch.errors.tolist()}
+        if done:
+            self._finish(req["session"], engine, sessions)
+        return resp
+
+    def dispatch(self, req, sessions):
+        """Handle one request dict for a connection's sessions; returns the response dict."""
+        self.requests += 1
+        op = req.get("op")
+        try:
+            if op == "keys":
+                return self._keys(req, sessions)
+            if op == "start":
+                return self._start(req, sessions)
+            if op == "finish":
+                engine = self._session(req, sessions)
+                result = self._finish(req["session"], engine, sessions)
+                return {"ok": True, "wpm": result["wpm"], "accuracy": result["accuracy"],
+                        "missed": result["missed_count"]}
+            if op == "stats":
+                return {"ok": True, "sessions": self.active, "started": self.started, "finished": self.finished,
+                        "requests": self.requests, "keys": self.keys, "saved": self.store.saved}
+            return {"ok": False, "error": f"unknown op {op!r}"}
+        except (KeyError, ValueError, TypeError, IndexError) as e:
+            return {"ok": False, "error": str(e).strip("'\"")}
+
+    # --- Connections ---
+    async def handle(self, reader, writer):
+        sessions = {}
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):  # line over MAX_LINE, or reset
+                    break
+                if not line:
+                    break
+                try:
+                    req = json.loads(line)
+                    resp = self.dispatch(req, sessions) if isinstance(req, dict) else {"ok": False, "error": "bad request"}
+                except ValueError:
+                    resp = {"ok": False, "error": "invalid JSON"}
+                writer.write(json.dumps(resp, separators=(",", ":")).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.active -= len(sessions)
+            writer.close()
+
+
+async def start_server(store, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+    """Start listening; returns (asyncio server, TypingServer)."""
+    server = TypingServer(store)
+    if unix_path:
+        listener = await asyncio.start_unix_server(server.handle, unix_path, limit=MAX_LINE)
+    else:
+        listener = await asyncio.start_server(server.handle, host, port, limit=MAX_LINE)
+    return listener, server
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, persist=True, flush_interval=FLUSH_INTERVAL):
+    """Run until cancelled, flushing results on the way out."""
+    store = ResultStore(persist)
+    listener, _server = await start_server(store, host, port, unix_path)
+    flusher = asyncio.create_task(store.run(flush_interval))
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        flusher.cancel()
+        try:
+            await flusher
+        except asyncio.CancelledError:
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PythonType multi-session server")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--data-dir", help="directory for typing_history.json / typing_stats.json")
+    parser.add_argument("--no-persist", action="store_true", help="count results but don't save them (load tests)")
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL)
+    args = parser.parse_args(argv)
+
+    if args.data_dir:
+        os.makedirs(args.data_dir, exist_ok=True)
+        HistoryManager.FILE_PATH = os.path.join(args.data_dir, "typing_history.json")
+        StatsManager.FILE_PATH = os.path.join(args.data_dir, "typing_stats.json")
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"PythonType server listening on {where}", file=sys.stderr)
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, not args.no_persist, args.flush_interval))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
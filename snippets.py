@@ -0,0 +1,334 @@
+# snippets.py - Code mode: snippets of real source files, indexed in the background
+#
+# A directory tree ("code_dir" in the config, PythonType's own source when
+# empty) is scanned on a worker thread and every source file is cut into
+# snippets: runs of up to MAX_LINES non-blank lines that never dedent past
+# their first line. The index only keeps where each snippet is (byte offset
+# and length in its file), its line count and its indentation depth (the
+# columns all of its lines share, stripped when it is typed); the text is
+# read from the file when the snippet is served.
+#
+# The index is persisted as typing_snippets.idx next to the app, with the
+# size and mtime of every file. A rescan stats each file and only re-reads
+# the ones that changed, so starting up on a large repository costs one
+# stat per file. Until a scan has finished, the saved index is served.
+#
+# File layout (little-endian):
+#   magic (4s) | version (H) | reserved (H) | n_files (I) | n_snippets (I) | root_len (I)
+#   root      utf-8 absolute path of the scanned directory
+#   files     n_files x (mtime_ns Q, size Q, n_snippets I, path_len H, language B, pad B)
+#   paths     concatenated utf-8 paths, relative to root
+#   snippets  n_snippets x (offset I, length H, lines B, indent B), in file order
+import array
+import os
+import struct
+import sys
+import threading
+from bisect import bisect_right
+
+MAGIC = b"PTSI"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHIII")
+_FILE = struct.Struct("<QQIHBx")
+_SNIPPET = struct.Struct("<IHBB")
+
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "typing_snippets.idx")
+DEFAULT_ROOT = os.path.dirname(os.path.abspath(__file__))  # code_dir "" types PythonType itself
+
+LANGUAGES = ("python", "javascript", "typescript", "c", "cpp", "csharp", "go", "rust", "java", "kotlin",
+             "swift", "ruby", "php", "lua", "shell")
+EXTENSIONS = {
+    ".py": "python", ".js": "javascript", ".mjs": "javascript", ".jsx": "javascript",
+    ".ts": "typescript", ".tsx": "typescript", ".c": "c", ".h": "c",
+    ".cc": "cpp", ".cpp": "cpp", ".hpp": "cpp", ".cs": "csharp", ".go": "go", ".rs": "rust",
+    ".java": "java", ".kt": "kotlin", ".swift": "swift", ".rb": "ruby", ".php": "php",
+    ".lua": "lua", ".sh": "shell",
+}
+SKIP_DIRS = {"__pycache__", "node_modules", "venv", "env", "build", "dist", "target", "vendor"}
+
+TAB_SIZE = 4
+MIN_LINES = 2
+MAX_LINES = 8
+MIN_CHARS = 40
+MAX_CHARS = 400  # typed characters, indentation included
+MAX_COLS = 60  # longest line once dedented
+MAX_FILE_BYTES = 1 << 20  # larger files are generated or minified, not worth typing
+SCAN_WAIT = 2.0  # seconds a first-ever scan may hold up a test before a quote stands in
+
+
+def _indent(line):
+    """Columns of leading whitespace of a line (bytes), tabs to the next TAB_SIZE stop."""
+    col = 0
+    for b in line:
+        if b == 0x20:
+            col += 1
+        elif b == 0x09:
+            col += TAB_SIZE - col % TAB_SIZE
+        else:
+            break
+    return col
+
+
+def cut_snippets(data):
+    """(offset, length, lines, indent) of the snippets of a source file's bytes."""
+    out = []
+    run = []  # (offset, end, indent, columns) of the current snippet's lines
+    chars = 0
+
+    def close():
+        nonlocal chars
+        if len(run) >= MIN_LINES and chars >= MIN_CHARS:
+            start, indent = run[0][0], run[0][2]
+            if all(cols - indent <= MAX_COLS for _o, _e, _i, cols in run) and indent < 256:
+                out.append((start, run[-1][1] - start, len(run), indent))
+        run.clear()
+        chars = 0
+
+    offset = 0
+    size = len(data)
+    while offset < size:
+        end = data.find(b"\n", offset)
+        if end < 0:
+            end = size
+        line = data[offset:end].rstrip()
+        if not line:
+            close()
+        else:
+            indent = _indent(line)
+            cols = len(line.expandtabs(TAB_SIZE))
+            if run and (indent < run[0][2] or len(run) >= MAX_LINES or chars + cols + 1 > MAX_CHARS):
+                close()
+            run.append((offset, offset + len(line), indent, cols))
+            chars += cols + 1
+        offset = end + 1
+    close()
+    return out
+
+
+class Snippet:
+    """A snippet as typed: dedented lines joined by newlines."""
+
+    __slots__ = ("path", "language", "text")
+
+    def __init__(self, path, language, text):
+        self.path = path  # relative to the library root
+        self.language = language
+        self.text = text
+
+
+class _File:
+    __slots__ = ("mtime_ns", "size", "language", "snippets")
+
+    def __init__(self, mtime_ns, size, language, snippets):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.language = language
+        self.snippets = snippets  # array("I"): offset, length, lines, indent per snippet
+
+
+class SnippetIndex:
+    """Snippets of every source file under a root; immutable once built."""
+
+    def __init__(self, root, files=None):
+        self.root = root
+        self.files = files or {}  # relative path -> _File
+        self._paths = [path for path, f in self.files.items() if f.snippets]
+        self._ends = array.array("I")  # running snippet count per path, for picking
+        total = 0
+        for path in self._paths:
+            total += len(self.files[path].snippets) // 4
+            self._ends.append(total)
+        self.n_snippets = total
+
+    # --- Scanning ---
+    def _walk(self, top):
+        try:
+            entries = list(os.scandir(top))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        yield from self._walk(entry.path)
+                elif os.path.splitext(entry.name)[1] in EXTENSIONS and entry.is_file():
+                    yield entry
+            except OSError:
+                continue
+
+    def rescan(self):
+        """(SnippetIndex of the files under root now, whether anything changed).
+
+        Files whose size and mtime match the index are taken as they are;
+        only new and changed files are read.
+        """
+        files, changed = {}, False
+        for entry in self._walk(self.root):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            if st.st_size > MAX_FILE_BYTES:
+                continue
+            path = os.path.relpath(entry.path, self.root)
+            known = self.files.get(path)
+            if known is not None and (known.mtime_ns, known.size) == (st.st_mtime_ns, st.st_size):
+                files[path] = known
+                continue
+            try:
+                with open(entry.path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+            spans = array.array("I")
+            for span in cut_snippets(data):
+                spans.extend(span)
+            files[path] = _File(st.st_mtime_ns, st.st_size, EXTENSIONS[os.path.splitext(path)[1]], spans)
+            changed = True
+        changed = changed or len(files) != len(self.files)
+        return SnippetIndex(self.root, files), changed
+
+    # --- Persistence ---
+    def save(self, path):
+        tmp = path + ".tmp"
+        names = [p.encode("utf-8") for p in self.files]
+        root = self.root.encode("utf-8")
+        with open(tmp, "wb") as f:
+            n_snippets = sum(len(entry.snippets) // 4 for entry in self.files.values())
+            f.write(_HEADER.pack(MAGIC, VERSION, 0, len(self.files), n_snippets, len(root)))
+            f.write(root)
+            for name, entry in zip(names, self.files.values()):
+                f.write(_FILE.pack(entry.mtime_ns, entry.size, len(entry.snippets) // 4, len(name),
+                                   LANGUAGES.index(entry.language)))
+            f.write(b"".join(names))
+            for entry in self.files.values():
+                s = entry.snippets
+                f.write(b"".join(_SNIPPET.pack(*s[i:i + 4]) for i in range(0, len(s), 4)))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            magic, version, _reserved, n_files, n_snippets, root_len = _HEADER.unpack_from(data, 0)
+        except struct.error:
+            raise ValueError("truncated snippet index") from None
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a snippet index file")
+        pos = _HEADER.size
+        try:
+            root = data[pos:pos + root_len].decode("utf-8")
+            pos += root_len
+            records = list(_FILE.iter_unpack(data[pos:pos + n_files * _FILE.size]))
+            pos += n_files * _FILE.size
+            files = {}
+            for mtime_ns, size, count, name_len, language in records:
+                files[data[pos:pos + name_len].decode("utf-8")] = [mtime_ns, size, LANGUAGES[language], count]
+                pos += name_len
+            for name, (mtime_ns, size, language, count) in files.items():
+                spans = array.array("I")
+                for span in _SNIPPET.iter_unpack(data[pos:pos + count * _SNIPPET.size]):
+                    spans.extend(span)
+                pos += count * _SNIPPET.size
+                files[name] = _File(mtime_ns, size, language, spans)
+        except (struct.error, UnicodeDecodeError, IndexError):
+            raise ValueError("corrupt snippet index") from None
+        if pos != len(data) or len(records) != n_files:
+            raise ValueError("truncated snippet index")
+        return cls(root, files)
+
+    # --- Serving ---
+    def read(self, path, i):
+        """Snippet i of a file, or None if the file changed since it was indexed."""
+        entry = self.files[path]
+        offset, length, _lines, indent = entry.snippets[4 * i:4 * i + 4]
+        full = os.path.join(self.root, path)
+        try:
+            with open(full, "rb") as f:
+                if os.fstat(f.fileno()).st_mtime_ns != entry.mtime_ns:
+                    return None
+                f.seek(offset)
+                data = f.read(length)
+        except OSError:
+            return None
+        lines = []
+        for line in str(data, "utf-8", "replace").split("\n"):
+            line = line.expandtabs(TAB_SIZE).rstrip()[indent:]
+            lines.append("".join(ch for ch in line if ch.isprintable() and ch != "\ufffd"))
+        return Snippet(path, entry.language, "\n".join(lines))
+
+    def pick(self, rng, tries=3):
+        """A random snippet (every snippet equally likely), or None if there are none."""
+        for _ in range(tries if self.n_snippets else 0):
+            k = rng.randrange(self.n_snippets)
+            f = bisect_right(self._ends, k)
+            first = self._ends[f - 1] if f else 0
+            snippet = self.read(self._paths[f], k - first)
+            if snippet is not None:
+                return snippet
+        return None
+
+
+class SnippetLibrary:
+    """The index of one root, loaded and rescanned on a worker thread."""
+
+    def __init__(self, root, index_path=None):
+        self.root = root
+        self.index_path = index_path or INDEX_PATH
+        self.index = SnippetIndex(root)  # replaced whole, so readers never see a half-built one
+        self.scanned = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._scan, name="snippet-index", daemon=True)
+            self._thread.start()
+        return self
+
+    def _scan(self):
+        try:
+            saved = None
+            if os.path.isfile(self.index_path):
+                try:
+                    saved = SnippetIndex.load(self.index_path)
+                except (OSError, ValueError) as e:
+                    print(f"Error loading snippet index: {e}", file=sys.stderr)
+            if saved is not None and saved.root == self.root:
+                self.index = saved
+            index, changed = self.index.rescan()
+            self.index = index
+            if changed:
+                try:
+                    index.save(self.index_path)
+                except OSError as e:
+                    print(f"Error saving snippet index: {e}", file=sys.stderr)
+        finally:
+            self.scanned.set()
+
+    def snippet(self, rng, wait=SCAN_WAIT):
+        """A random snippet; waits up to `wait` seconds for a first scan. None without any."""
+        if not self.index.n_snippets:
+            self.start()
+            self.scanned.wait(wait)
+        return self.index.pick(rng)
+
+
+_libraries = {}  # root -> SnippetLibrary
+_libraries_lock = threading.Lock()
+
+
+def resolve_root(code_dir):
+    return os.path.abspath(os.path.expanduser(code_dir)) if code_dir else DEFAULT_ROOT
+
+
+def get_library(code_dir=""):
+    """The (cached, started) SnippetLibrary of a code_dir setting."""
+    root = resolve_root(code_dir)
+    with _libraries_lock:  # PreparedText.build runs on the prefetch worker too
+        library = _libraries.get(root)
+        if library is None:
+            library = _libraries[root] = SnippetLibrary(root)
+    return library.start()
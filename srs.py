@@ -0,0 +1,177 @@
+# srs.py - Spaced-repetition schedule for practice words and n-grams
+#
+# A word or n-gram enters the schedule the first time it is typed with a
+# mistake. Every later test that contains it is a review: a clean one
+# pushes the next due time out by the item's ease (SM-2 style), a mistake
+# brings it back within minutes and lowers the ease. Items that stay clean
+# for MAX_INTERVAL leave the schedule, so it only ever holds what the user
+# still struggles with, however large the corpus.
+#
+# Saved per language in typing_stats.json as
+#   "srs": {language: {"words": {word: [due, ease, interval]}, "ngrams": {...}}}
+# with due as Unix seconds and interval in seconds. Reviews only touch
+# their own entries; a kind's due-order heap is built (O(V)) on its first
+# due() call, after which fetching N due items costs O(N log V).
+import string
+
+DAY = 86400.0
+KINDS = ("words", "ngrams")
+START_EASE = 2.5
+MIN_EASE = 1.3
+EASE_STEP = 0.15
+RELEARN_INTERVAL = 10 * 60  # a mistake brings an item back within the next few tests
+FIRST_INTERVAL = DAY  # after the first clean review
+MAX_INTERVAL = 90 * DAY  # clean for this long: learnt, dropped from the schedule
+BIAS_NGRAMS = 20  # due n-grams that bias generated practice text
+_STRIP = string.punctuation + "“”‘’«»"
+
+
+def word_key(word):
+    """Schedule key of a typed word: lowercase, without surrounding punctuation ("" to skip)."""
+    return word.strip(_STRIP).lower()
+
+
+class IndexedHeap:
+    """Min-heap of (priority, key) with a key -> position index, so a key's
+    priority can be changed or removed in O(log n)."""
+
+    __slots__ = ("_heap", "_pos")
+
+    def __init__(self, items=()):
+        self._heap = [[priority, key] for priority, key in items]
+        self._pos = {key: i for i, (_priority, key) in enumerate(self._heap)}
+        for i in reversed(range(len(self._heap) // 2)):
+            self._sift_down(i)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, key):
+        return key in self._pos
+
+    def push(self, key, priority):
+        """Insert key, or move it to its new priority."""
+        i = self._pos.get(key)
+        if i is None:
+            self._heap.append([priority, key])
+            self._pos[key] = i = len(self._heap) - 1
+            self._sift_up(i)
+            return
+        old = self._heap[i][0]
+        self._heap[i][0] = priority
+        if priority < old:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def remove(self, key):
+        i = self._pos.pop(key, None)
+        if i is None:
+            return
+        last = self._heap.pop()
+        if i < len(self._heap):
+            self._heap[i] = last
+            self._pos[last[1]] = i
+            self._sift_up(i)
+            self._sift_down(self._pos[last[1]])
+
+    def peek(self):
+        """(priority, key) of the smallest entry, or None."""
+        return tuple(self._heap[0]) if self._heap else None
+
+    def pop(self):
+        priority, key = self._heap[0]
+        self.remove(key)
+        return priority, key
+
+    def smallest(self, n):
+        """Up to n (priority, key) in order, leaving the heap as it was: O(n log size)."""
+        out = []
+        while self._heap and len(out) < n:
+            out.append(self.pop())
+        for priority, key in out:
+            self.push(key, priority)
+        return out
+
+    def _swap(self, i, j):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._pos[heap[i][1]] = i
+        self._pos[heap[j][1]] = j
+
+    def _sift_up(self, i):
+        heap = self._heap
+        while i:
+            parent = (i - 1) // 2
+            if heap[parent][0] <= heap[i][0]:
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i):
+        heap, size = self._heap, len(self._heap)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < size and heap[child][0] < heap[smallest][0]:
+                    smallest = child
+            if smallest == i:
+                return
+            self._swap(i, smallest)
+            i = smallest
+
+
+class Schedule:
+    """The saved SRS state of one language; review() edits `saved` in place."""
+
+    def __init__(self, saved):
+        self.saved = saved
+        self.items = {kind: saved.setdefault(kind, {}) for kind in KINDS}
+        self._queues = {}  # kind -> IndexedHeap by due time, built when first needed
+
+    def _queue(self, kind):
+        queue = self._queues.get(kind)
+        if queue is None:
+            queue = self._queues[kind] = IndexedHeap((entry[0], key) for key, entry in self.items[kind].items())
+        return queue
+
+    def review(self, kind, key, ok, now):
+        """Grade one item. Clean reviews of unscheduled items are ignored."""
+        items = self.items[kind]
+        entry = items.get(key)
+        if entry is None:
+            if ok:
+                return
+            entry = [now, START_EASE, 0]
+        _due, ease, interval = entry
+        if ok:
+            interval = FIRST_INTERVAL if interval < FIRST_INTERVAL else interval * ease
+            ease += EASE_STEP
+        else:
+            interval = RELEARN_INTERVAL
+            ease = max(MIN_EASE, ease - 2 * EASE_STEP)
+        if interval > MAX_INTERVAL:
+            del items[key]
+            if kind in self._queues:
+                self._queues[kind].remove(key)
+            return
+        due = int(now + interval)
+        items[key] = [due, round(ease, 2), int(interval)]
+        if kind in self._queues:
+            self._queues[kind].push(key, due)
+
+    def review_all(self, reviews, now):
+        """reviews: {kind: [(key, ok), ...]} as from TypingEngine.srs_reviews()."""
+        for kind in KINDS:
+            for key, ok in reviews.get(kind, ()):
+                self.review(kind, key, ok, now)
+
+    def due(self, kind, n, now):
+        """Up to n keys due by `now`, most overdue first."""
+        queue = self._queue(kind)
+        out = []
+        while len(out) < n and queue and queue.peek()[0] <= now:
+            out.append(queue.pop())
+        for due, key in out:
+            queue.push(key, due)
+        return [key for _due, key in out]
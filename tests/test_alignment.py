@@ -0,0 +1,108 @@
+# tests/test_alignment.py - Unit tests for word-level alignment scoring
+import os
+import unittest
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alignment import (INSERTION, MATCH, MISSING, OMISSION, SUBSTITUTION, TRANSPOSITION, MAX_EXTRA,
+                       MissCounter, WordAligner, align_word)
+
+
+def errors(target, typed, complete=True):
+    return [op for op in align_word(target, typed, complete) if op[0] != MATCH]
+
+
+def type_text(aligner, keys):
+    for key in keys:
+        if key == "\b":
+            aligner.pop()
+        else:
+            aligner.push(key)
+    return aligner
+
+
+class TestAlignWord(unittest.TestCase):
+    def test_error_kinds(self):
+        self.assertEqual(errors("hello", "hallo"), [(SUBSTITUTION, "e", "a")])
+        self.assertEqual(errors("hello", "helo"), [(OMISSION, "l", "")])
+        self.assertEqual(errors("hello", "helllo"), [(INSERTION, "l", "l")])
+        self.assertEqual(errors("hello", "hlelo"), [(TRANSPOSITION, "el", "le")])
+        self.assertEqual(errors("hello", "hellox"), [(INSERTION, " ", "x")])
+
+    def test_partial_word_aligns_to_a_prefix(self):
+        self.assertEqual(errors("hello", "hel", complete=False), [])
+        self.assertEqual(errors("hello", "hllo", complete=False), [(OMISSION, "e", "")])
+
+
+class TestWordAligner(unittest.TestCase):
+    def test_skipped_character_stays_in_its_word(self):
+        a = type_text(WordAligner("the quick brown"), "the quik brown")
+        self.assertEqual(a.all_misses().pairs(), [("c", "")])
+        self.assertEqual(a.all_misses().kinds[OMISSION], 1)
+        self.assertEqual(a.view(), "the qui" + MISSING + "k brown")
+        self.assertEqual(a.caret, len("the quick brown"))
+        self.assertEqual(a.correct_chars(), 14)  # every typed key
+
+    def test_extra_character_stays_in_its_word(self):
+        a = type_text(WordAligner("the quick brown"), "thex quick bro")
+        self.assertEqual(a.all_misses().pairs(), [(" ", "x")])
+        self.assertEqual(a.all_misses().kinds[INSERTION], 1)
+        self.assertEqual(a.view(), "the quick bro")
+
+    def test_space_skips_the_rest_of_a_word(self):
+        a = type_text(WordAligner("the quick brown"), "the qu ")
+        self.assertEqual(a.misses.kinds[OMISSION], 3)
+        self.assertEqual(a.caret, len("the quick "))
+
+    def test_corrected_mistakes_still_count(self):
+        a = type_text(WordAligner("the quick"), "tx\bhe")
+        self.assertEqual(a.all_misses().pairs(), [("h", "x")])
+        self.assertEqual(a.view(), "the")
+        self.assertEqual(a.input.view, "the")
+
+    def test_backspace_reopens_the_previous_word(self):
+        a = type_text(WordAligner("the quick"), "teh \b\b\bhe qu")
+        self.assertEqual(a.all_misses().pairs(), [("h", "e")])  # the "e" typed for "h", corrected
+        self.assertEqual(a.view(), "the qu")
+        self.assertEqual(a.k, 1)
+
+    def test_transposition_counts_the_pair(self):
+        a = type_text(WordAligner("the quick"), "teh ")
+        self.assertEqual(a.misses.pairs(), [("he", "eh")])
+        self.assertEqual(a.misses.kinds[TRANSPOSITION], 1)
+
+    def test_push_returns_whether_the_key_was_correct(self):
+        a = WordAligner("ab cd")
+        self.assertEqual([a.push(k) for k in "ax "], [True, False, True])
+        self.assertEqual([a.push(k) for k in "c "], [True, False])  # space skipped the "d"
+
+    def test_word_length_is_capped(self):
+        a = WordAligner("ab cd")
+        results = [a.push("x") for _ in range(2 + MAX_EXTRA + 3)]
+        self.assertEqual(results[-3:], [None] * 3)
+        self.assertEqual(a.n, 2 + MAX_EXTRA)
+
+    def test_space_after_last_word_ends_the_text(self):
+        a = type_text(WordAligner("ab cd"), "ab c ")
+        self.assertTrue(a.at_end)
+        self.assertIsNone(a.push("x"))
+        self.assertEqual(a.view(), "ab c" + MISSING)
+
+    def test_non_ascii_misses_use_the_overflow_dict(self):
+        a = type_text(WordAligner("grüße"), "grüse")
+        self.assertEqual(a.all_misses().pairs(), [("ß", "s")])
+
+
+class TestMissCounter(unittest.TestCase):
+    def test_add_and_remove(self):
+        misses = MissCounter()
+        misses.add(SUBSTITUTION, "a", "b")
+        misses.add(SUBSTITUTION, "é", "e")
+        misses.add(SUBSTITUTION, "é", "e", -1)
+        self.assertEqual(misses.pairs(), [("a", "b")])
+        self.assertEqual((misses.total, misses.other), (1, {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
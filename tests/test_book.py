@@ -0,0 +1,115 @@
+# tests/test_book.py - Unit tests for book mode
+import os
+import random
+import tempfile
+import tracemalloc
+import unittest
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import book
+from logic import StatsManager, TypingEngine
+
+TEXT = ("Call me  Ishmael.\nSome years ago—never mind how long precisely—having "
+        "“little or no” money in my purse, I thought I would sail about a little "
+        "and see the watery part of the world. ") * 40
+
+
+class TempFiles(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "moby.txt")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(TEXT)
+        self.addCleanup(book._books.clear)
+
+
+class TestBook(TempFiles):
+    def test_pages_cover_the_file_in_order(self):
+        opened = book.open_book(self.path)
+        self.assertIs(book.open_book(self.path), opened)
+        page = opened.page(0, max_bytes=60)
+        self.assertEqual(page.text, 'Call me Ishmael. Some years ago-never mind how long')
+        self.assertEqual(page.word_offsets[2], TEXT.index("Ishmael"))
+        words = []
+        offset = 0
+        while True:
+            page = opened.page(offset, max_bytes=200)
+            self.assertLessEqual(page.end - page.start, 200)
+            words += page.text.split(" ")
+            if page.end >= opened.size:
+                break
+            offset = page.end
+        expected = " ".join(TEXT.split()).replace("—", "-").replace("“", '"').replace("”", '"')
+        self.assertEqual(" ".join(words), expected)
+        # Past the end: from the start again
+        self.assertEqual(opened.page(opened.size).start, 0)
+
+    def test_page_memory_does_not_depend_on_file_size(self):
+        big = os.path.join(self.dir.name, "big.txt")
+        with open(big, "w", encoding="utf-8") as f:
+            for _ in range(1000):
+                f.write(TEXT)
+        opened = book.open_book(big)
+        tracemalloc.start()
+        try:
+            opened.page(opened.size // 2)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertGreater(opened.size, 5_000_000)
+        self.assertLess(peak, 64 * 1024)
+
+    def test_long_words_are_cut_at_a_character_boundary(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("ü" * 100)
+        page = book.open_book(self.path).page(0, max_bytes=11)
+        self.assertEqual(page.text, "ü" * 5)
+        self.assertEqual(page.end, 10)
+
+    def test_normalize_word(self):
+        self.assertEqual(book.normalize_word("“naïve”­"), '"naïve"')
+        self.assertEqual(book.normalize_word("ﬁne…"), "fine...")
+        self.assertEqual(book.normalize_word("\x07"), "")
+
+
+class TestBookMode(TempFiles):
+    def setUp(self):
+        super().setUp()
+        self.original_path = StatsManager.FILE_PATH
+        StatsManager.FILE_PATH = os.path.join(self.dir.name, "stats.json")
+        self.addCleanup(setattr, StatsManager, "FILE_PATH", self.original_path)
+
+    def engine(self):
+        return TypingEngine(mode="book", book_path=self.path, rng=random.Random(1))
+
+    @patch("logic.HistoryManager.save_attempt")
+    def test_progress_resumes_at_the_first_unfinished_word(self, _save):
+        engine = self.engine()
+        first = engine.target_text
+        self.assertTrue(first.startswith("Call me Ishmael."))
+        self.assertLessEqual(len(first.encode("utf-8")), book.PAGE_BYTES)
+        engine.process_keys(first)  # the whole page
+        engine.stop()
+        second = self.engine()
+        self.assertEqual(second.book_offset, engine.page.end + 1)
+        self.assertNotEqual(second.target_text, first)
+        typed = " ".join(second.target_text.split(" ")[:3]) + " " + second.target_text.split(" ")[3][:2]
+        second.process_keys(typed)
+        second.stop()
+        third = self.engine()
+        self.assertEqual(third.target_text.split(" ")[0], second.target_text.split(" ")[3])
+        self.assertEqual(third.session_params(), {"book": self.path, "book_offset": third.page.start, "language": "english"})
+
+    def test_missing_book_falls_back_to_a_quote(self):
+        with patch("sys.stderr"):
+            engine = TypingEngine(mode="book", book_path=os.path.join(self.dir.name, "nope.txt"), persist=False)
+        self.assertTrue(engine.target_text)
+        self.assertIsNone(engine.page)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+# tests/test_corpus.py - Unit tests for the packed corpus format
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import corpus
+import resources
+from corpus import Corpus, PackedList
+
+
+class TestPackedList(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_roundtrip_in_memory(self):
+        items = ["the", "naïve", "", "日本語", "end"]
+        lst = PackedList.from_strings(items)
+        self.assertEqual(len(lst), len(items))
+        self.assertEqual(list(lst), items)
+        self.assertEqual(lst[-1], "end")
+        with self.assertRaises(IndexError):
+            lst[len(items)]
+
+    def test_roundtrip_mmap_file(self):
+        path = os.path.join(self.tmpdir, "words.bin")
+        corpus.write_packed(path, ["alpha", "beta", "gamma"])
+        lst = PackedList.open(path)
+        try:
+            self.assertEqual(lst[1], "beta")
+            self.assertEqual(lst.entry_length(2), 5)
+        finally:
+            lst.close()
+
+    def test_sample_respects_limit(self):
+        lst = PackedList.from_strings([f"w{i}" for i in range(1000)])
+        picked = lst.sample(50, rng=random.Random(1), limit=100)
+        self.assertEqual(len(picked), 50)
+        self.assertEqual(len(set(picked)), 50)
+        self.assertTrue(all(int(w[1:]) < 100 for w in picked))
+
+    def test_sample_caps_at_available(self):
+        lst = PackedList.from_strings(["a", "b", "c"])
+        self.assertEqual(sorted(lst.sample(10)), ["a", "b", "c"])
+
+    def test_rejects_bad_magic(self):
+        with self.assertRaises(ValueError):
+            PackedList(b"XXXX" + bytes(8))
+
+    def test_rejects_truncated_files(self):
+        data = corpus.pack_strings(["alpha", "beta"])
+        for cut in (3, len(data) - 2):
+            path = os.path.join(self.tmpdir, f"cut{cut}.bin")
+            with open(path, "wb") as f:
+                f.write(data[:cut])
+            with self.assertRaises(ValueError):
+                PackedList.open(path)
+
+
+class TestCorpus(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_english_falls_back_to_builtin_lists(self):
+        c = Corpus("english", self.tmpdir)
+        self.assertEqual(len(c.words), len(resources.WORD_LIST))
+        self.assertIn(c.random_quote(), resources.QUOTE_LIST)
+
+    def test_loads_packed_files(self):
+        corpus.write_packed(os.path.join(self.tmpdir, "words.bin"), ["uno", "dos", "tres"])
+        c = Corpus("spanish", self.tmpdir)
+        try:
+            self.assertEqual(list(c.iter_words(limit=2)), ["uno", "dos"])
+            # No quotes.bin: quote mode still works, with the built-in quotes
+            self.assertIn(c.random_quote(), resources.QUOTE_LIST)
+        finally:
+            c.close()
+
+    def test_unreadable_file_falls_back(self):
+        with open(os.path.join(self.tmpdir, "words.bin"), "wb") as f:
+            f.write(b"PTC")
+        c = Corpus("spanish", self.tmpdir)
+        self.assertEqual(len(c.words), len(resources.WORD_LIST))
+
+    def test_unknown_language_uses_default(self):
+        self.assertEqual(corpus.get_corpus("no_such_language").language, corpus.DEFAULT_LANGUAGE)
+
+    def test_language_cannot_leave_corpora_dir(self):
+        for name in ("../../etc", "..", ".hidden", "a/b", ""):
+            self.assertFalse(corpus.valid_language_name(name))
+            self.assertEqual(corpus.get_corpus(name).language, corpus.DEFAULT_LANGUAGE)
+
+
+if __name__ == "__main__":
+    unittest.main()
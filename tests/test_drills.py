@@ -0,0 +1,69 @@
+# tests/test_drills.py - Unit tests for key-set drills
+import os
+import random
+import unittest
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import drills
+from drills import CharsetIndex
+from logic import TypingEngine
+
+
+class TestCharsetIndex(unittest.TestCase):
+    def test_matching_agrees_with_a_plain_scan(self):
+        rng = random.Random(7)
+        alphabet = "abcdefghijklmnopqrstuvwxyzéß;'"
+        words = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 7))) for _ in range(3000)]
+        index = CharsetIndex(words)
+        for keys in (set("asdfghjkl;'"), set("qwertasdfgzxcvb"), set(alphabet) - {"e"}, set()):
+            expected = [i for i, word in enumerate(words) if set(word) <= keys]
+            self.assertEqual(index.matching(keys).tolist(), expected)
+
+    def test_rare_characters_share_a_bit_and_never_match(self):
+        words = [chr(0x4e00 + i) for i in range(100)] + ["ab", "a" + chr(0x4e00 + 99)]
+        index = CharsetIndex(words)
+        self.assertEqual(index.matching({"a", "b"}).tolist(), [100])
+        self.assertEqual(index.matching({chr(0x4e00 + 99)}).tolist(), [])
+
+    def test_limit_indexes_the_most_frequent_words(self):
+        self.assertEqual(len(CharsetIndex(["a", "b", "c"], 2).masks), 2)
+
+
+class TestDrills(unittest.TestCase):
+    def test_key_sets(self):
+        self.assertEqual(drills.drill_keys("home_row", "dvorak"), set("aoeuidhtns-"))
+        left = drills.drill_keys("left_hand")
+        self.assertIn("t", left)
+        self.assertNotIn("y", left)
+        self.assertEqual(left | drills.drill_keys("right_hand"), drills.drill_keys("no_e") | {"e"})
+        with self.assertRaises(ValueError):
+            drills.drill_keys("nope")
+
+    def test_drill_words_use_only_the_keys_and_are_cached(self):
+        for layout in ("qwerty", "dvorak"):
+            for drill in drills.DRILLS:
+                words = drills.drill_words(30, drill, layout, rng=random.Random(1))
+                self.assertEqual(len(words), 30)
+                keys = drills.drill_keys(drill, layout)
+                self.assertTrue(all(set(word) <= keys for word in words), (layout, drill, words))
+        hits = drills._drills[("english", None, "qwerty", "left_hand")]
+        drills.drill_words(5, "left_hand", "qwerty")
+        self.assertIs(drills._drills[("english", None, "qwerty", "left_hand")], hits)
+
+    def test_drill_mode(self):
+        engine = TypingEngine(mode="drill", word_count=10, drill="left_hand", layout="dvorak",
+                              rng=random.Random(3), persist=False)
+        self.assertEqual(len(engine.words), 10)
+        keys = drills.drill_keys("left_hand", "dvorak")
+        self.assertTrue(set(engine.target_text) <= keys | {" "})
+        engine.process_keys(engine.target_text)
+        self.assertTrue(engine.is_running)
+        self.assertTrue(engine._text_done())
+        replay = TypingEngine.from_history({"mode": "drill", "seed": engine.seed, "params": engine.session_params()})
+        self.assertEqual(replay.target_text, engine.target_text)
+
+
+if __name__ == "__main__":
+    unittest.main()
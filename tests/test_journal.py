@@ -0,0 +1,99 @@
+# tests/test_journal.py - Unit tests for the crash-safe session journal
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import journal
+from logic import TypingEngine
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "journal.bin")
+
+    def engine(self, **kwargs):
+        engine = TypingEngine(rng=random.Random(5), persist=False, **kwargs)
+        engine.journal = journal.Journal(self.path)
+        self.addCleanup(engine.journal.close)
+        return engine
+
+    def type_half(self, engine):
+        keys = engine.target_text[:12] + "x\b" + engine.target_text[12:20]
+        engine.process_keys(keys, [1000.0 + 0.2 * i for i in range(len(keys))])
+        return keys
+
+    def test_an_interrupted_test_is_read_back(self):
+        engine = self.engine(mode="word", word_count=10)
+        keys = self.type_half(engine)
+        checkpoint = journal.read_checkpoint(self.path)  # as if the app had been killed here
+        self.assertEqual(checkpoint.keys, keys)
+        self.assertEqual(checkpoint.text, engine.target_text)
+        self.assertEqual((checkpoint.mode, checkpoint.seed, checkpoint.params),
+                         ("word", engine.seed, engine.session_params()))
+        self.assertEqual(checkpoint.start_time, 1000.0)
+        self.assertAlmostEqual(checkpoint.times[-1], 0.2 * (len(keys) - 1), places=5)
+        engine.finish()
+        self.assertIsNone(journal.read_checkpoint(self.path))
+
+    def test_resume_replays_the_keys(self):
+        engine = self.engine(mode="time", duration=60)
+        keys = self.type_half(engine)
+        checkpoint = engine.journal.pending()
+        engine.journal.close()
+
+        resumed = self.engine(mode="word", word_count=25)
+        batch = resumed.resume(checkpoint, now=5000.0)
+        self.assertEqual(batch.consumed, len(keys))
+        self.assertEqual((resumed.mode, resumed.seed, resumed.test_duration), ("time", engine.seed, 60))
+        self.assertEqual(resumed.target_text, engine.target_text)
+        self.assertEqual(str(resumed.typed), str(engine.typed))
+        self.assertEqual(resumed.correct_chars, engine.correct_chars)
+        self.assertAlmostEqual(resumed.start_time, 5000.0 - checkpoint.times[-1])
+        self.assertTrue(resumed.is_running)
+        # The resumed test is journaled again, so a second crash loses nothing either
+        self.assertEqual(journal.read_checkpoint(self.path).keys, keys)
+
+    def test_resume_keeps_the_journaled_text(self):
+        engine = self.engine(mode="practice", word_count=10, stats={})
+        self.type_half(engine)
+        checkpoint = journal.read_checkpoint(self.path)
+        checkpoint.text = "text that practice mode would not generate"
+        resumed = self.engine(mode="word")
+        resumed.resume(checkpoint, now=5000.0)
+        self.assertEqual(resumed.target_text, checkpoint.text)
+
+    @patch("journal.FILE_BYTES", 256)
+    def test_the_file_grows_with_long_tests(self):
+        engine = self.engine(mode="time", duration=600)
+        keys = (engine.target_text * 3)[:400]
+        engine.process_keys(keys, [1000.0 + 0.1 * i for i in range(len(keys))])
+        self.assertEqual(journal.read_checkpoint(self.path).keys, keys)
+
+    def test_discard_and_unreadable_journals(self):
+        engine = self.engine(mode="word")
+        self.type_half(engine)
+        self.assertIsNotNone(journal.read_checkpoint(self.path))
+        engine.journal.close()
+        # close() ends the test: quitting the app normally leaves nothing to recover
+        self.assertIsNone(journal.Journal(self.path).pending())
+        engine = self.engine(mode="word")
+        self.type_half(engine)
+        journal.Journal(self.path).discard()
+        self.assertIsNone(journal.read_checkpoint(self.path))
+        self.assertIsNone(journal.read_checkpoint(os.path.join(self.dir.name, "missing.bin")))
+        engine.journal.close()
+        with open(self.path, "wb") as f:
+            f.write(b"PTJR\x01\x00\x01\x00\x05\x00\x00\x00\xff\x00\x00\x00" + bytes(8) + b"{")
+        with patch("sys.stderr"):
+            self.assertIsNone(journal.read_checkpoint(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+# tests/test_keytiming.py - Unit tests for per-key and per-finger timing
+import os
+import random
+import statistics
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import keytiming
+from keytiming import KeyTiming
+from logic import StatsManager, TypingEngine
+
+
+def timed(keys, gaps):
+    """KeyTiming fed `keys` with the given gaps (seconds) between them."""
+    timing = KeyTiming()
+    now = 100.0
+    timing.press(keys[0], now)
+    for key, gap in zip(keys[1:], gaps):
+        now += gap
+        timing.press(key, now)
+    return timing
+
+
+class TestKeyTiming(unittest.TestCase):
+    def test_mean_variance_and_p90(self):
+        gaps = [0.11, 0.21, 0.16, 0.31, 0.13, 0.18]
+        timing = timed("a" * 7, gaps)
+        n, mean, variance, p90 = timing.summary("a")
+        ms = [g * 1000 for g in gaps]
+        self.assertEqual(n, 6)
+        self.assertAlmostEqual(mean, statistics.mean(ms))
+        self.assertAlmostEqual(variance, statistics.variance(ms))
+        self.assertEqual(p90, 325)  # upper edge of the 300-325 ms bucket
+        self.assertIsNone(timing.summary("b"))
+
+    def test_fingers_and_skipped_intervals(self):
+        timing = KeyTiming()
+        timing.press("f", 0.0)
+        timing.press("j", 0.1)
+        timing.press("x", 0.2, correct=False)  # the gap before a mistake isn't recorded
+        timing.press("J", 0.35)  # shifted keys count for their key
+        timing.press("f", 5.0)  # a pause
+        n, mean, _variance, _p90 = timing.summary("j")
+        self.assertEqual(n, 2)
+        self.assertAlmostEqual(mean, 125.0)
+        self.assertEqual(timing.summary("right_index")[0], 2)
+        self.assertIsNone(timing.summary("f"))
+        self.assertIsNone(timing.summary("left_index"))
+
+    def test_dvorak_fingers(self):
+        self.assertEqual(keytiming.finger_map("dvorak")["t"], keytiming.FINGERS.index("right_middle"))
+        self.assertEqual(keytiming.finger_map("qwerty")["p"], keytiming.FINGERS.index("right_pinky"))
+        self.assertEqual(keytiming.finger_map()[" "], keytiming.FINGERS.index("thumb"))
+
+    def test_merge_matches_recording_together(self):
+        rng = random.Random(5)
+        gaps = [rng.uniform(0.05, 0.6) for _ in range(40)]
+        whole = timed("e" * 41, gaps).to_dict()["keys"]["e"]
+        first = timed("e" * 16, gaps[:15]).to_dict()["keys"]["e"]
+        second = timed("e" * 26, gaps[15:]).to_dict()["keys"]["e"]
+        merged = keytiming.merge(first, second)
+        self.assertEqual(merged[0], whole[0])
+        self.assertAlmostEqual(merged[1], whole[1])
+        self.assertAlmostEqual(merged[2], whole[2])
+        self.assertEqual(merged[3], whole[3])
+
+    def test_saved_samples_fade(self):
+        day = 86400.0
+        saved = keytiming.merge_into({}, timed("k" * 9, [0.4] * 8).to_dict(), now=0.0, half_life_days=7)
+        keytiming.merge_into(saved, timed("k" * 9, [0.1] * 8).to_dict(), now=7 * day, half_life_days=7)
+        n, mean, _m2, hist, last = saved["keys"]["k"]
+        self.assertEqual((n, last), (12, 7 * day))
+        self.assertAlmostEqual(mean, 200.0)  # the week-old samples weigh half as much
+        self.assertEqual(hist[16], 4)
+        # Not enough recent samples for the heatmap a month later
+        self.assertEqual(keytiming.heatmap(saved, now=35 * day, half_life_days=7), {})
+
+    def test_heatmap_scales_means(self):
+        saved = {"keys": {"a": [10, 100.0, 0, []], "b": [10, 300.0, 0, []], "c": [3, 900.0, 0, []]}}
+        self.assertEqual(keytiming.heatmap(saved), {"a": 0.0, "b": 1.0})
+        self.assertEqual(keytiming.heatmap({}), {})
+
+    def test_non_ascii_keys(self):
+        timing = timed("üü", [0.2])
+        self.assertEqual(timing.summary("ü")[0], 1)
+        self.assertIn("ü", timing.to_dict()["keys"])
+
+
+class TestEngineKeyTiming(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.NamedTemporaryFile(mode="w", suffix=".json", delete=False)
+        self.tmp.close()
+        os.unlink(self.tmp.name)
+        self.original_path = StatsManager.FILE_PATH
+        StatsManager.FILE_PATH = self.tmp.name
+
+    def tearDown(self):
+        StatsManager.FILE_PATH = self.original_path
+        try:
+            os.unlink(self.tmp.name)
+        except OSError:
+            pass
+
+    def test_correct_keys_are_timed_and_saved(self):
+        engine = TypingEngine(mode="word", word_count=5, rng=random.Random(2), persist=False)
+        text = engine.target_text
+        engine.process_keys(text, [10.0 + 0.2 * i for i in range(len(text))])
+        timing = engine.key_timing.to_dict()
+        self.assertEqual(sum(entry[0] for entry in timing["keys"].values()), len(text) - 1)
+        self.assertAlmostEqual(timing["keys"][text[1]][1], 200.0)
+
+        stats = StatsManager.merge_key_timing({}, engine.key_timing)
+        StatsManager.merge_key_timing(stats, engine.key_timing)
+        self.assertEqual(stats["key_timing"]["keys"][text[1]][0], 2 * timing["keys"][text[1]][0])
+
+        engine.persist = True
+        with patch("logic.HistoryManager.save_attempt"):
+            engine.stop()
+        self.assertIn("key_timing", StatsManager.load_stats())
+        engine.reset()
+        self.assertEqual(engine.key_timing.to_dict(), {"keys": {}, "fingers": {}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,10 @@
 # tests/test_logic.py - Unit tests for TypingEngine and HistoryManager
 import json
 import os
+import random
 import tempfile
 import time
+import tracemalloc
 import unittest
 from unittest.mock import patch
 
@@ -10,7 +12,9 @@ from unittest.mock import patch
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from logic import TypingEngine, HistoryManager
+import corpus
+import markov
+from logic import TypingEngine, HistoryManager, StatsManager, daily_seed
 
 
 class TestTypingEngine(unittest.TestCase):
@@ -47,6 +51,60 @@ class TestTypingEngine(unittest.TestCase):
         self.assertEqual(self.engine.missed_data[0][0], first_char)
         self.assertEqual(self.engine.missed_data[0][1], wrong)
 
+    def test_skipped_char_only_costs_its_word(self):
+        self.engine.target_text = "the quick brown fox"
+        for c in "the quik brown fox":
+            finished = self.engine.process_key(c)
+        self.assertTrue(finished)
+        self.assertEqual(self.engine.missed_data, [("c", "")])
+        self.assertEqual(self.engine.error_counts()["omission"], 1)
+        self.assertEqual(self.engine.typed[10:], "brown fox")
+
+    def test_process_keys_matches_single_keys(self):
+        keys = "thx\be quik brwn"
+        single = TypingEngine(mode="word", word_count=5, persist=False)
+        single.target_text = "the quick brown fox"
+        for key in keys:
+            single.process_key(key)
+        self.engine.target_text = "the quick brown fox"
+        batch = self.engine.process_keys(keys)
+        self.assertEqual((batch.consumed, batch.finished), (len(keys), False))
+        self.assertEqual(batch.errors.tolist(), [2, 9, 13])  # "x", the "k" of "quik", "w"
+        self.assertEqual(self.engine.typed, single.typed)
+        self.assertEqual(sorted(self.engine.missed_data), sorted(single.missed_data))
+        self.assertEqual(self.engine.correct_chars, single.correct_chars)
+
+    def test_process_keys_uses_timestamps_and_stops_at_the_end(self):
+        self.engine.target_text = "ab cd"
+        t0 = 1000.0
+        batch = self.engine.process_keys("ab cdxx", [t0, t0 + 0.5, t0 + 1.2, t0 + 1.5, t0 + 2.0, t0 + 2.1, t0 + 2.2])
+        self.assertEqual((batch.consumed, batch.finished), (5, True))
+        self.assertEqual(self.engine.start_time, t0)
+        self.assertEqual(self.engine.timeline.keys[:3].tolist(), [2, 2, 1])
+        self.assertEqual(self.engine.wpm, 30)  # 5 correct keys in 2 s
+
+    def test_transposition_counts_as_missed_ngram(self):
+        stats = StatsManager.merge_missed({}, [("he", "eh"), ("a", "b"), (" ", "x")], now=1000.0)
+        self.assertEqual(stats["missed_ngrams"], {"he": [1, 1000.0]})
+        self.assertEqual(stats["decay_since"], 1000.0)
+        self.assertEqual(stats["missed_chars"], {"a": [1, 1000.0], " ": [1, 1000.0]})
+
+    def test_missed_chars_decay_lazily(self):
+        day = 86400.0
+        stats = {"missed_chars": {"a": 8, "b": 4}}  # saved before decay: read as of now
+        with patch.object(StatsManager, "HALF_LIFE_DAYS", 14):
+            StatsManager.merge_missed(stats, [("a", "s")], now=1000.0)
+            self.assertEqual(stats["missed_chars"], {"a": [9, 1000.0], "b": [4, 1000.0]})
+            chars, _ngrams = StatsManager.missed_weights(stats, now=1000.0 + 14 * day)
+            self.assertEqual(chars["a"], 4.5)
+            StatsManager.merge_missed(stats, [("a", "s")], now=1000.0 + 28 * day)
+            self.assertEqual(stats["missed_chars"]["a"], [3.25, 1000.0 + 28 * day])
+            # Forgotten once decayed below decay.MIN_VALUE
+            self.assertEqual(StatsManager.missed_weights(stats, now=1000.0 + 400 * day), ({}, {}))
+        with patch.object(StatsManager, "HALF_LIFE_DAYS", 0):
+            chars, _ngrams = StatsManager.missed_weights(stats, now=1000.0 + 400 * day)
+            self.assertEqual(chars["a"], 3.25)
+
     def test_process_key_backspace(self):
         self.engine.reset()
         c = self.engine.target_text[0]
@@ -88,6 +146,104 @@ class TestTypingEngine(unittest.TestCase):
         self.assertLessEqual(self.engine.accuracy, 100)
 
 
+class TestKeyAllocations(unittest.TestCase):
+    def test_engine_has_no_instance_dict(self):
+        engine = TypingEngine(mode="word", word_count=5, persist=False)
+        self.assertFalse(hasattr(engine, "__dict__"))
+        with self.assertRaises(AttributeError):
+            engine.not_an_attribute = 1
+
+    def test_keys_do_not_allocate(self):
+        engine = TypingEngine(mode="time", duration=60, rng=random.Random(1), persist=False)
+        keys = []
+        for i, c in enumerate(engine.target_text[:500]):
+            keys.append(c)
+            if i % 13 == 5:
+                keys += ["#", "\b"]  # corrected mistake
+            if i % 29 == 3:
+                keys.append("q")  # left in
+        for key in keys[:300]:  # warm up free lists, and counters past the cached small ints
+            engine.process_key(key)
+        here = [tracemalloc.Filter(True, os.path.dirname(os.path.abspath(corpus.__file__)) + os.sep + "*")]
+        tracemalloc.start()
+        try:
+            for key in keys[300:400]:
+                engine.process_key(key)
+            before = tracemalloc.take_snapshot().filter_traces(here)
+            for key in keys[400:]:
+                engine.process_key(key)
+            after = tracemalloc.take_snapshot().filter_traces(here)
+        finally:
+            tracemalloc.stop()
+        # Net blocks still alive: one per key would be hundreds. Tuples freed into
+        # the interpreter's free lists stay traced, so allow a couple.
+        grown = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+        self.assertLessEqual(grown, 3)
+        self.assertEqual(len(engine.user_input), len(keys) - 2 * keys.count("\b"))
+
+
+class TestDeterministicText(unittest.TestCase):
+    def test_injected_rng_reproduces_sequence(self):
+        a = TypingEngine(mode="time", rng=random.Random(42))
+        b = TypingEngine(mode="time", rng=random.Random(42))
+        self.assertEqual(a.target_text, b.target_text)
+        a.reset()
+        b.reset()
+        self.assertEqual(a.target_text, b.target_text)
+
+    def test_reset_with_seed_is_reproducible(self):
+        for mode in ("time", "word", "quote"):
+            engine = TypingEngine(mode=mode)
+            engine.reset(seed=1234)
+            first = engine.target_text
+            engine.reset()
+            engine.reset(seed=1234)
+            self.assertEqual(engine.target_text, first)
+            self.assertEqual(engine.seed, 1234)
+
+    def test_daily_seed(self):
+        self.assertEqual(daily_seed("20260101"), 20260101)
+        a = TypingEngine(mode="word", daily=True)
+        b = TypingEngine(mode="word", daily=True)
+        self.assertEqual(a.seed, daily_seed())
+        self.assertEqual(a.target_text, b.target_text)
+
+    def test_from_history_rebuilds_text(self):
+        engine = TypingEngine(mode="word", word_count=10)
+        entry = {"mode": "word", "seed": engine.seed, "params": engine.session_params()}
+        rebuilt = TypingEngine.from_history(entry)
+        self.assertEqual(rebuilt.target_text, engine.target_text)
+
+    def test_practice_mode_generates_pseudo_words(self):
+        with patch.object(StatsManager, "load_stats", return_value={"missed_chars": {"e": 3}}):
+            engine = TypingEngine(mode="practice", word_count=10)
+            engine.reset(seed=11)
+            first = engine.target_text
+            engine.reset(seed=11)
+        self.assertEqual(len(engine.words), 10)
+        self.assertEqual(engine.target_text, first)
+
+    def test_practice_quotes_favor_missed_letters(self):
+        source = corpus.get_corpus()
+        heavy = [source.quotes[i] for i in source.quote_index.heavy_ids("w")]
+        stats = {"missed_chars": {"w": 50}}
+        for seed in range(5):
+            engine = TypingEngine(mode="practice", practice_source="quotes", persist=False, stats=stats)
+            engine.reset(seed=seed)
+            self.assertIn(engine.target_text, heavy)
+
+    def test_practice_words_fall_back_without_a_model(self):
+        with patch.object(markov, "get_generator", return_value=markov.MarkovGenerator([])):
+            words = StatsManager.get_practice_words(10, stats={}, rng=random.Random(1))
+        self.assertEqual(len(words), 10)
+
+    def test_weighted_words_use_given_rng(self):
+        with patch.object(StatsManager, "load_stats", return_value={"missed_chars": {"e": 3}}):
+            a = StatsManager.get_weighted_words(10, rng=random.Random(7))
+            b = StatsManager.get_weighted_words(10, rng=random.Random(7))
+        self.assertEqual(a, b)
+
+
 class TestHistoryManager(unittest.TestCase):
     def setUp(self):
         self.tmp = tempfile.NamedTemporaryFile(mode="w", suffix=".json", delete=False)
@@ -111,6 +267,24 @@ class TestHistoryManager(unittest.TestCase):
         self.assertEqual(history[0]["wpm"], 50)
         self.assertEqual(history[0]["accuracy"], 95)
 
+    def test_save_attempt_stores_seed(self):
+        HistoryManager.save_attempt({
+            "mode": "word", "wpm": 50, "accuracy": 95, "missed_count": 0,
+            "seed": 99, "daily": False, "params": {"word_count": 10},
+        })
+        entry = HistoryManager.get_last_attempt()
+        self.assertEqual(entry["seed"], 99)
+        self.assertEqual(entry["params"]["word_count"], 10)
+
+    def test_save_attempt_stores_latency_when_given(self):
+        HistoryManager.save_attempt({"mode": "time", "wpm": 50, "accuracy": 95, "missed_count": 0})
+        self.assertNotIn("latency", HistoryManager.get_last_attempt())
+        HistoryManager.save_attempt({
+            "mode": "time", "wpm": 50, "accuracy": 95, "missed_count": 0,
+            "latency": {"n": 3, "p50_ms": 8.0},
+        })
+        self.assertEqual(HistoryManager.get_last_attempt()["latency"]["p50_ms"], 8.0)
+
     def test_load_empty_returns_list(self):
         history = HistoryManager.load_history()
         self.assertEqual(history, [])
@@ -122,6 +296,38 @@ class TestHistoryManager(unittest.TestCase):
         self.assertIsNotNone(prev)
         self.assertEqual(prev["wpm"], 40)
 
+    def test_save_attempts_appends_batch_and_caps(self):
+        HistoryManager.save_attempts([
+            {"mode": "word", "wpm": i, "accuracy": 100, "missed_count": 0, "user": "ana"}
+            for i in range(HistoryManager.MAX_ENTRIES + 5)
+        ])
+        history = HistoryManager.load_history()
+        self.assertEqual(len(history), HistoryManager.MAX_ENTRIES)
+        self.assertEqual(history[-1]["wpm"], HistoryManager.MAX_ENTRIES + 4)
+        self.assertEqual(history[-1]["user"], "ana")
+        HistoryManager.save_attempts([{"mode": "word", "wpm": 1, "accuracy": 100, "missed_count": 0}] * 80,
+                                     max_entries=1000)
+        self.assertEqual(len(HistoryManager.load_history()), HistoryManager.MAX_ENTRIES + 80)
+
+    def test_engine_without_persist_saves_nothing(self):
+        engine = TypingEngine(mode="word", word_count=10, persist=False)
+        engine.process_key("#")
+        engine.stop()
+        self.assertEqual(HistoryManager.load_history(), [])
+        self.assertEqual(engine.result()["missed_count"], 1)
+
+    def test_finish_freezes_results_until_save(self):
+        engine = TypingEngine(mode="word", word_count=10)
+        engine.process_key(engine.target_text[0])
+        with patch.object(StatsManager, "update_missed_chars"):
+            engine.finish()
+            self.assertTrue(engine.is_finished)
+            self.assertFalse(engine.process_key("x"))
+            self.assertEqual(HistoryManager.load_history(), [])
+            engine.latency = {"n": 1}
+            engine.save()
+        self.assertEqual(HistoryManager.load_history()[0]["latency"], {"n": 1})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,66 @@
+# tests/test_markov.py - Unit tests for the Markov pseudo-word generator
+import os
+import random
+import unittest
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markov
+from markov import MarkovGenerator
+
+WORDS = ["the", "then", "there", "this", "that", "zone", "quiz", "other", "weather", "north", "tooth"]
+
+
+class TestMarkovGenerator(unittest.TestCase):
+    def setUp(self):
+        self.gen = MarkovGenerator(WORDS)
+
+    def test_words_use_corpus_alphabet_and_length_bounds(self):
+        alphabet = set("".join(WORDS))
+        for w in self.gen.generate(200, random.Random(1)):
+            self.assertTrue(set(w) <= alphabet)
+            self.assertGreaterEqual(len(w), markov.MIN_WORD_LEN)
+            self.assertLessEqual(len(w), markov.MAX_WORD_LEN)
+
+    def test_same_seed_same_words(self):
+        a = self.gen.generate(50, random.Random(5))
+        b = self.gen.generate(50, random.Random(5))
+        self.assertEqual(a, b)
+
+    def test_missed_char_bias_increases_frequency(self):
+        def z_share():
+            text = "".join(self.gen.generate(500, random.Random(2)))
+            return text.count("z") / len(text)
+
+        base = z_share()
+        self.gen.set_bias({"z": 10})
+        self.assertGreater(z_share(), base)
+
+    def test_ngram_bias_increases_frequency(self):
+        def count_th():
+            return sum(w.count("th") for w in self.gen.generate(500, random.Random(3)))
+
+        self.gen.set_bias({"t": 1, "h": 1})
+        base = count_th()
+        self.gen.set_bias({"t": 1, "h": 1}, {"th": 5})
+        self.assertGreater(count_th(), base)
+
+    def test_non_ascii_corpus(self):
+        gen = MarkovGenerator(["über", "straße", "größe", "früh"])
+        words = gen.generate(20, random.Random(0))
+        self.assertEqual(len(words), 20)
+
+    def test_single_character_corpus_terminates(self):
+        gen = MarkovGenerator(["一", "二", "三"])
+        words = gen.generate(20, random.Random(0))
+        self.assertEqual(len(words), 20)
+        self.assertTrue(all(w in ("一", "二", "三") for w in words))
+
+    def test_empty_corpus_raises(self):
+        with self.assertRaises(ValueError):
+            MarkovGenerator([]).generate_word()
+
+
+if __name__ == "__main__":
+    unittest.main()
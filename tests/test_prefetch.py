@@ -0,0 +1,51 @@
+# tests/test_prefetch.py - Unit tests for preparing the next test in the background
+import os
+import random
+import threading
+import unittest
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import TypingEngine
+from prefetch import NextTest
+
+
+class TestNextTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = TypingEngine(mode="word", word_count=10, rng=random.Random(3), persist=False)
+        self.next_test = NextTest(self.engine)
+        self.addCleanup(self.next_test.close)
+
+    def test_restart_swaps_in_the_prepared_text(self):
+        warmed = []
+        self.next_test.prepare(lambda text: warmed.append((text, threading.current_thread().name)))
+        prepared = self.next_test._future.result()
+        self.engine.process_key("x")
+        self.next_test.restart()
+        self.assertEqual(self.engine.target_text, prepared.text)
+        self.assertEqual(self.engine.seed, prepared.seed)
+        self.assertEqual(self.engine.user_input, "")
+        self.assertEqual(warmed[0][0], prepared.text)
+        self.assertTrue(warmed[0][1].startswith("next-test"))
+        # The text is the one its seed gives
+        replay = TypingEngine(mode="word", word_count=10, persist=False)
+        replay.reset(seed=prepared.seed)
+        self.assertEqual(replay.target_text, prepared.text)
+
+    def test_changed_settings_reset_synchronously(self):
+        self.next_test.prepare()
+        self.engine.target_word_count = 5
+        self.next_test.restart()
+        self.assertEqual(len(self.engine.words), 5)
+
+    def test_failed_preparation_falls_back(self):
+        def broken(text):
+            raise RuntimeError("no fonts")
+        self.next_test.prepare(broken)
+        self.next_test.restart()
+        self.assertEqual(len(self.engine.words), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
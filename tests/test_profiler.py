@@ -0,0 +1,98 @@
+# tests/test_profiler.py - Unit tests for the frame profiler
+import csv
+import os
+import tempfile
+import unittest
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profiler import FrameProfiler, LatencyHistogram, RingBuffer
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_wraps_and_keeps_order(self):
+        ring = RingBuffer(3)
+        for v in range(5):
+            ring.push(v)
+        self.assertEqual(ring.values(), [2.0, 3.0, 4.0])
+        self.assertEqual(ring.count, 3)
+
+    def test_percentiles(self):
+        ring = RingBuffer(100)
+        for v in range(1, 101):
+            ring.push(v)
+        self.assertEqual(ring.percentiles(50, 95, 99), (50.0, 95.0, 99.0))
+
+    def test_empty_percentiles(self):
+        self.assertEqual(RingBuffer(4).percentiles(50), (0.0,))
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_buckets_and_percentiles(self):
+        hist = LatencyHistogram()
+        for ms in [1.0] * 90 + [15.0] * 9 + [400.0]:
+            hist.add(ms)
+        self.assertEqual(hist.percentile(50), 2.0)
+        self.assertEqual(hist.percentile(95), 16.0)
+        self.assertEqual(hist.percentile(100), 400.0)
+        summary = hist.summary()
+        self.assertEqual(summary["n"], 100)
+        self.assertEqual(sum(summary["counts"]), 100)
+        self.assertEqual(summary["max_ms"], 400.0)
+
+    def test_reset(self):
+        hist = LatencyHistogram()
+        hist.add(5)
+        hist.reset()
+        self.assertEqual(hist.n, 0)
+        self.assertEqual(hist.percentile(50), 0.0)
+
+
+class TestFrameProfiler(unittest.TestCase):
+    def test_disabled_records_nothing(self):
+        prof = FrameProfiler(enabled=False)
+        prof.begin_frame()
+        with prof.section("draw"):
+            pass
+        prof.end_frame()
+        self.assertEqual(prof.summary(), [])
+
+    def test_sections_are_frame_aligned(self):
+        prof = FrameProfiler(frames=10, enabled=True)
+        for i in range(4):
+            prof.begin_frame()
+            with prof.section("events"):
+                pass
+            if i >= 2:
+                with prof.section("overlay"):
+                    pass
+            prof.count("surfaces", i)
+            prof.end_frame()
+        names = [row[0] for row in prof.summary()]
+        self.assertEqual(names[0], "frame")
+        self.assertIn("overlay", names)
+        self.assertEqual(prof.counter_summary(), [("surfaces", 3, 3)])
+
+    def test_dump_csv(self):
+        prof = FrameProfiler(frames=5, enabled=True)
+        for _ in range(8):
+            prof.begin_frame()
+            with prof.section("draw"):
+                pass
+            prof.end_frame()
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+        try:
+            self.assertTrue(prof.dump_csv(path))
+            with open(path, newline="") as f:
+                rows = list(csv.reader(f))
+            self.assertEqual(rows[0][0], "frame")
+            self.assertEqual(len(rows), 6)  # header + ring size
+            self.assertEqual(rows[1][0], "3")
+        finally:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
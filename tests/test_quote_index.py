@@ -0,0 +1,104 @@
+# tests/test_quote_index.py - Unit tests for the length-bucketed quote index
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import corpus
+from quote_index import QuoteIndex, length_bucket
+
+
+QUOTES = [
+    "short one",
+    "z" * 3 + " buzz fizz jazz " * 8,  # medium, heavy in z
+    "a medium quote " * 10,
+    "long " * 80,
+    "thicc " * 150,
+]
+
+
+class TestQuoteIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_length_bucket_bounds(self):
+        self.assertEqual(length_bucket(100), "short")
+        self.assertEqual(length_bucket(101), "medium")
+        self.assertEqual(length_bucket(600), "long")
+        self.assertEqual(length_bucket(601), "thicc")
+
+    def test_build_buckets(self):
+        idx = QuoteIndex.build(QUOTES)
+        self.assertEqual(list(idx.ids("short")), [0])
+        self.assertEqual(list(idx.ids("medium")), [1, 2])
+        self.assertEqual(list(idx.ids("long")), [3])
+        self.assertEqual(list(idx.ids("thicc")), [4])
+        self.assertEqual(idx.count("all"), len(QUOTES))
+
+    def test_unknown_filter_means_all(self):
+        idx = QuoteIndex.build(QUOTES)
+        self.assertEqual(list(idx.ids("huge")), list(idx.ids("all")))
+        self.assertIsNotNone(idx.pick_heavy({"z": 5}, "huge"))
+
+    def test_pick_stays_in_bucket(self):
+        idx = QuoteIndex.build(QUOTES)
+        rng = random.Random(3)
+        for _ in range(20):
+            self.assertIn(idx.pick("medium", rng), (1, 2))
+
+    def test_pick_heavy_prefers_missed_letter(self):
+        idx = QuoteIndex.build(QUOTES)
+        self.assertIn(1, idx.heavy_ids("z"))
+        rng = random.Random(0)
+        for _ in range(10):
+            self.assertEqual(idx.pick_heavy({"z": 5}, "medium", rng), 1)
+
+    def test_save_load_roundtrip(self):
+        idx = QuoteIndex.build(QUOTES, source_size=123, source_mtime_ns=2 ** 60)
+        path = os.path.join(self.tmpdir, "quotes.idx")
+        idx.save(path)
+        loaded = QuoteIndex.load(path)
+        self.assertEqual(loaded.n_quotes, len(QUOTES))
+        self.assertEqual(loaded.source_size, 123)
+        self.assertEqual(loaded.source_mtime_ns, 2 ** 60)
+        self.assertEqual(list(loaded.ids("long")), list(idx.ids("long")))
+        self.assertEqual(list(loaded.heavy_ids("z", "medium")), list(idx.heavy_ids("z", "medium")))
+
+    def test_corpus_persists_and_rebuilds_stale_index(self):
+        corpus.write_packed(os.path.join(self.tmpdir, "quotes.bin"), QUOTES)
+        c = corpus.Corpus("test", self.tmpdir)
+        self.assertIn(c.random_quote(length="long"), [QUOTES[3]])
+        c.close()
+        self.assertTrue(os.path.isfile(os.path.join(self.tmpdir, "quotes.idx")))
+
+        corpus.write_packed(os.path.join(self.tmpdir, "quotes.bin"), QUOTES[:2])
+        c = corpus.Corpus("test", self.tmpdir)
+        self.assertEqual(c.quote_index.n_quotes, 2)
+        # Empty bucket falls back to any quote
+        self.assertIn(c.random_quote(length="thicc"), QUOTES[:2])
+        c.close()
+
+    def test_same_size_rewrite_rebuilds_index(self):
+        path = os.path.join(self.tmpdir, "quotes.bin")
+        corpus.write_packed(path, ["aaaa", "bbbb"])
+        c = corpus.Corpus("test", self.tmpdir)
+        self.assertEqual(c.quote_index.count("all"), 2)
+        c.close()
+        # Same byte size and count, different text: only the mtime tells
+        corpus.write_packed(path, ["zzzz", "zzzz"])
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        c = corpus.Corpus("test", self.tmpdir)
+        self.assertEqual(c.quote_index.source_mtime_ns, os.stat(path).st_mtime_ns)
+        c.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+# tests/test_race.py - Unit tests for race updates, transports and ghosts
+import os
+import select
+import tempfile
+import unittest
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import race
+from race import Ghost, GhostStore, LoopbackHub, RaceClient, RaceSession, RunRecorder
+
+TEXT = "the quick brown fox"
+
+
+class CountingTransport:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.sent = []
+
+    def send(self, payload):
+        self.sent.append(payload)
+        self.endpoint.send(payload)
+
+    def receive(self):
+        return self.endpoint.receive()
+
+
+class TestRaceClient(unittest.TestCase):
+    def setUp(self):
+        hub = LoopbackHub()
+        self.transport = CountingTransport(hub.join("ana"))
+        self.ana = RaceClient(self.transport)
+        self.ben = RaceClient(hub.join("ben"))
+        self.ana.start(TEXT)
+        self.ben.start(TEXT)
+
+    def test_updates_are_coalesced_per_frame(self):
+        for i in range(1, 6):
+            self.ana.update(i, i * 40)
+        self.ana.flush()
+        self.assertEqual(len(self.transport.sent), 1)
+        self.assertEqual(len(self.transport.sent[0]), 12)
+        self.assertEqual(self.ben.poll(), {"ana": 5})
+        # The caret didn't move: nothing sent
+        self.ana.update(5, 260)
+        self.ana.flush()
+        self.ana.flush()
+        self.assertEqual(len(self.transport.sent), 1)
+        self.ana.update(6, 300)
+        self.ana.flush()
+        self.assertEqual(len(self.transport.sent), 2)
+
+    def test_other_texts_and_stale_updates_are_ignored(self):
+        self.ben.start("another text")
+        self.ana.update(3, 100)
+        self.ana.flush()
+        self.assertEqual(self.ben.poll(), {})
+        self.ben.start(TEXT)
+        self.ben.positions["ana"] = (7, 500)
+        self.ana.update(3, 100)
+        self.ana.flush()
+        self.assertEqual(self.ben.poll(), {"ana": 7})
+
+
+class TestGhost(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.NamedTemporaryFile(suffix=".json", delete=False)
+        self.tmp.close()
+        os.unlink(self.tmp.name)
+        self.original_path = GhostStore.FILE_PATH
+        GhostStore.FILE_PATH = self.tmp.name
+
+    def tearDown(self):
+        GhostStore.FILE_PATH = self.original_path
+        if os.path.exists(self.tmp.name):
+            os.unlink(self.tmp.name)
+
+    def test_recorder_round_trips_through_ghost(self):
+        rec = RunRecorder()
+        for index, t in ((1, 100), (2, 180), (2, 190), (1, 300), (2, 420)):
+            rec.record(index, t)
+        self.assertEqual(rec.trace.tolist(), [1, 100, 1, 80, -1, 120, 1, 120])
+        ghost = Ghost(rec.trace)
+        self.assertEqual([ghost.position(t) for t in (0, 100, 250, 300, 1000)], [0, 1, 2, 1, 2])
+
+    def test_store_keeps_only_the_best_run(self):
+        slow, fast = RunRecorder(), RunRecorder()
+        slow.record(1, 500)
+        fast.record(1, 100)
+        self.assertTrue(GhostStore.save_if_best(TEXT, 40, slow))
+        self.assertTrue(GhostStore.save_if_best(TEXT, 80, fast))
+        self.assertFalse(GhostStore.save_if_best(TEXT, 60, slow))
+        self.assertEqual(GhostStore.best(TEXT).times.tolist(), [100])
+        self.assertIsNone(GhostStore.best("never typed"))
+
+    def test_session_races_the_ghost_over_loopback(self):
+        rec = RunRecorder()
+        for i in range(1, len(TEXT) + 1):
+            rec.record(i, i * 100)
+        GhostStore.save_if_best(TEXT, 100, rec)
+        session = RaceSession(ghost=True)
+        session.new_text(TEXT)
+        self.assertEqual(session.frame(None), [])
+        self.assertEqual(session.frame(550), [5])
+        session.key(1, 600)
+        self.assertEqual(session.frame(1000), [10])
+        self.assertEqual(session.recorder.trace.tolist(), [1, 600])
+
+
+class TestUdpTransport(unittest.TestCase):
+    def test_updates_reach_a_peer(self):
+        a = race.UdpTransport(0, [], host="127.0.0.1")
+        b = race.UdpTransport(0, [], host="127.0.0.1")
+        self.addCleanup(a.close)
+        self.addCleanup(b.close)
+        a.peers = [b.sock.getsockname()]
+        sender, receiver = RaceClient(a), RaceClient(b)
+        sender.start(TEXT)
+        receiver.start(TEXT)
+        sender.update(4, 250)
+        sender.flush()
+        select.select([b.sock], [], [], 2.0)
+        self.assertEqual(list(receiver.poll().values()), [4])
+
+    def test_parse_peers(self):
+        self.assertEqual(race.parse_peers(["10.0.0.2:9000", "nope"]), [("10.0.0.2", 9000)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+# tests/test_render.py - Smoke tests for the drawing functions (skipped without pygame)
+import os
+import unittest
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+try:
+    import pygame
+except ImportError:  # pragma: no cover - pygame is optional for the logic tests
+    pygame = None
+
+if pygame is not None:
+    import config
+    import render
+    import themes
+    from profiler import FrameProfiler
+
+
+@unittest.skipUnless(pygame, "pygame not installed")
+class TestRenderer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pygame.font.init()
+        cls.renderer = render.Renderer(config.get_font_size_px("medium"))
+        cls.theme = render.theme_colors("monkeytype")
+        cls.settings = config.DEFAULTS.copy()
+
+    def setUp(self):
+        self.surface = pygame.Surface((1100, 820))
+
+    def test_wrap_text_respects_width(self):
+        font = self.renderer.font_mono
+        lines = self.renderer.wrap_text("the quick brown fox " * 20, font, 300)
+        self.assertGreater(len(lines), 1)
+        self.assertTrue(all(font.size(line)[0] <= 300 for line in lines))
+        self.assertEqual("".join(lines), "the quick brown fox " * 20)
+
+    def test_draw_display_returns_caret_at_cursor(self):
+        caret_start = self.renderer.draw_display(self.surface, self.theme, 0, 0, 800, 280, "hello world", "")
+        caret_next = self.renderer.draw_display(self.surface, self.theme, 0, 0, 800, 280, "hello world", "he")
+        self.assertIsNotNone(caret_start)
+        self.assertGreater(caret_next.x, caret_start.x)
+        self.assertEqual(caret_next.y, caret_start.y)
+
+    def test_line_breaks_start_rows_and_long_text_scrolls(self):
+        layout = self.renderer.text_layout("if x:\n    y()\nz", 800)
+        self.assertEqual(layout.lines(), ["if x:\n", "    y()\n", "z"])
+        self.assertEqual(layout.caret(5)[:2], (layout.x[4] + self.renderer.advance(":"), 0))
+        text = "\n".join(f"line {i}" for i in range(20))
+        top = self.renderer.draw_display(self.surface, self.theme, 0, 0, 800, 280, text, "")
+        self.assertIsNotNone(top)
+        typed = text[:text.index("line 15")]
+        caret = self.renderer.draw_display(self.surface, self.theme, 0, 0, 800, 280, text, typed)
+        self.assertEqual(caret.y, top.y + self.renderer.text_layout(text, 780).line_height)  # second visible row
+        self.assertIsNone(self.renderer.caret_rect(0))  # scrolled out
+
+    def test_remote_carets_reuse_the_display_layout(self):
+        renderer = render.Renderer(config.get_font_size_px("medium"))
+        renderer.profiler = FrameProfiler(enabled=True)
+        text = "the quick brown fox " * 30
+        renderer.profiler.begin_frame()
+        caret = renderer.draw_display(self.surface, self.theme, 0, 0, 800, 280, text, "the q")
+        renderer.profiler.end_frame()
+        self.assertEqual(caret, renderer.caret_rect(5))
+        renderer.profiler.begin_frame()
+        renderer.draw_display(self.surface, self.theme, 0, 0, 800, 280, text, "the qu")
+        renderer.draw_remote_carets(self.surface, self.theme, [0, 40, 200, len(text)])
+        renderer.profiler.end_frame()
+        counters = dict((name, last) for name, last, _peak in renderer.profiler.counter_summary())
+        self.assertEqual(counters.get("text_layout", 0), 0)
+        self.assertGreater(renderer.caret_rect(100).y, renderer.caret_rect(0).y)
+        # Rows scrolled out of the display have no caret
+        self.assertIsNone(renderer.caret_rect(len(text)))
+
+    def test_prepared_display_draws_from_cache(self):
+        renderer = render.Renderer(config.get_font_size_px("medium"))
+        text = "prepared ahead of time " * 10
+        renderer.prepare_display(text, 800, self.theme["main"])
+        renderer.profiler = FrameProfiler(enabled=True)
+        renderer.profiler.begin_frame()
+        renderer.draw_display(self.surface, self.theme, 0, 0, 800, 280, text, "")
+        renderer.profiler.end_frame()
+        counters = dict((name, last) for name, last, _peak in renderer.profiler.counter_summary())
+        self.assertEqual(counters.get("text_layout", 0), 0)
+        self.assertEqual(counters.get("glyph_render", 0), 0)
+
+    def test_key_rects_cover_layout(self):
+        for layout, rows in (("qwerty", render.KEYBOARD_ROWS_QWERTY), ("dvorak", render.KEYBOARD_ROWS_DVORAK)):
+            rects = self.renderer.build_key_rects(0, 0, 850, layout)
+            self.assertEqual(set(rects), set("".join(rows)) | {" "})
+
+    def test_draw_all_panels(self):
+        cx, cy, cw, ch = render.content_rect(self.surface.get_size())
+        layouts = render.layout_rects(cx, cy, cw)
+        rects = self.renderer.draw_settings_bar(self.surface, self.theme, *layouts["settings"], self.settings)
+        self.assertIn("history", rects)
+        self.renderer.draw_hud(self.surface, self.theme, *layouts["hud"], 30, 60, 98)
+        self.renderer.draw_keyboard(self.surface, self.theme, *layouts["keyboard"], "qwerty", "a", True)
+        self.renderer.draw_keyboard(self.surface, self.theme, *layouts["keyboard"], "dvorak", None, True,
+                                    {"a": 0.0, "e": 0.5, "z": 1.0})
+        self.renderer.draw_overlay(self.surface, self.theme, 60, 98, "Characters missed:\n'a': 1\n",
+                                   {"wpm": [50, 60, 58], "raw": [60, 72, 60], "err": [0, 1, 0]}, 88)
+        self.renderer.draw_caret(self.surface, self.theme, (10, 10, 12, 30))
+
+    def test_steady_frames_allocate_no_surfaces(self):
+        renderer = render.Renderer(config.get_font_size_px("medium"))
+        renderer.profiler = FrameProfiler(enabled=True)
+
+        def frame(caret_w):
+            renderer.profiler.begin_frame()
+            renderer.draw_overlay(self.surface, self.theme, 60, 98, "")
+            renderer.draw_history_overlay(self.surface, self.theme)
+            renderer.draw_caret(self.surface, self.theme, (10, 10, caret_w, 30))
+            renderer.profiler.end_frame()
+            return dict((name, last) for name, last, _peak in renderer.profiler.counter_summary())
+
+        self.assertGreater(frame(14).get("surface_alloc", 0), 0)
+        # A narrower caret and a new theme color reuse the existing buffers,
+        # and unchanged overlay text comes from the glyph cache
+        steady = frame(9.5)
+        self.assertEqual(steady.get("surface_alloc", 0), 0)
+        self.assertEqual(steady.get("glyph_render", 0), 0)
+        self.theme = render.theme_colors("nord")
+        self.assertEqual(frame(12).get("surface_alloc", 0), 0)
+        # Resizing the window reallocates once
+        self.surface = pygame.Surface((1200, 900))
+        self.assertGreater(frame(12).get("surface_alloc", 0), 0)
+        self.assertEqual(frame(12).get("surface_alloc", 0), 0)
+
+    def test_theme_change_drops_glyph_cache(self):
+        renderer = render.Renderer(config.get_font_size_px("medium"))
+        renderer.draw_display(self.surface, self.theme, 0, 0, 800, 280, "hello", "he")
+        n_glyphs = len(renderer._glyphs)
+        self.assertGreater(n_glyphs, 0)
+        renderer.draw_display(self.surface, self.theme, 0, 0, 800, 280, "hello", "he")
+        self.assertEqual(len(renderer._glyphs), n_glyphs)
+        previous = themes.registry().current
+        self.addCleanup(themes.set_theme, previous)
+        themes.set_theme("nord" if previous != "nord" else "monkeytype")
+        self.assertEqual(renderer._glyphs, {})
+
+
+@unittest.skipUnless(pygame, "pygame not installed")
+class TestSettingsBar(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pygame.font.init()
+        cls.renderer = render.Renderer(config.get_font_size_px("medium"))
+        cls.theme = render.theme_colors("monkeytype")
+
+    def setUp(self):
+        self.surface = pygame.Surface((1100, 820))
+        self.bar = self.renderer.settings_bar
+        self.bar.invalidate()
+        self.settings = config.DEFAULTS.copy()
+
+    def test_drawn_rects_match_click_rects(self):
+        for mode in ("time", "word", "quote", "practice", "drill", "book", "code"):
+            self.settings["mode"] = mode
+            drawn = self.renderer.draw_settings_bar(self.surface, self.theme, 100, 40, 850, 110, self.settings)
+            self.assertEqual(drawn, self.renderer.get_settings_bar_rects(100, 40, 850, 110, self.settings))
+
+    def test_hit_test_uses_drawn_layout(self):
+        rects = self.renderer.draw_settings_bar(self.surface, self.theme, 100, 40, 850, 110, self.settings)
+        self.assertEqual(self.bar.hit_test(rects["mode"]["quote"].center), ("mode", "quote"))
+        self.assertEqual(self.bar.hit_test(rects["duration"][60].center), ("duration", 60))
+        self.assertEqual(self.bar.hit_test(rects["daily"].center), ("daily", None))
+        self.assertIsNone(self.bar.hit_test((5, 5)))
+
+    def test_rendered_bar_is_cached(self):
+        self.renderer.draw_settings_bar(self.surface, self.theme, 100, 40, 850, 110, self.settings)
+        self.renderer.draw_settings_bar(self.surface, self.theme, 100, 40, 850, 110, self.settings)
+        self.assertEqual(len(self.bar._surfaces), 1)
+        self.settings["sound_on_error"] = not self.settings["sound_on_error"]
+        self.renderer.draw_settings_bar(self.surface, self.theme, 100, 40, 850, 110, self.settings)
+        self.assertEqual(len(self.bar._surfaces), 2)
+        self.assertEqual(len(self.bar._layouts), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+# tests/test_server.py - Session handling and protocol of the asyncio server
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server
+from logic import HistoryManager, StatsManager
+
+
+class TestDispatch(unittest.TestCase):
+    def setUp(self):
+        self.store = server.ResultStore(persist=False)
+        self.server = server.TypingServer(self.store)
+        self.sessions = {}
+
+    def start(self, **req):
+        req.setdefault("mode", "word")
+        req.setdefault("word_count", 10)
+        return self.server.dispatch(dict(req, op="start"), self.sessions)
+
+    def test_start_is_reproducible_by_seed(self):
+        a = self.start(seed=5)
+        b = self.start(seed=5)
+        self.assertTrue(a["ok"])
+        self.assertNotEqual(a["session"], b["session"])
+        self.assertEqual(a["text"], b["text"])
+
+    def test_keys_until_done_queues_result(self):
+        resp = self.start(seed=1, user="ana")
+        sid, text = resp["session"], resp["text"]
+        r = self.server.dispatch({"op": "keys", "session": sid, "keys": text[:5]}, self.sessions)
+        self.assertEqual((r["pos"], r["done"], r["errors"]), (5, False, []))
+        r = self.server.dispatch({"op": "keys", "session": sid, "keys": "#\b" + text[5:]}, self.sessions)
+        self.assertTrue(r["done"])
+        self.assertEqual(r["errors"], [0])
+        self.assertNotIn(sid, self.sessions)
+        (result, missed), = self.store._pending
+        self.assertEqual(result["user"], "ana")
+        self.assertEqual(missed, [(text[5], "#")])
+
+    def test_errors(self):
+        r = self.server.dispatch({"op": "keys", "session": 999, "keys": "a"}, self.sessions)
+        self.assertFalse(r["ok"])
+        self.assertFalse(self.start(mode="nope")["ok"])
+        self.assertFalse(self.server.dispatch({"op": "dance"}, self.sessions)["ok"])
+
+    def test_options_from_the_network_are_validated(self):
+        for bad in ({"language": "../../etc"}, {"language": "/tmp"}, {"word_set": 12345},
+                    {"word_count": 10 ** 9}, {"mode": "quote", "quote_length": "huge"},
+                    {"mode": "practice", "practice_source": "nope"}):
+            r = self.start(**bad)
+            self.assertFalse(r["ok"], bad)
+        self.assertEqual(self.sessions, {})
+
+    def test_engine_errors_keep_the_connection_usable(self):
+        with patch("server.TypingEngine", side_effect=IndexError("cannot choose from an empty corpus")):
+            r = self.start()
+        self.assertEqual(r, {"ok": False, "error": "cannot choose from an empty corpus"})
+
+    def test_practice_uses_in_memory_stats(self):
+        self.store.stats = {"missed_chars": {"k": 50}}
+        with patch.object(StatsManager, "load_stats", side_effect=AssertionError("read stats file")):
+            r = self.start(mode="practice", practice_source="words", seed=3)
+        self.assertTrue(r["ok"])
+        self.assertTrue(all("k" in w for w in r["text"].split()))
+
+
+class TestServerSocket(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        for cls, name in ((HistoryManager, "history.json"), (StatsManager, "stats.json")):
+            self.addCleanup(setattr, cls, "FILE_PATH", cls.FILE_PATH)
+            cls.FILE_PATH = os.path.join(self.dir.name, name)
+
+    def test_round_trip_and_batched_persistence(self):
+        async def scenario():
+            store = server.ResultStore()
+            listener, _srv = await server.start_server(store, "127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+            async def request(req):
+                writer.write(json.dumps(req).encode() + b"\n")
+                await writer.drain()
+                return json.loads(await reader.readline())
+
+            for user in ("ana", "ben"):
+                r = await request({"op": "start", "mode": "word", "word_count": 10, "user": user})
+                await request({"op": "keys", "session": r["session"], "keys": "x" + r["text"][1:]})
+            self.assertEqual(HistoryManager.load_history(), [])  # nothing written yet
+            await store.flush()
+            writer.close()
+            listener.close()
+            await listener.wait_closed()
+
+        asyncio.run(scenario())
+        history = HistoryManager.load_history()
+        self.assertEqual([h["user"] for h in history], ["ana", "ben"])
+        self.assertEqual(sum(StatsManager.missed_weights(StatsManager.load_stats())[0].values()), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+# tests/test_snippets.py - Unit tests for the code snippet index and code mode
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import snippets
+from logic import TypingEngine
+from snippets import SnippetIndex, SnippetLibrary
+
+SOURCE = b"""import os
+
+
+class Greeter:
+    def __init__(self, name):
+        self.name = name
+
+    def greet(self):
+\t\tif self.name:
+\t\t    return "hello " + self.name
+        return "hello"
+x = 1
+"""
+
+
+class TestCutSnippets(unittest.TestCase):
+    def test_blocks_split_at_blank_lines_and_dedents(self):
+        spans = snippets.cut_snippets(SOURCE)
+        texts = [(SOURCE[o:o + n].decode(), lines, indent) for o, n, lines, indent in spans]
+        self.assertEqual(texts[0], ("class Greeter:\n    def __init__(self, name):\n        self.name = name", 3, 0))
+        # The tab-indented lines belong to greet(); "x = 1" dedents past it
+        self.assertEqual(texts[1][1:], (4, 4))
+        self.assertEqual(len(texts), 2)
+
+    def test_long_lines_and_long_blocks(self):
+        wide = b"def f():\n    return '" + b"x" * 80 + b"'\n"
+        self.assertEqual(snippets.cut_snippets(wide), [])
+        tall = b"".join(b"value_%d = compute(%d)\n" % (i, i) for i in range(20))
+        spans = snippets.cut_snippets(tall)
+        self.assertTrue(all(lines <= snippets.MAX_LINES for _o, _n, lines, _i in spans))
+        self.assertEqual(sum(lines for _o, _n, lines, _i in spans), 20)
+
+
+class TestSnippetIndex(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.root = os.path.join(self.dir.name, "src")
+        for name in ("a.py", "pkg/b.py", "pkg/c.js", ".git/d.py", "notes.txt"):
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(SOURCE)
+
+    def test_rescan_only_reads_changed_files(self):
+        index, changed = SnippetIndex(self.root).rescan()
+        self.assertTrue(changed)
+        self.assertEqual(sorted(index.files), ["a.py", os.path.join("pkg", "b.py"), os.path.join("pkg", "c.js")])
+        self.assertEqual(index.files[os.path.join("pkg", "c.js")].language, "javascript")
+        self.assertEqual(index.n_snippets, 6)
+        again, changed = index.rescan()
+        self.assertFalse(changed)
+        self.assertIs(again.files["a.py"], index.files["a.py"])
+        path = os.path.join(self.root, "a.py")
+        with open(path, "wb") as f:
+            f.write(SOURCE.replace(b"hello", b"howdy"))
+        os.utime(path, ns=(1, 1))
+        os.remove(os.path.join(self.root, "pkg", "c.js"))
+        third, changed = again.rescan()
+        self.assertTrue(changed)
+        self.assertIsNot(third.files["a.py"], again.files["a.py"])
+        self.assertIs(third.files[os.path.join("pkg", "b.py")], again.files[os.path.join("pkg", "b.py")])
+        self.assertEqual(third.n_snippets, 4)
+
+    def test_save_load_and_pick(self):
+        index, _changed = SnippetIndex(self.root).rescan()
+        path = os.path.join(self.dir.name, "snippets.idx")
+        index.save(path)
+        loaded = SnippetIndex.load(path)
+        self.assertEqual(loaded.root, self.root)
+        self.assertEqual({p: (f.mtime_ns, f.language, f.snippets) for p, f in loaded.files.items()},
+                         {p: (f.mtime_ns, f.language, f.snippets) for p, f in index.files.items()})
+        texts = {loaded.pick(random.Random(seed)).text for seed in range(40)}
+        self.assertIn('def greet(self):\n    if self.name:\n        return "hello " + self.name\n    return "hello"', texts)
+        with open(path, "r+b") as f:
+            f.truncate(40)
+        with self.assertRaises(ValueError):
+            SnippetIndex.load(path)
+
+    def test_library_scans_in_the_background(self):
+        library = SnippetLibrary(self.root, os.path.join(self.dir.name, "snippets.idx"))
+        snippet = library.snippet(random.Random(1), wait=10)
+        self.assertTrue(library.scanned.is_set())
+        self.assertEqual(snippet.language, "python" if snippet.path.endswith(".py") else "javascript")
+        self.assertTrue(os.path.isfile(library.index_path))
+        empty = SnippetLibrary(os.path.join(self.dir.name, "nothing"), os.path.join(self.dir.name, "other.idx"))
+        self.assertIsNone(empty.snippet(random.Random(1), wait=10))
+
+
+class TestCodeMode(unittest.TestCase):
+    def engine(self, text):
+        engine = TypingEngine(mode="word", persist=False)
+        engine.mode = "code"  # typed as code without scanning for snippets
+        engine.target_text = text
+        return engine
+
+    @patch("snippets.get_library")
+    def test_snippet_text_or_a_quote(self, get_library):
+        get_library.return_value.snippet.return_value = snippets.Snippet("a.py", "python", "def f():\n    pass")
+        engine = TypingEngine(mode="code", code_dir="/src", rng=random.Random(1), persist=False)
+        get_library.assert_called_with("/src")
+        self.assertEqual(engine.target_text, "def f():\n    pass")
+        self.assertEqual(engine.session_params(), {"code_dir": "/src", "language": "english"})
+        get_library.return_value.snippet.return_value = None
+        engine.reset()
+        self.assertTrue(engine.target_text)
+        self.assertIsNone(engine.snippet)
+
+    def test_enter_auto_indents(self):
+        engine = self.engine("if x:\n    y()\n        z\nw")
+        engine.process_keys("if x:\n")
+        self.assertEqual(engine.caret, 10)  # past the indentation
+        batch = engine.process_keys("y()\nz\nw")
+        self.assertTrue(batch.finished)
+        self.assertEqual(str(engine.typed), engine.target_text)
+        self.assertEqual(engine.correct_chars, len(engine.target_text) - 12)  # the typed keys only
+        self.assertEqual(engine.accuracy, 100)
+
+    def test_backspace_takes_back_the_indentation_and_line_break(self):
+        engine = self.engine("if x:\n    y()")
+        engine.process_keys("if x:\n")
+        engine.process_keys("\b")
+        self.assertEqual(engine.caret, 5)
+        self.assertEqual(str(engine.user_input), "if x:")
+        engine.process_keys(" ")  # a space ends the line too
+        self.assertEqual(engine.caret, 10)
+        engine.process_keys("y\b\b")
+        self.assertEqual(engine.caret, 5)
+
+    def test_enter_is_ignored_outside_code_mode(self):
+        engine = TypingEngine(mode="word", word_count=2, persist=False)
+        engine.target_text = "ab cd"
+        engine.process_keys("ab\n")
+        self.assertEqual(str(engine.user_input), "ab")
+
+
+if __name__ == "__main__":
+    unittest.main()
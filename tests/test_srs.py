@@ -0,0 +1,99 @@
+# tests/test_srs.py - Unit tests for the spaced-repetition practice schedule
+import os
+import random
+import unittest
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import srs
+from logic import StatsManager, TypingEngine
+from srs import IndexedHeap, Schedule
+
+DAY = srs.DAY
+
+
+class TestIndexedHeap(unittest.TestCase):
+    def test_matches_sorting_through_updates_and_removals(self):
+        rng = random.Random(4)
+        expected = {f"w{i}": rng.random() for i in range(200)}
+        heap = IndexedHeap((p, k) for k, p in list(expected.items())[:100])
+        for k, p in list(expected.items())[100:]:
+            heap.push(k, p)
+        for k in rng.sample(sorted(expected), 50):
+            expected[k] = rng.random()
+            heap.push(k, expected[k])
+        for k in rng.sample(sorted(expected), 30):
+            del expected[k]
+            heap.remove(k)
+        self.assertEqual(len(heap), 170)
+        ordered = sorted((p, k) for k, p in expected.items())
+        self.assertEqual(heap.smallest(10), ordered[:10])
+        self.assertEqual(len(heap), 170)  # smallest() leaves the heap as it was
+        self.assertEqual([heap.pop() for _ in range(170)], ordered)
+
+
+class TestSchedule(unittest.TestCase):
+    def test_review_intervals(self):
+        saved = {}
+        schedule = Schedule(saved)
+        schedule.review("words", "known", True, 0)
+        self.assertEqual(saved["words"], {})  # clean words aren't scheduled
+        schedule.review("words", "their", False, 0)
+        self.assertEqual(saved["words"]["their"], [srs.RELEARN_INTERVAL, 2.2, srs.RELEARN_INTERVAL])
+        schedule.review("words", "their", True, DAY)
+        self.assertEqual(saved["words"]["their"], [2 * DAY, 2.35, DAY])
+        schedule.review("words", "their", True, 2 * DAY)
+        self.assertEqual(saved["words"]["their"][2], int(2.35 * DAY))
+        for _ in range(4):
+            schedule.review("words", "their", True, 2 * DAY)
+        self.assertNotIn("their", saved["words"])  # learnt
+
+    def test_due_in_order(self):
+        schedule = Schedule({})
+        for i, word in enumerate(["c", "a", "b", "d"]):
+            schedule.review("words", word, False, [2, 0, 1, 50][i] * 1000)
+        self.assertEqual(schedule.due("words", 10, 999 + srs.RELEARN_INTERVAL), ["a"])
+        self.assertEqual(schedule.due("words", 2, 5000), ["a", "b"])
+        schedule.review("words", "a", True, 5000)  # keeps the built heap up to date
+        self.assertEqual(schedule.due("words", 10, 5000), ["b", "c"])
+
+
+class TestEngineReviews(unittest.TestCase):
+    def test_words_and_bigrams_from_a_test(self):
+        engine = TypingEngine(mode="word", word_count=3, persist=False)
+        engine.target_text = "the cat, sat"
+        engine.process_keys("hte cxa\b\bat, sat")
+        reviews = engine.srs_reviews()
+        self.assertEqual(reviews["words"], [("the", False), ("cat", False), ("sat", True)])
+        self.assertIn(("th", False), reviews["ngrams"])
+        self.assertIn(("sa", True), reviews["ngrams"])
+
+    def test_practice_uses_due_words(self):
+        stats = {}
+        StatsManager.schedule(stats).review_all({"words": [("zebra", False), ("quartz", False)]}, 0)
+        engine = TypingEngine(mode="practice", word_count=10, rng=random.Random(2), persist=False,
+                              stats=stats, practice_source="words")
+        self.assertIn("zebra", engine.words)
+        self.assertIn("quartz", engine.words)
+        self.assertEqual(len(engine.words), 10)
+        engine.practice_source = "markov"
+        engine.reset()
+        self.assertEqual(len(engine.words), 10)
+        self.assertIn("zebra", engine.words)
+
+    def test_stop_saves_reviews(self):
+        engine = TypingEngine(mode="word", word_count=2, persist=True)
+        engine.target_text = "ab cd"
+        engine.process_keys("ab cx")
+        with patch.object(StatsManager, "update_missed_chars") as update:
+            with patch("logic.HistoryManager.save_attempt"):
+                engine.stop()
+        reviews, language = update.call_args[0][2:4]
+        self.assertEqual(reviews["words"], [("ab", True), ("cd", False)])
+        self.assertEqual(language, engine.language)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+# tests/test_themes.py - Theme registry and compiled palettes
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import resources
+import themes
+
+
+class TestPalette(unittest.TestCase):
+    def test_compiles_rgb_and_variants(self):
+        p = themes.Palette("monkeytype", resources.THEMES["monkeytype"])
+        self.assertEqual(p["bg"], (0x32, 0x34, 0x37))
+        self.assertEqual(p.caret_alpha, p["caret"] + (themes.CARET_ALPHA,))
+        self.assertEqual(p.dim, themes.blend(p["main"], p["bg"], themes.DIM_AMOUNT))
+        self.assertEqual(set(p), set(themes.COLOR_KEYS))
+
+    def test_blend(self):
+        self.assertEqual(themes.blend((0, 0, 0), (200, 100, 50), 0.5), (100, 50, 25))
+
+
+class TestThemeRegistry(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.addCleanup(setattr, resources, "CURRENT_THEME", resources.CURRENT_THEME)
+
+    def _write(self, name, colors):
+        with open(os.path.join(self.dir, name + ".json"), "w", encoding="utf-8") as f:
+            json.dump(colors, f)
+
+    def test_palettes_are_compiled_once(self):
+        reg = themes.ThemeRegistry(user_dir=self.dir)
+        self.assertIs(reg.get("nord"), reg.get("nord"))
+
+    def test_user_theme_loaded_lazily(self):
+        colors = dict(resources.THEMES["nord"], bg="#000000")
+        self._write("mine", colors)
+        reg = themes.ThemeRegistry(user_dir=self.dir)
+        self.assertIn("mine", reg.names())
+        self.assertNotIn("mine", reg._hex)  # only listed so far
+        self.assertEqual(reg.get("mine")["bg"], (0, 0, 0))
+
+    def test_bad_or_unknown_theme_falls_back(self):
+        self._write("broken", {"bg": "#000000"})
+        reg = themes.ThemeRegistry(user_dir=self.dir)
+        self.assertEqual(reg.get("broken").name, themes.DEFAULT_THEME)
+        self.assertEqual(reg.get("no_such_theme").name, themes.DEFAULT_THEME)
+
+    def test_set_current_notifies_on_change(self):
+        reg = themes.ThemeRegistry(user_dir=self.dir)
+        seen = []
+        reg.subscribe(seen.append)
+        reg.set_current("nord")
+        reg.set_current("nord")
+        self.assertEqual([p.name for p in seen], ["nord"])
+        self.assertEqual(resources.CURRENT_THEME, "nord")
+
+
+if __name__ == "__main__":
+    unittest.main()
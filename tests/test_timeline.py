@@ -0,0 +1,75 @@
+# tests/test_timeline.py - Unit tests for the per-second WPM/raw/error series
+import os
+import statistics
+import unittest
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import timeline
+from logic import HistoryManager, TypingEngine
+from timeline import Timeline
+
+
+class TestTimeline(unittest.TestCase):
+    def test_buckets_per_second(self):
+        tl = Timeline(30)
+        for t, ok in ((0.1, True), (0.5, False), (1.2, True), (3.9, True)):
+            tl.add(t, ok)
+        tl.finish(4.0)
+        self.assertEqual(tl.n, 4)
+        self.assertEqual(tl.raw(), [24, 12, 0, 12])
+        self.assertEqual(tl.errors_series(), [1, 0, 0, 0])
+        # Net WPM counts correct keys so far: 1 in 1 s, 2 in 2 s, 2 in 3 s, 3 in 4 s
+        self.assertEqual(tl.wpm(), [12, 12, 8, 9])
+
+    def test_consistency_matches_a_full_recompute(self):
+        tl = Timeline()
+        keys_per_second = [5, 6, 4, 7, 5, 5, 6]
+        for s, k in enumerate(keys_per_second):
+            for i in range(k):
+                tl.add(s + i / k, True)
+        tl.finish(len(keys_per_second))
+        raw = [k * 12 for k in keys_per_second]
+        expected = round(100 - 100 * statistics.pstdev(raw) / statistics.mean(raw))
+        self.assertEqual(tl.consistency(), expected)
+
+    def test_fixed_size_folds_overflow_into_last_bucket(self):
+        tl = Timeline(15)
+        self.assertEqual(len(tl.keys), 15)
+        tl.add(14.5, True)
+        tl.add(16.0, True)  # a late key after the timer ran out
+        tl.finish(15)
+        self.assertEqual(tl.n, 15)
+        self.assertEqual(tl.keys[14], 2)
+        self.assertEqual(len(Timeline(10 ** 6).keys), timeline.MAX_SECONDS)
+
+    def test_short_final_second_is_scaled(self):
+        tl = Timeline()
+        tl.add(0.2, True)
+        tl.add(1.1, True)
+        tl.add(1.4, True)
+        tl.finish(1.5)
+        # 2 keys in the last half second is 48 raw WPM, not 24
+        self.assertEqual(tl.raw(), [12, 48])
+
+
+class TestEngineTimeline(unittest.TestCase):
+    def test_engine_records_and_saves_series(self):
+        engine = TypingEngine(mode="word", word_count=10, persist=False)
+        with patch("logic.time.time", side_effect=[100.0 + i * 0.25 for i in range(200)]):
+            for ch in engine.target_text[:12]:
+                engine.process_key(ch)
+            engine.process_key("#")
+            engine.finish()
+        series = engine.result()["timeline"]
+        self.assertGreater(sum(series["raw"]), 0)
+        self.assertEqual(sum(series["err"]), 1)
+        entry = HistoryManager._make_entry(engine.result())
+        self.assertEqual(entry["timeline"], series)
+        self.assertIn("consistency", entry)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+# tests/test_tui.py - Cell diffing and helpers of the terminal frontend
+import os
+import unittest
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tui import CellBuffer, rgb_to_terminal, wrap_indices
+
+
+class TestCellBuffer(unittest.TestCase):
+    def setUp(self):
+        self.buf = CellBuffer(4, 10)
+
+    def test_first_diff_draws_everything(self):
+        self.buf.put(1, 2, "abc", 7)
+        runs = self.buf.diff()
+        self.assertEqual(sum(len(text) for _, _, text, _ in runs), 40)
+        self.assertIn((1, 2, "abc", 7), runs)
+
+    def test_unchanged_frame_writes_nothing(self):
+        self.buf.put(1, 2, "abc", 7)
+        self.buf.diff()
+        self.buf.clear()
+        self.buf.put(1, 2, "abc", 7)
+        self.assertEqual(self.buf.diff(), [])
+
+    def test_only_changed_cells_are_written(self):
+        self.buf.put(1, 0, "hello", 1)
+        self.buf.diff()
+        self.buf.put(1, 1, "a", 1)  # char change
+        self.buf.set_attr(1, 3, 2)  # attr change
+        self.assertEqual(self.buf.diff(), [(1, 1, "a", 1), (1, 3, "l", 2)])
+
+    def test_put_clips_to_buffer(self):
+        self.buf.put(0, 8, "xyz")
+        self.buf.put(9, 0, "ignored")
+        self.assertEqual("".join(self.buf.chars[:10]), "        xy")
+
+    def test_invalidate_redraws(self):
+        self.buf.diff()
+        self.buf.invalidate()
+        self.assertEqual(len(self.buf.diff()), 4)
+
+
+class TestHelpers(unittest.TestCase):
+    def test_wrap_indices_cover_text(self):
+        text = "the quick brown fox jumps over the lazy dog"
+        lines = wrap_indices(text, 12)
+        self.assertEqual("".join(text[a:b] for a, b in lines), text)
+        self.assertTrue(all(b - a <= 12 for a, b in lines))
+        self.assertEqual(text[lines[0][0] : lines[0][1]], "the quick ")
+
+    def test_wrap_indices_break_after_newlines(self):
+        text = "def f(x):\n    return x + 1\n"
+        self.assertEqual([text[a:b] for a, b in wrap_indices(text, 12)], ["def f(x):\n", "    return ", "x + 1\n"])
+
+    def test_rgb_to_terminal(self):
+        self.assertEqual(rgb_to_terminal((255, 0, 0), 256), 196)
+        self.assertEqual(rgb_to_terminal((128, 128, 128), 256), 244)
+        self.assertEqual(rgb_to_terminal((250, 10, 10), 8), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
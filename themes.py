@@ -0,0 +1,148 @@
+# themes.py - Theme registry with precompiled palettes
+#
+# Themes are compiled once, on first use, into a Palette: RGB tuples (it is
+# a dict, so palette["bg"] works like the old theme dicts) plus the blended
+# variants the frontends need. Nothing is parsed per frame.
+#
+# User themes are JSON files in themes/ (e.g. themes/solarized.json with
+# "bg", "main", "correct", "error" and "caret" hex colors). At startup only
+# the file names are listed; a file is read when its theme is first used.
+#
+# Code that caches anything derived from theme colors registers a callback
+# with subscribe(); it is called with the new Palette after set_theme().
+import json
+import os
+import sys
+import types
+import weakref
+
+import resources
+
+DEFAULT_THEME = "monkeytype"
+USER_THEMES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "themes")
+COLOR_KEYS = ("bg", "main", "correct", "error", "caret")
+
+CARET_ALPHA = 128  # smooth caret
+FILL_ALPHA = 40  # area under the history graph
+DIM_AMOUNT = 0.5  # dimmed text: main color blended this far toward bg
+
+
+def hex_to_rgb(hex_str):
+    h = hex_str.lstrip("#")
+    return tuple(int(h[i : i + 2], 16) for i in (0, 2, 4))
+
+
+def blend(a, b, t):
+    """RGB color t of the way from a to b."""
+    return tuple(round(x + (y - x) * t) for x, y in zip(a, b))
+
+
+class Palette(dict):
+    """Compiled theme: {key: (r, g, b)} plus derived colors as attributes."""
+
+    def __init__(self, name, hex_colors):
+        super().__init__((k, hex_to_rgb(hex_colors[k])) for k in COLOR_KEYS)
+        self.name = name
+        self.caret_alpha = self["caret"] + (CARET_ALPHA,)
+        self.caret_fill = self["caret"] + (FILL_ALPHA,)
+        self.dim = blend(self["main"], self["bg"], DIM_AMOUNT)
+        # Hashable identity for caches keyed by colors
+        self.key = (name,) + tuple(self.values())
+
+
+class ThemeRegistry:
+    def __init__(self, builtin=None, user_dir=USER_THEMES_DIR):
+        self._hex = dict(resources.THEMES if builtin is None else builtin)
+        self._palettes = {}
+        self._user_files = {}  # name -> path, read on first use
+        self._listeners = []
+        self.current = DEFAULT_THEME
+        if user_dir and os.path.isdir(user_dir):
+            with os.scandir(user_dir) as entries:
+                for entry in entries:
+                    stem, ext = os.path.splitext(entry.name)
+                    if ext == ".json" and entry.is_file() and stem not in self._hex:
+                        self._user_files[stem] = entry.path
+
+    def names(self):
+        return list(self._hex) + sorted(self._user_files)
+
+    def __contains__(self, name):
+        return name in self._hex or name in self._user_files
+
+    def _load_user(self, name):
+        path = self._user_files.pop(name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                colors = json.load(f)
+            Palette(name, colors)  # validate before accepting
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"Error loading theme {path}: {e}", file=sys.stderr)
+            return False
+        self._hex[name] = colors
+        return True
+
+    def get(self, name=None):
+        """Palette for a theme (the current one by default), compiled once."""
+        name = name or self.current
+        palette = self._palettes.get(name)
+        if palette is not None:
+            return palette
+        if name in self._user_files and not self._load_user(name):
+            name = DEFAULT_THEME
+        if name not in self._hex:
+            name = DEFAULT_THEME
+        palette = self._palettes.get(name)
+        if palette is None:
+            palette = self._palettes[name] = Palette(name, self._hex[name])
+        return palette
+
+    def set_current(self, name):
+        """Switch themes and notify subscribers. Unknown names fall back to the default."""
+        palette = self.get(name)
+        changed = palette.name != self.current
+        self.current = palette.name
+        resources.CURRENT_THEME = palette.name
+        if changed:
+            self._notify(palette)
+        return palette
+
+    def subscribe(self, callback):
+        # Bound methods are held weakly so a subscribed Renderer can be collected
+        ref = weakref.WeakMethod(callback) if isinstance(callback, types.MethodType) else (lambda: callback)
+        self._listeners.append(ref)
+
+    def _notify(self, palette):
+        alive = []
+        for ref in self._listeners:
+            callback = ref()
+            if callback is not None:
+                callback(palette)
+                alive.append(ref)
+        self._listeners = alive
+
+
+_registry = None
+
+
+def registry():
+    global _registry
+    if _registry is None:
+        _registry = ThemeRegistry()
+    return _registry
+
+
+def get_palette(name=None):
+    return registry().get(name)
+
+
+def set_theme(name):
+    return registry().set_current(name)
+
+
+def theme_names():
+    return registry().names()
+
+
+def subscribe(callback):
+    registry().subscribe(callback)
@@ -0,0 +1,99 @@
+# timeline.py - Per-second WPM / raw WPM / error series for one test
+#
+# Keys are counted into fixed-size per-second buckets as they are typed, so
+# nothing rescans the input. When a second is over its raw WPM is folded
+# into running sums, which give the consistency score (100 minus the
+# coefficient of variation of raw WPM, in percent) without a second pass.
+#
+# Saved with each history entry as {"wpm": [...], "raw": [...], "err": [...]}
+# (one int per second) plus "consistency".
+import array
+import math
+
+MAX_SECONDS = 600  # longer tests fold into the last bucket
+MIN_LAST_SECOND = 0.5  # a shorter final partial second is dropped from the series
+
+
+class Timeline:
+    def __init__(self, seconds=None):
+        """seconds: test length if known (time mode); None allows up to MAX_SECONDS."""
+        self.size = max(1, min(int(seconds), MAX_SECONDS)) if seconds else MAX_SECONDS
+        self.keys = array.array("H", bytes(2 * self.size))
+        self.correct = array.array("H", bytes(2 * self.size))
+        self.errors = array.array("H", bytes(2 * self.size))
+        self.n = 0  # buckets in use
+        self._closed = 0  # buckets folded into the running sums
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._last_fraction = 1.0  # length of the final second, set by finish()
+
+    def _bucket(self, t):
+        return min(max(0, int(t)), self.size - 1)
+
+    def _close_until(self, s):
+        """Fold every bucket before s into the consistency sums."""
+        while self._closed < s:
+            raw = self.keys[self._closed] * 12  # (keys / 5) per minute
+            self._sum += raw
+            self._sumsq += raw * raw
+            self._closed += 1
+
+    def add(self, t, correct):
+        """Count one typed character at t seconds since the start."""
+        s = self._bucket(t)
+        self._close_until(s)  # earlier seconds are over
+        if s >= self.n:
+            self.n = s + 1
+        self.keys[s] += 1
+        if correct:
+            self.correct[s] += 1
+        else:
+            self.errors[s] += 1
+
+    def finish(self, elapsed):
+        """End of test after `elapsed` seconds: close the last bucket."""
+        n = min(self.size, max(self.n, math.ceil(elapsed)))
+        fraction = elapsed - (n - 1)
+        if n > 1 and fraction < MIN_LAST_SECOND and self.keys[n - 1] == 0:
+            n -= 1  # nothing typed in a sliver of a second
+            fraction = 1.0
+        self.n = n
+        self._last_fraction = min(1.0, max(MIN_LAST_SECOND, fraction))
+        if self._closed < n:
+            self._close_until(n - 1)
+            raw = self.keys[n - 1] * 12 / self._last_fraction
+            self._sum += raw
+            self._sumsq += raw * raw
+            self._closed = n
+
+    # --- Series ---
+    def raw(self):
+        out = [self.keys[s] * 12 for s in range(self.n)]
+        if out and self._last_fraction < 1.0:
+            out[-1] = round(out[-1] / self._last_fraction)
+        return out
+
+    def wpm(self):
+        """Net WPM at the end of each second (correct keys so far)."""
+        out = []
+        total = 0
+        for s in range(self.n):
+            total += self.correct[s]
+            seconds = s + (self._last_fraction if s == self.n - 1 else 1.0)
+            out.append(round(total / 5 * 60 / seconds))
+        return out
+
+    def errors_series(self):
+        return self.errors[: self.n].tolist()
+
+    def consistency(self):
+        """100 - coefficient of variation of raw WPM over the closed seconds, in percent."""
+        n = self._closed
+        if n < 2 or self._sum <= 0:
+            return 100 if n else 0
+        mean = self._sum / n
+        var = max(0.0, self._sumsq / n - mean * mean)
+        return max(0, round(100 - 100 * math.sqrt(var) / mean))
+
+    def to_dict(self):
+        return {"wpm": self.wpm(), "raw": self.raw(), "err": self.errors_series()}
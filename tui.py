@@ -0,0 +1,433 @@
+# tui.py - Terminal (curses) frontend for thin clients and SSH
+#
+#   python tui.py
+#
+# Drives the same TypingEngine as the pygame app, so results go to the same
+# history and stats files, and reads/writes the same typing_config.json.
+# Frames are composed into a CellBuffer and only the cells that changed
+# since the last frame are written to the terminal. pygame is never
+# imported.
+#
+# Keys: TAB restart, F2 mode, F3 length (drill: key set), F4 theme, F5 language, F6 word set,
+# ESC quit. Enter types the line breaks of code mode. A test cut short by a
+# crash is offered back at launch (see journal.py).
+import os
+import sys
+from collections import Counter
+
+try:
+    import curses
+except ImportError:  # pragma: no cover - e.g. Windows without windows-curses
+    curses = None
+
+import config
+import corpus
+import drills
+import journal
+import themes
+from logic import StatsManager, TypingEngine
+
+TICK_MS = 100  # redraw interval while a test is running
+TEXT_WIDTH = 80  # max columns of target text
+VISIBLE_LINES = 3
+CODE_VISIBLE_LINES = 8  # code mode shows a whole snippet when the terminal is tall enough
+MODES = ["time", "word", "quote", "practice", "drill", "book", "code"]
+
+# Pair numbers for theme colors
+_PAIRS = {"main": 1, "correct": 2, "error": 3, "caret": 4, "dim": 5}
+# Standard 8-color terminal palette, in curses COLOR_* order
+_BASIC_RGB = [(0, 0, 0), (205, 0, 0), (0, 205, 0), (205, 205, 0),
+              (0, 0, 238), (205, 0, 205), (0, 205, 205), (229, 229, 229)]
+_CUBE_LEVELS = (0, 95, 135, 175, 215, 255)
+
+
+def _dist(a, b):
+    return sum((x - y) ** 2 for x, y in zip(a, b))
+
+
+def rgb_to_terminal(rgb, n_colors):
+    """Nearest terminal color number for an RGB tuple (256-color or basic 8)."""
+    if n_colors < 256:
+        return min(range(8), key=lambda i: _dist(rgb, _BASIC_RGB[i]))
+    # 6x6x6 cube (16-231) vs grayscale ramp (232-255)
+    idx = [min(range(6), key=lambda i: abs(_CUBE_LEVELS[i] - c)) for c in rgb]
+    cube = 16 + 36 * idx[0] + 6 * idx[1] + idx[2]
+    cube_rgb = tuple(_CUBE_LEVELS[i] for i in idx)
+    gray_i = max(0, min(23, round((sum(rgb) / 3 - 8) / 10)))
+    gray_rgb = (8 + 10 * gray_i,) * 3
+    return cube if _dist(rgb, cube_rgb) <= _dist(rgb, gray_rgb) else 232 + gray_i
+
+
+def wrap_indices(text, width):
+    """Greedy word wrap; [(start, end)] slices of text, spaces and line breaks kept at line ends."""
+    lines = []
+    start, n = 0, len(text)
+    while start < n:
+        end = min(start + width, n)
+        nl = text.find("\n", start, end)
+        if nl >= 0:
+            end = nl + 1
+        elif end < n:
+            brk = text.rfind(" ", start, end)
+            if brk >= start:
+                end = brk + 1
+        lines.append((start, end))
+        start = end
+    return lines
+
+
+class CellBuffer:
+    """Back buffer of (char, attr) cells plus a copy of what the terminal shows."""
+
+    def __init__(self, rows, cols):
+        self.resize(rows, cols)
+
+    def resize(self, rows, cols):
+        self.rows, self.cols = rows, cols
+        n = rows * cols
+        self._blank = [" "] * n
+        self.chars = [" "] * n
+        self.attrs = [0] * n
+        self._shown_chars = [None] * n  # None: unknown, always redrawn
+        self._shown_attrs = [0] * n
+
+    def invalidate(self):
+        """Forget what is on screen (after a resize or a terminal clear)."""
+        self._shown_chars[:] = [None] * len(self._shown_chars)
+
+    def clear(self, attr=0):
+        self.chars[:] = self._blank
+        self.attrs[:] = [attr] * len(self.attrs)
+
+    def put(self, y, x, text, attr=0):
+        """Write text at (y, x), clipped to the buffer."""
+        if not 0 <= y < self.rows or x >= self.cols:
+            return
+        if x < 0:
+            text, x = text[-x:], 0
+        text = text[: self.cols - x]
+        i = y * self.cols + x
+        self.chars[i : i + len(text)] = text
+        self.attrs[i : i + len(text)] = [attr] * len(text)
+
+    def set_attr(self, y, x, attr):
+        if 0 <= y < self.rows and 0 <= x < self.cols:
+            self.attrs[y * self.cols + x] = attr
+
+    def diff(self):
+        """Runs [(y, x, text, attr)] of cells changed since the last diff, then mark them shown."""
+        runs = []
+        cols = self.cols
+        chars, attrs = self.chars, self.attrs
+        shown_chars, shown_attrs = self._shown_chars, self._shown_attrs
+        for y in range(self.rows):
+            a, b = y * cols, (y + 1) * cols
+            if chars[a:b] == shown_chars[a:b] and attrs[a:b] == shown_attrs[a:b]:
+                continue
+            i = a
+            while i < b:
+                if chars[i] == shown_chars[i] and attrs[i] == shown_attrs[i]:
+                    i += 1
+                    continue
+                j = i + 1
+                attr = attrs[i]
+                while j < b and attrs[j] == attr and (chars[j] != shown_chars[j] or attrs[j] != shown_attrs[j]):
+                    j += 1
+                runs.append((y, i - a, "".join(chars[i:j]), attr))
+                i = j
+            shown_chars[a:b] = chars[a:b]
+            shown_attrs[a:b] = attrs[a:b]
+        return runs
+
+    def flush(self, window):
+        """Write the changed runs to a curses window; returns the number of cells written."""
+        written = 0
+        for y, x, text, attr in self.diff():
+            try:
+                window.addstr(y, x, text, attr)
+            except curses.error:
+                pass  # writing the bottom-right cell moves the cursor off screen
+            written += len(text)
+        return written
+
+
+class TerminalApp:
+    def __init__(self, stdscr):
+        self.stdscr = stdscr
+        self.cfg = config.load_config()
+        cfg = self.cfg
+        StatsManager.HALF_LIFE_DAYS = float(cfg.get("stats_half_life_days", 14))
+        self.engine = TypingEngine(
+            mode=cfg.get("mode", "time"),
+            duration=int(cfg.get("duration", 30)),
+            word_count=int(cfg.get("word_count", 25)),
+            language=cfg.get("language", "english"),
+            word_set=int(cfg.get("word_set", 200)),
+            daily=bool(cfg.get("daily_seed", False)),
+            quote_length=cfg.get("quote_length", "all"),
+            practice_source=cfg.get("practice_source", "markov"),
+            drill=cfg.get("drill", "home_row"),
+            layout=cfg.get("layout", "qwerty"),
+            book_path=cfg.get("book_path", ""),
+            code_dir=cfg.get("code_dir", ""),
+        )
+        self.journal = journal.Journal()
+        self.recovered = self.journal.pending()  # journal.Checkpoint until answered
+        self.engine.journal = self.journal
+        rows, cols = stdscr.getmaxyx()
+        self.buf = CellBuffer(rows, cols)
+        self.attrs = {}
+        self.show_result = False
+        self.running = True
+        self._wrap_key = None
+        self._lines = []
+        self.set_theme(cfg.get("theme", themes.DEFAULT_THEME))
+
+    # --- Colors ---
+    def set_theme(self, name):
+        palette = themes.set_theme(name)
+        self.cfg["theme"] = palette.name
+        attrs = dict.fromkeys(_PAIRS, 0)
+        if curses.has_colors():
+            n_colors = curses.COLORS
+            bg = rgb_to_terminal(palette["bg"], n_colors) if n_colors >= 256 else -1
+            colors = {k: palette[k] for k in ("main", "correct", "error", "caret")}
+            colors["dim"] = palette.dim
+            for key, pair in _PAIRS.items():
+                curses.init_pair(pair, rgb_to_terminal(colors[key], n_colors), bg)
+                attrs[key] = curses.color_pair(pair)
+        attrs["caret"] |= curses.A_REVERSE
+        attrs["error"] |= curses.A_UNDERLINE
+        attrs["title"] = attrs["caret"] & ~curses.A_REVERSE | curses.A_BOLD
+        self.attrs = attrs
+        self.stdscr.bkgd(" ", attrs["main"])
+        self.buf.invalidate()
+
+    # --- Input ---
+    def save_cfg(self):
+        e = self.engine
+        self.cfg.update({"mode": e.mode, "duration": e.test_duration, "word_count": e.target_word_count,
+                         "quote_length": e.quote_length, "language": e.language, "word_set": e.word_set,
+                         "drill": e.drill})
+        config.save_config(self.cfg)
+
+    def restart(self):
+        if self.engine.is_running:
+            self.engine.stop()
+        self.engine.reset()
+        self.show_result = False
+
+    def _cycle(self, options, current):
+        return options[(options.index(current) + 1) % len(options)] if current in options else options[0]
+
+    def handle_key(self, key):
+        e = self.engine
+        if self.recovered is not None and key != curses.KEY_RESIZE:
+            if key in ("\n", "\r", curses.KEY_ENTER, "r", "R"):
+                batch = e.resume(self.recovered)
+                if key in ("r", "R") or batch.finished:
+                    self.finish()
+            elif key == "\x1b":
+                self.journal.discard()
+            else:
+                return
+            self.recovered = None
+            self.save_cfg()
+            return
+        if key == curses.KEY_RESIZE:
+            rows, cols = self.stdscr.getmaxyx()
+            self.buf.resize(rows, cols)
+            self.stdscr.clear()
+        elif key == "\x1b":
+            if e.is_running:
+                e.stop()
+            self.running = False
+        elif key == "\t":
+            self.restart()
+        elif key == curses.KEY_F2:
+            e.mode = self._cycle(MODES, e.mode)
+            self.save_cfg()
+            self.restart()
+        elif key == curses.KEY_F3:
+            if e.mode == "time":
+                e.test_duration = self._cycle(config.DURATION_OPTIONS, e.test_duration)
+            elif e.mode == "quote":
+                e.quote_length = self._cycle(config.QUOTE_LENGTH_OPTIONS, e.quote_length)
+            elif e.mode == "drill":
+                e.drill = self._cycle(drills.DRILLS, e.drill)
+            else:
+                e.target_word_count = self._cycle(config.WORD_COUNT_OPTIONS, e.target_word_count)
+            self.save_cfg()
+            self.restart()
+        elif key == curses.KEY_F4:
+            self.set_theme(self._cycle(themes.theme_names(), self.cfg["theme"]))
+            config.save_config(self.cfg)
+        elif key == curses.KEY_F5:
+            e.language = self._cycle(corpus.available_languages(), e.language)
+            self.save_cfg()
+            self.restart()
+        elif key == curses.KEY_F6:
+            e.word_set = self._cycle(config.WORD_SET_OPTIONS, e.word_set)
+            self.save_cfg()
+            self.restart()
+        elif self.show_result:
+            return
+        elif key in (curses.KEY_BACKSPACE, "\x7f", "\b"):
+            e.process_key("\b")
+        elif key in ("\n", "\r", curses.KEY_ENTER):
+            if e.process_key("\n"):
+                self.finish()
+        elif isinstance(key, str) and key.isprintable():
+            if e.process_key(key):
+                self.finish()
+
+    def finish(self):
+        self.engine.stop()
+        self.show_result = True
+
+    def update(self):
+        e = self.engine
+        if e.is_running and e.mode == "time" and e.get_time_elapsed() >= e.test_duration:
+            self.finish()
+
+    # --- Drawing ---
+    def lines(self, width):
+        key = (self.engine.target_text, width)
+        if key != self._wrap_key:
+            self._wrap_key = key
+            self._lines = wrap_indices(self.engine.target_text, width)
+        return self._lines
+
+    def _settings_text(self):
+        e = self.engine
+        if e.mode == "time":
+            length = f"{e.test_duration}s"
+        elif e.mode == "quote":
+            length = e.quote_length
+        elif e.mode == "drill":
+            length = f"{drills.DRILL_LABELS[e.drill].lower()} keys"
+        elif e.mode == "book":
+            length = f"{os.path.basename(e.book_path)} {int(e.page.progress * 100)}%" if e.page else "no book"
+        elif e.mode == "code":
+            length = f"{e.snippet.path} ({e.snippet.language})" if e.snippet else "no source files"
+        else:
+            length = f"{e.target_word_count} words"
+        return f"{e.mode} | {length} | {e.language} top {e.word_set} | {self.cfg['theme']}"
+
+    def draw(self):
+        buf, attrs, e = self.buf, self.attrs, self.engine
+        buf.clear(attrs["main"])
+        if buf.rows < VISIBLE_LINES + 6 or buf.cols < 20:
+            buf.put(0, 0, "Terminal too small", attrs["error"])
+            return
+        width = min(TEXT_WIDTH, buf.cols - 4)
+        left = (buf.cols - width) // 2
+        buf.put(0, left, "PythonType", attrs["title"])
+        settings = self._settings_text()
+        buf.put(0, left + width - len(settings), settings, attrs["dim"])
+
+        if self.recovered is not None:
+            buf.put(2, left, "Unfinished test", attrs["title"])
+            buf.put(4, left, self.recovered.describe(), attrs["main"])
+            buf.put(6, left, "ENTER continue   R record result   ESC discard", attrs["dim"])
+        elif self.show_result:
+            self._draw_result(left)
+        else:
+            if e.mode == "time":
+                remaining = e.test_duration - int(e.get_time_elapsed()) if e.is_running else e.test_duration
+                timer = str(max(0, remaining))
+            else:
+                timer = f"{e.caret}/{len(e.target_text)}"
+            buf.put(2, left, timer, attrs["title"])
+            stats = f"WPM: {e.wpm}   ACC: {e.accuracy}%"
+            buf.put(2, left + width - len(stats), stats, attrs["main"])
+            self._draw_text(4, left, width)
+
+        hints = "TAB restart  F2 mode  F3 length  F4 theme  F5 language  F6 words  ESC quit"
+        buf.put(buf.rows - 1, max(0, (buf.cols - len(hints)) // 2), hints, attrs["dim"])
+
+    def _draw_text(self, top, left, width):
+        buf, attrs, e = self.buf, self.attrs, self.engine
+        target, typed = e.target_text, e.typed
+        lines = self.lines(width)
+        cursor = len(typed)
+        cur_line = 0
+        for i, (start, end) in enumerate(lines):
+            if start <= cursor < end:
+                cur_line = i
+                break
+        else:
+            cur_line = max(0, len(lines) - 1)
+        visible = VISIBLE_LINES
+        if e.mode == "code":
+            visible = max(VISIBLE_LINES, min(CODE_VISIBLE_LINES, buf.rows - 6))
+        first = max(0, min(cur_line - 1, len(lines) - visible))
+        main, correct, error = attrs["main"], attrs["correct"], attrs["error"]
+        for row, (start, end) in enumerate(lines[first : first + visible]):
+            y = top + row
+            buf.put(y, left, target[start:end].replace("\n", " "), main)
+            for i in range(start, min(end, cursor)):
+                buf.set_attr(y, left + i - start, correct if typed[i] == target[i] else error)
+            if start <= cursor < end:
+                buf.set_attr(y, left + cursor - start, attrs["caret"])
+
+    def _draw_result(self, left):
+        buf, attrs, e = self.buf, self.attrs, self.engine
+        buf.put(2, left, f"{e.wpm} WPM   {e.accuracy}% ACC", attrs["title"])
+        misses = Counter("[Space]" if exp == " " else f"'{exp}'" for exp, _typed in e.missed_data)
+        if misses:
+            buf.put(4, left, "Characters missed:", attrs["main"])
+            for i, (label, count) in enumerate(misses.most_common(5)):
+                buf.put(5 + i, left + 2, f"{label}: {count}", attrs["error"])
+        else:
+            buf.put(4, left, "Perfect!", attrs["correct"])
+
+    # --- Loop ---
+    def run(self):
+        stdscr = self.stdscr
+        while self.running:
+            self.update()
+            self.draw()
+            if self.buf.flush(stdscr):
+                stdscr.noutrefresh()
+                curses.doupdate()
+            # Tick only while the timer is visible; otherwise sleep until a key
+            stdscr.timeout(TICK_MS if self.engine.is_running else -1)
+            try:
+                key = stdscr.get_wch()
+            except curses.error:
+                continue  # timeout
+            except KeyboardInterrupt:
+                key = "\x1b"
+            self.handle_key(key)
+        self.save_cfg()
+        self.journal.close()
+
+
+def _main(stdscr):
+    try:
+        curses.curs_set(0)
+    except curses.error:
+        pass
+    if curses.has_colors():
+        curses.start_color()
+        try:
+            curses.use_default_colors()
+        except curses.error:
+            pass
+    stdscr.keypad(True)
+    TerminalApp(stdscr).run()
+
+
+def main():
+    if curses is None:
+        print("The terminal frontend needs the curses module (pip install windows-curses on Windows).",
+              file=sys.stderr)
+        return 1
+    os.environ.setdefault("ESCDELAY", "25")  # don't wait a second after ESC
+    curses.wrapper(_main)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+# widgets.py - Retained-mode settings bar
+#
+# The bar layout is computed once per (mode, theme name, font size, width)
+# and shared by drawing and click handling, so what you see is what you
+# click. The rendered bar is cached as a Surface and only re-rendered when
+# the layout, the colors or an active option changes.
+import os
+
+import pygame
+import config
+import drills
+
+MODE_OPTIONS = ["time", "word", "quote", "practice", "drill", "book", "code"]
+LAYOUT_OPTIONS = ["qwerty", "dvorak"]
+FONT_OPTIONS = ["small", "medium", "large"]
+
+ROW2_Y = 50
+BUTTON_RADIUS = 6
+MAX_CACHED_SURFACES = 16
+
+# Option group -> settings key whose value marks the active button
+_GROUP_SETTING = {
+    "mode": "mode",
+    "duration": "duration",
+    "words": "word_count",
+    "quote": "quote_length",
+    "drill": "drill",
+    "layout": "layout",
+    "font": "font_size",
+    "sound": "sound_on_error",
+    "reduced": "reduced_motion",
+    "daily": "daily_seed",
+}
+
+
+class _Widget:
+    __slots__ = ("group", "value", "rect", "label", "font", "kind")
+
+    def __init__(self, group, value, rect, label, font, kind="option"):
+        self.group = group  # key in the rect table, e.g. "mode"
+        self.value = value  # option value, or None for single buttons
+        self.rect = rect  # relative to the bar origin
+        self.label = label
+        self.font = font  # attribute name on the renderer
+        self.kind = kind  # option | toggle | theme | history | label | separator
+
+
+class SettingsBar:
+    def __init__(self, renderer):
+        self.renderer = renderer
+        self._layouts = {}
+        self._surfaces = {}
+        self._origin = (0, 0)
+        self._rects = None  # absolute rect table of the last draw
+
+    # --- Layout ---
+    def _layout_key(self, settings, width):
+        return (settings["mode"], settings["theme"], self.renderer.font_size_px, width, settings.get("book_path"),
+                settings.get("code_dir"))
+
+    def layout(self, settings, width):
+        """Widgets for these settings (cached)."""
+        key = self._layout_key(settings, width)
+        widgets = self._layouts.get(key)
+        if widgets is None:
+            widgets = self._layouts[key] = self._build_layout(settings, width)
+        return widgets
+
+    def _option_row(self, widgets, group, options, labels, x, y, pad_w, pad_h, measure_font, font, gap):
+        for opt, label in zip(options, labels):
+            w, h = getattr(self.renderer, measure_font).size(label)
+            rect = pygame.Rect(x, y, w + pad_w, h + pad_h)
+            widgets.append(_Widget(group, opt, rect, label, font))
+            x += rect.width + gap
+        return x
+
+    def _build_layout(self, settings, width):
+        r = self.renderer
+        widgets = []
+        mode = settings["mode"]
+
+        # --- Row 1 ---
+        x = 0
+        widgets.append(_Widget("label", None, pygame.Rect(x, 8, 0, 0), "Mode:", "font_ui_bold", kind="label"))
+        x += r.font_ui_bold.size("Mode:")[0] + 12
+        x = self._option_row(widgets, "mode", MODE_OPTIONS, [m.title() for m in MODE_OPTIONS],
+                             x, 0, 16, 16, "font_ui", "font_ui_bold", 6)
+
+        # Separator
+        x += 20
+        widgets.append(_Widget("separator", None, pygame.Rect(x, 5, 1, 20), "", None, kind="separator"))
+        x += 20
+
+        # Dynamic Options
+        if mode == "time":
+            opts = config.DURATION_OPTIONS
+            self._option_row(widgets, "duration", opts, [str(d) for d in opts], x, 0, 20, 16, "font_ui", "font_ui_bold", 6)
+        elif mode in ("word", "practice"):
+            # Practice mode also uses word count for length of test
+            opts = config.WORD_COUNT_OPTIONS
+            self._option_row(widgets, "words", opts, [str(w) for w in opts], x, 0, 20, 16, "font_ui", "font_ui_bold", 6)
+        elif mode == "quote":
+            opts = config.QUOTE_LENGTH_OPTIONS
+            self._option_row(widgets, "quote", opts, opts, x, 0, 20, 16, "font_ui", "font_ui_bold", 6)
+        elif mode == "drill":
+            # Drills use the word count of word mode; the row picks the key set
+            opts = drills.DRILLS
+            self._option_row(widgets, "drill", opts, [drills.DRILL_LABELS[d] for d in opts], x, 2, 14, 12,
+                             "font_ui_small", "font_ui_small", 4)
+        elif mode == "book":
+            name = os.path.basename(settings.get("book_path") or "") or "set book_path in typing_config.json"
+            widgets.append(_Widget("label", None, pygame.Rect(x, 8, 0, 0), name, "font_ui", kind="label"))
+        elif mode == "code":
+            code_dir = settings.get("code_dir") or ""
+            name = os.path.basename(os.path.normpath(code_dir)) if code_dir else "PythonType source"
+            widgets.append(_Widget("label", None, pygame.Rect(x, 8, 0, 0), name, "font_ui", kind="label"))
+
+        # --- Row 2 ---
+        y = ROW2_Y
+        x = 0
+        theme_lbl_w = r.font_ui.size(settings["theme"])[0] + 40
+        theme_btn = pygame.Rect(x, y, max(140, theme_lbl_w), 34)
+        widgets.append(_Widget("theme", None, theme_btn, settings["theme"], "font_ui_bold", kind="theme"))
+        x += theme_btn.width + 16
+
+        x = self._option_row(widgets, "layout", LAYOUT_OPTIONS, [l.upper() for l in LAYOUT_OPTIONS],
+                             x, y, 16, 14, "font_ui_small", "font_ui_small", 6)
+        x += 16
+
+        for f_opt in FONT_OPTIONS:
+            widgets.append(_Widget("font", f_opt, pygame.Rect(x, y, 34, 34), f_opt[0].upper(), "font_ui_bold"))
+            x += 40
+        x += 16
+
+        for group, label in (("sound", "Snd"), ("reduced", "Mot"), ("daily", "Day")):
+            widgets.append(_Widget(group, None, pygame.Rect(x, y, 40, 34), label, "font_ui_small", kind="toggle"))
+            x += 46
+
+        hist_w = 100
+        widgets.append(_Widget("history", None, pygame.Rect(width - hist_w, y, hist_w, 34), "History",
+                               "font_ui_bold", kind="history"))
+        return widgets
+
+    def _is_active(self, widget, settings):
+        value = settings.get(_GROUP_SETTING.get(widget.group))
+        if widget.kind == "toggle":
+            return bool(value)
+        return widget.value == value
+
+    # --- Rect table ---
+    def rects(self, cx, cy, cw, settings):
+        """Absolute rects grouped like {"mode": {opt: rect}, "theme": rect, ...}."""
+        table = {"mode": {}, "duration": {}, "words": {}, "quote": {}, "drill": {}, "layout": {}, "font": {}}
+        for w in self.layout(settings, cw):
+            if w.kind in ("label", "separator"):
+                continue
+            rect = w.rect.move(cx, cy)
+            if w.value is None:
+                table[w.group] = rect
+            else:
+                table[w.group][w.value] = rect
+        return table
+
+    def hit_test(self, pos):
+        """(group, value) of the widget under pos in the last drawn bar, or None."""
+        if self._rects is None:
+            return None
+        for group, entry in self._rects.items():
+            if isinstance(entry, dict):
+                for value, rect in entry.items():
+                    if rect.collidepoint(pos):
+                        return group, value
+            elif entry.collidepoint(pos):
+                return group, None
+        return None
+
+    # --- Drawing ---
+    def _render(self, theme, cw, ch, settings):
+        r = self.renderer
+        surf = r.new_surface((cw, ch))
+        surf.fill(theme["bg"])
+        for w in self.layout(settings, cw):
+            if w.kind == "label":
+                surf.blit(getattr(r, w.font).render(w.label, True, theme["main"]), w.rect.topleft)
+            elif w.kind == "separator":
+                pygame.draw.line(surf, theme["main"], w.rect.topleft, w.rect.bottomleft, 1)
+            elif w.kind == "theme":
+                r.draw_button_bg(surf, w.rect, theme["main"], radius=BUTTON_RADIUS)
+                r.draw_text_centered(surf, w.label, w.font, theme["bg"], w.rect.center)
+            elif w.kind == "history":
+                r.draw_button_bg(surf, w.rect, theme["bg"], theme["caret"], radius=BUTTON_RADIUS)
+                r.draw_text_centered(surf, w.label, w.font, theme["caret"], w.rect.center)
+            else:
+                is_active = self._is_active(w, settings)
+                bg_color = theme["caret"] if is_active else theme["bg"]
+                text_color = theme["bg"] if is_active else theme["main"]
+                border = None if is_active else theme["main"]
+                r.draw_button_bg(surf, w.rect, bg_color, border, radius=BUTTON_RADIUS)
+                r.draw_text_centered(surf, w.label, w.font, text_color, w.rect.center)
+        return surf
+
+    def draw(self, surface, theme, cx, cy, cw, ch, settings):
+        """Blit the (cached) bar and return its rect table."""
+        active = tuple(settings.get(k) for k in _GROUP_SETTING.values())
+        key = (self._layout_key(settings, cw), ch, theme.key, active)
+        surf = self._surfaces.get(key)
+        if surf is None:
+            if len(self._surfaces) >= MAX_CACHED_SURFACES:
+                self._surfaces.clear()
+            surf = self._surfaces[key] = self._render(theme, cw, ch, settings)
+        surface.blit(surf, (cx, cy))
+        if self._rects is None or self._origin != (cx, cy, key[0]):
+            self._origin = (cx, cy, key[0])
+            self._rects = self.rects(cx, cy, cw, settings)
+        return self._rects
+
+    def invalidate(self):
+        """Drop cached layouts and surfaces (fonts changed)."""
+        self._layouts.clear()
+        self._surfaces.clear()
+        self._rects = None